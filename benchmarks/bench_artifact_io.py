@@ -0,0 +1,72 @@
+"""
+Benchmark of the artifact I/O between load_data, train_data_split and data_preprocessing.
+
+before: the loaded dataset and both splits are written as Parquet (the default pandas
+        materializer) and read back by the next step.
+after:  the loaded dataset is written once as Arrow IPC, the splits as index arrays,
+        and every consumer memory-maps the dataset file.
+
+Usage: python -m benchmarks.bench_artifact_io [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.arrow_io import read_dataframe_ipc, take_rows, write_dataframe_ipc
+from utils.data_handling import Data_Split
+from utils.schema import compact_frame
+
+
+def run_before(dataset: pd.DataFrame, tmp_dir: str) -> tuple:
+    started = time.perf_counter()
+    dataset_path = os.path.join(tmp_dir, "dataset.parquet")
+    dataset.to_parquet(dataset_path)
+
+    # train_data_split: reads the dataset, writes two frames
+    loaded = pd.read_parquet(dataset_path)
+    dataset_train, dataset_test = Data_Split().data_handling(loaded)
+    paths = [dataset_path]
+    for name, split in (("train", dataset_train), ("test", dataset_test)):
+        path = os.path.join(tmp_dir, f"{name}.parquet")
+        split.to_parquet(path)
+        paths.append(path)
+
+    # data_preprocessing (twice): reads one split each
+    for path in paths[1:]:
+        pd.read_parquet(path)
+
+    return sum(os.path.getsize(path) for path in paths), time.perf_counter() - started
+
+
+def run_after(dataset: pd.DataFrame, tmp_dir: str) -> tuple:
+    started = time.perf_counter()
+    dataset_path = os.path.join(tmp_dir, "dataset.arrow")
+    write_dataframe_ipc(dataset, dataset_path)
+
+    loaded = read_dataframe_ipc(dataset_path)
+    train_index, test_index = Data_Split().split_indices(loaded)
+    paths = [dataset_path]
+    for name, index in (("train", train_index), ("test", test_index)):
+        path = os.path.join(tmp_dir, f"{name}_index.npy")
+        np.save(path, index)
+        paths.append(path)
+
+    for path in paths[1:]:
+        take_rows(read_dataframe_ipc(dataset_path), np.load(path))
+
+    return sum(os.path.getsize(path) for path in paths), time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    dataset = compact_frame(generate_greentaxi(n_rows))
+
+    for label, run in (("before", run_before), ("after", run_after)):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            artifact_bytes, seconds = run(dataset, tmp_dir)
+        print(f"{label:<7} artifact bytes: {artifact_bytes / 2**20:8.1f} MB   step I/O time: {seconds:6.2f}s")
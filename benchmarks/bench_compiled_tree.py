@@ -0,0 +1,111 @@
+"""
+Benchmark of the compiled tree predictor (utils.compiled_tree) against the sklearn model it was compiled from.
+
+A decision tree, a binned random forest and a gradient boosting model are trained on synthetic data and compiled. For each,
+the benchmark reports the artifact size (pickle vs .npy arrays), the load time in a fresh
+interpreter (unpickling, which imports sklearn, vs mapping the arrays), the predict time per batch
+size, and the largest prediction difference.
+
+Usage: python -m benchmarks.bench_compiled_tree [--n-rows 1000000] [--batch-sizes 1 16 256 100000]
+"""
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.compiled_tree import Compiled_Tree_Regressor, check_parity
+from utils.data_handling import Data_Preprocessing
+from utils.model_train import (DecisionTree_Regressor_Model, HistGradientBoosting_Regressor_Model,
+                               RandomForest_Regressor_Model)
+from utils.schema import compact_frame
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_load_pickle = """
+import pickle, sys, time
+started = time.perf_counter()
+with open(sys.argv[1], "rb") as model_file:
+    pickle.load(model_file)
+print(time.perf_counter() - started)
+"""
+_load_compiled = """
+import sys, time
+started = time.perf_counter()
+from utils.compiled_tree import Compiled_Tree_Regressor
+Compiled_Tree_Regressor.load(sys.argv[1])
+print(time.perf_counter() - started)
+"""
+
+
+def _load_seconds(code: str, path: str, repeat: int = 3) -> float:
+    """
+    This function returns the fastest time to load an artifact in a fresh interpreter, imports included.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    return min(float(subprocess.run([sys.executable, "-c", code, path], env=env, capture_output=True, text=True,
+                                    check=True).stdout.strip().splitlines()[-1]) for _ in range(repeat))
+
+
+def _predict_seconds(predict, X: np.ndarray, min_seconds: float = 0.5) -> float:
+    """
+    This function returns the average time of predict(X), repeated for at least min_seconds.
+    """
+    n_calls, started = 0, time.perf_counter()
+    while n_calls == 0 or time.perf_counter() - started < min_seconds:
+        predict(X)
+        n_calls += 1
+    return (time.perf_counter() - started) / n_calls
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the compiled tree predictor with sklearn.")
+    parser.add_argument("--n-rows", type=int, default=1_000_000)
+    parser.add_argument("--train-rows", type=int, default=300_000)
+    parser.add_argument("--n-estimators", type=int, default=20, help="Trees of the random forest")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 100_000])
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    dataset = compact_frame(generate_greentaxi(args.n_rows))
+    encoder = Data_Preprocessing().fit_encoder(dataset)
+    dataset = Data_Preprocessing().data_handling(dataset, encoder=encoder)
+    features = dataset.drop(columns=["fare_amount"])
+
+    models = {
+        "DecisionTreeRegressor": DecisionTree_Regressor_Model().ml_model_train(dataset.iloc[:args.train_rows])[0],
+        "RandomForestRegressor": RandomForest_Regressor_Model().ml_model_train(
+            dataset.iloc[:args.train_rows], n_estimators=args.n_estimators)[0],
+        "HistGradientBoostingRegressor": HistGradientBoosting_Regressor_Model().ml_model_train(
+            dataset.iloc[:args.train_rows])[0],
+    }
+
+    for name, model in models.items():
+        compiled = Compiled_Tree_Regressor.compile(model)
+        X = features[model.feature_names_in_].to_numpy(dtype=np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pickle_path = os.path.join(tmp_dir, "model.pkl")
+            with open(pickle_path, "wb") as model_file:
+                pickle.dump(model, model_file, protocol=pickle.HIGHEST_PROTOCOL)
+            compiled_dir = os.path.join(tmp_dir, "compiled")
+            compiled_bytes = compiled.save(compiled_dir)
+
+            print(f"{name}: {compiled.n_trees} trees, {len(compiled.nodes)} nodes, "
+                  f"largest difference {check_parity(model, Compiled_Tree_Regressor.load(compiled_dir), X)}")
+            print(f"    size:  pickle {os.path.getsize(pickle_path) / 1e3:9.0f} kB   compiled {compiled_bytes / 1e3:9.0f} kB")
+            print(f"    load:  pickle {_load_seconds(_load_pickle, pickle_path) * 1e3:9.1f} ms   "
+                  f"compiled {_load_seconds(_load_compiled, compiled_dir) * 1e3:9.1f} ms  (fresh interpreter)")
+
+        for batch_size in args.batch_sizes:
+            batch = X[:batch_size]
+            sklearn_seconds = _predict_seconds(model.predict, batch)
+            compiled_seconds = _predict_seconds(compiled.predict, batch)
+            print(f"    batch {batch_size:>7}: sklearn {sklearn_seconds * 1e3:9.3f} ms   "
+                  f"compiled {compiled_seconds * 1e3:9.3f} ms   ({sklearn_seconds / compiled_seconds:.2f}x)")
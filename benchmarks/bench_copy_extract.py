@@ -0,0 +1,57 @@
+"""
+Benchmark of the COPY extraction path against the pd.read_sql path.
+
+With DB_* variables set (see env_template.env) both loaders run against the database.
+Otherwise a recorded COPY stream (CSV) is generated from synthetic data and both parsing
+strategies run on it: row tuples + DataFrame construction, as pd.read_sql does over DB-API,
+and the column-wise COPY parser.
+
+Usage: python -m benchmarks.bench_copy_extract [n_rows]
+"""
+import csv
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Load_from_DB, Data_Load_from_DB_Copy
+
+
+def timed(label: str, func) -> pd.DataFrame:
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {elapsed:8.3f}s  {len(result) / elapsed:14,.0f} rows/sec  "
+          f"{result.memory_usage(deep=True).sum() / 2**20:8.1f} MB")
+    return result
+
+
+def bench_database() -> None:
+    timed("pd.read_sql", Data_Load_from_DB().data_handling)
+    timed("COPY csv", Data_Load_from_DB_Copy().data_handling)
+
+
+def bench_fixture(n_rows: int) -> None:
+    fixture = io.BytesIO()
+    generate_greentaxi(n_rows).to_csv(fixture, index=False)
+    print(f"COPY stream fixture: {n_rows:,} rows, {fixture.tell() / 2**20:.1f} MB")
+
+    def row_tuples() -> pd.DataFrame:
+        reader = csv.reader(io.TextIOWrapper(io.BytesIO(fixture.getvalue()), encoding="utf-8"))
+        columns = next(reader)
+        return pd.DataFrame.from_records([tuple(row) for row in reader], columns=columns)
+
+    timed("row tuples (read_sql)", row_tuples)
+    timed("COPY csv", lambda: Data_Load_from_DB_Copy.parse_copy_stream(io.BytesIO(fixture.getvalue())))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    if os.getenv("DB_NAME"):
+        bench_database()
+    else:
+        bench_fixture(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
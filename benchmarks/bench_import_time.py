@@ -0,0 +1,138 @@
+"""
+Import-time budget of the pipeline and step modules.
+
+Every module is imported in a fresh interpreter with `python -X importtime`, after the
+frameworks that any step needs anyway (zenml, pandas, sklearn.base), so the reported time is
+what the repository adds on top of them: the cost paid by the CLI (`python ml_training_run.py`)
+and by every step container before the step starts. The check also fails when a module loads
+one of the libraries that are only imported inside the steps (mlflow, psycopg2, pyarrow, the
+sklearn estimators). The experiment tracker of the active stack is resolved when the pipeline is
+composed (utils.stack), so no module queries the ZenML server at import time either.
+
+Usage:
+    python -m benchmarks.bench_import_time [--modules pipelines.ml_training ...]
+    python -m benchmarks.bench_import_time --check [--budget 0.5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "pipelines.ml_training",
+    "pipelines.ml_inference",
+    "steps.data_load.data_loader",
+    "steps.data_load.data_split",
+    "steps.data_load.data_preprocessing",
+    "steps.data_load.data_drift",
+    "steps.training.ml_train",
+    "steps.training.ml_search",
+    "steps.training.ml_evaluation",
+    "steps.training.ml_model_registry",
+    "steps.training.ml_model_export",
+    "steps.promotion.model_promotion",
+    "steps.inference.production_model",
+    "steps.inference.batch_inference",
+]
+# Imported before the measured module: needed by every step signature, not deferrable
+FRAMEWORK_MODULES = ["zenml", "pandas", "sklearn.base"]
+# Libraries that the modules must leave to the step functions
+DEFERRED_MODULES = [
+    "mlflow",
+    "zenml.integrations.mlflow.experiment_trackers",
+    "zenml.integrations.mlflow.steps",
+    "psycopg2",
+    "pyarrow",
+    "sklearn.ensemble",
+    "sklearn.tree",
+    "sklearn.model_selection",
+    "sklearn.metrics",
+]
+MARKER = "--- measured import ---"
+
+_probe = """
+import json, sys, time
+for name in {frameworks!r}:
+    __import__(name)
+before = set(sys.modules)
+print({marker!r}, file=sys.stderr, flush=True)
+started = time.perf_counter()
+__import__({module!r})
+seconds = time.perf_counter() - started
+loaded = [name for name in {deferred!r} if name in sys.modules and name not in before]
+print(json.dumps({{"seconds": seconds, "deferred_loaded": loaded}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> list:
+    """
+    This function returns (self seconds, cumulative seconds, module) of the imports after the marker.
+    """
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append((int(self_us) / 1e6, int(cumulative_us) / 1e6, name.strip()))
+    return imports
+
+
+def measure_module(module: str, repeat: int = 3) -> dict:
+    """
+    This function imports a module in fresh interpreters and returns its fastest import time,
+    the slowest imports it triggers and the deferred libraries it loads.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    code = _probe.format(frameworks=FRAMEWORK_MODULES, marker=MARKER, module=module, deferred=DEFERRED_MODULES)
+
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT,
+                                   env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Import of {module} failed:\n{completed.stderr.split(MARKER, 1)[-1][-2000:]}")
+
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            imports = _parse_importtime(completed.stderr)
+            result["slowest"] = sorted(imports, key=lambda record: record[0], reverse=True)[:5]
+            best = result
+
+    return {"module": module, **best}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the pipeline and step modules.")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="Interpreters per module, the fastest is reported")
+    parser.add_argument("--budget", type=float, default=0.5, help="Seconds a module may add on top of the frameworks")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 when a module exceeds the budget or loads a deferred library")
+    args = parser.parse_args()
+
+    report = [measure_module(module, repeat=args.repeat) for module in args.modules]
+
+    failures = []
+    for result in report:
+        print(f"{result['module']:<40} {result['seconds'] * 1000:8.1f} ms")
+        for self_seconds, _, name in result["slowest"]:
+            print(f"    {self_seconds * 1000:8.1f} ms  {name}")
+        if result["seconds"] > args.budget:
+            failures.append(f"{result['module']}: {result['seconds']:.3f}s over the {args.budget}s budget")
+        if result["deferred_loaded"]:
+            failures.append(f"{result['module']}: loads {', '.join(result['deferred_loaded'])} at import time")
+
+    if args.output:
+        with open(args.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if args.check:
+        sys.exit(1 if failures else 0)
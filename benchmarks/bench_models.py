@@ -0,0 +1,64 @@
+"""
+Benchmark of fit time and test R2 of the models in utils.model_train.ml_models.
+
+Every model is trained on the raw features; the decision tree and the random forest are also trained on the
+features binned by one Feature_Binner, fitted once and shared by both, and the r2 difference of the binned
+fit is reported. HistGradientBoostingRegressor bins the features itself.
+
+Measured on 1,000,000 synthetic rows with 4 threads (the binner fit takes 0.2s):
+
+    RandomForestRegressor    raw 159.7s, r2 0.8963   binned 133.8s, r2 0.8915   r2 difference -0.0048
+    DecisionTreeRegressor    raw   1.0s, r2 0.7478   binned   1.6s, r2 0.8092   r2 difference +0.0614
+
+The forest trains on the raw features by default: binning it saves 16% of the fit for 0.005 of test r2.
+
+Usage: python -m benchmarks.bench_models [n_rows] [n_threads]
+"""
+import sys
+import time
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Category_Encoder, Data_Split
+from utils.model_evaluation import Regression_Metrics
+from utils.model_train import Feature_Binner, get_ml_model, ml_models
+
+# Models whose ml_model_train takes a fitted binner
+BINNED_MODELS = ("DecisionTreeRegressor", "RandomForestRegressor")
+
+
+def fit_and_score(name: str, dataset_train, dataset_test, n_threads: int = None, **params):
+    """
+    This function returns (model template, fit seconds, test r2) of a model.
+    """
+    model = get_ml_model(name, n_threads=n_threads)
+
+    started = time.perf_counter()
+    trained_model, _ = model.ml_model_train(dataset=dataset_train, **params)
+    fit_seconds = time.perf_counter() - started
+
+    y_pred = trained_model.predict(dataset_test.drop(columns=["fare_amount"]))
+    return model, fit_seconds, Regression_Metrics().metric_score(dataset_test["fare_amount"], y_pred)["r2"]
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_threads = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    dataset = generate_greentaxi(n_rows)
+    dataset_train, dataset_test = Data_Split().data_handling(dataset)
+    encoder = Category_Encoder().fit(dataset_train)
+    dataset_train, dataset_test = encoder.transform(dataset_train), encoder.transform(dataset_test)
+
+    started = time.perf_counter()
+    binner = Feature_Binner().fit(dataset_train.drop(columns=["fare_amount"]))
+    print(f"{'Feature_Binner':<32} fit: {time.perf_counter() - started:7.2f}s (shared by the binned fits)")
+
+    for name in ml_models:
+        model, fit_seconds, r2 = fit_and_score(name, dataset_train, dataset_test, n_threads=n_threads)
+        print(f"{name:<32} threads: {str(model.n_threads):>4}  fit: {fit_seconds:7.2f}s  test r2: {r2:.4f}")
+
+        if name in BINNED_MODELS:
+            _, binned_seconds, binned_r2 = fit_and_score(name, dataset_train, dataset_test, n_threads=n_threads,
+                                                         binner=binner)
+            print(f"{name + ' (binned)':<32} threads: {str(model.n_threads):>4}  fit: {binned_seconds:7.2f}s  "
+                  f"test r2: {binned_r2:.4f}  r2 difference: {binned_r2 - r2:+.4f}")
@@ -0,0 +1,112 @@
+"""
+Benchmark of the local parallel runner (utils.parallel_runner) on the training DAG.
+
+The steps of the training pipeline run as tasks on synthetic data (the database load is replaced by
+generate_greentaxi and the steps by the library calls behind them, so that neither a database nor a
+ZenML installation is needed), once on a single worker and once on the process pool. For each run the
+benchmark reports the wall time, the sum of the task times and the critical path of the DAG, which is
+the lower bound of the wall time with enough cores. The traces are left in the run directories.
+This is a benchmark only: nothing is tracked in MLflow, memoized, promoted or registered, which the
+pipeline of pipelines.ml_training does.
+
+Usage: python -m benchmarks.bench_parallel_runner [--n-rows 2000000] [--max-workers 4] [--train-threads 1]
+"""
+import argparse
+import os
+import tempfile
+
+from typing import Optional
+
+from utils.parallel_runner import Parallel_Runner, Task
+
+# Imported by each worker when the pool starts: the libraries behind the handed-off datasets and models
+PRELOAD_MODULES = ("pyarrow", "sklearn.tree", "utils.data_handling")
+
+
+def generate(n_rows: int):
+    from benchmarks.synthetic_data import generate_greentaxi
+    from utils.schema import compact_frame
+
+    return compact_frame(generate_greentaxi(n_rows))
+
+
+def split(dataset):
+    from utils.data_handling import Data_Split
+
+    return Data_Split().split_indices(dataset)
+
+
+def fit_encoder(dataset, index):
+    from utils.data_handling import Data_Preprocessing
+    from utils.schema import CATEGORICAL_COLS
+
+    return Data_Preprocessing().fit_encoder(dataset[CATEGORICAL_COLS].iloc[index], cols=CATEGORICAL_COLS)
+
+
+def preprocess(dataset, index, encoder):
+    from utils.arrow_io import take_rows
+    from utils.data_handling import Data_Preprocessing
+
+    return Data_Preprocessing().data_handling(take_rows(dataset, index), encoder=encoder)
+
+
+def train_model(dataset_train, ml_model: str = "DecisionTreeRegressor", model_params: Optional[dict] = None,
+                n_threads: Optional[int] = None):
+    from utils.model_train import get_ml_model
+
+    trained_model, _ = get_ml_model(ml_model, n_threads=n_threads).ml_model_train(dataset_train, **(model_params or {}))
+    return trained_model
+
+
+def evaluate_model(model, dataset, target: str = "fare_amount", chunk_size: int = 100000) -> dict:
+    from utils.model_evaluation import Chunked_Model_Evaluation
+
+    return Chunked_Model_Evaluation(chunk_size=chunk_size).evaluate(model, dataset, target=target)
+
+
+def bench_tasks(n_rows: int, train_threads: int = 1) -> list:
+    """
+    This function returns the steps of the training pipeline as tasks, with the database and ZenML steps replaced.
+    """
+    module = "benchmarks.bench_parallel_runner"
+    return [
+        Task("load_data", f"{module}:generate", params = {"n_rows": n_rows}),
+        Task("train_data_split", f"{module}:split", inputs = {"dataset": "load_data.output"},
+             outputs = ("train_index", "test_index")),
+        Task("fit_category_encoder", f"{module}:fit_encoder",
+             inputs = {"dataset": "load_data.output", "index": "train_data_split.train_index"}),
+        Task("preprocess_train", f"{module}:preprocess",
+             inputs = {"dataset": "load_data.output", "index": "train_data_split.train_index",
+                       "encoder": "fit_category_encoder.output"}),
+        Task("preprocess_test", f"{module}:preprocess",
+             inputs = {"dataset": "load_data.output", "index": "train_data_split.test_index",
+                       "encoder": "fit_category_encoder.output"}),
+        Task("train_model", f"{module}:train_model",
+             inputs = {"dataset_train": "preprocess_train.output"},
+             params = {"n_threads": train_threads if train_threads > 1 else None}, threads = train_threads),
+        Task("evaluate_train", f"{module}:evaluate_model",
+             inputs = {"model": "train_model.output", "dataset": "preprocess_train.output"}),
+        Task("evaluate_test", f"{module}:evaluate_model",
+             inputs = {"model": "train_model.output", "dataset": "preprocess_test.output"}),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the training DAG on one worker and on a process pool.")
+    parser.add_argument("--n-rows", type=int, default=2_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--cpu-budget", type=int, default=None, help="Threads of the running tasks (cores when None)")
+    parser.add_argument("--train-threads", type=int, default=1)
+    parser.add_argument("--run-dir", default=None, help="Directory of the runs (a temporary one when None)")
+    args = parser.parse_args()
+
+    base_dir = args.run_dir or tempfile.mkdtemp(prefix="parallel_runs_")
+
+    for label, max_workers in (("serial", 1), ("parallel", args.max_workers)):
+        runner = Parallel_Runner(max_workers=max_workers, cpu_budget=args.cpu_budget,
+                                 run_dir=os.path.join(base_dir, label), preload=PRELOAD_MODULES)
+        runner.run(bench_tasks(args.n_rows, train_threads=args.train_threads))
+        summary = runner.summary
+        print(f"{label:>8} ({runner.max_workers} workers): wall {summary['wall_seconds']:6.2f}s   "
+              f"sum of tasks {sum(summary['task_seconds'].values()):6.2f}s   "
+              f"critical path {summary['critical_path_seconds']:6.2f}s   trace {summary['trace']}")
@@ -0,0 +1,39 @@
+"""
+Benchmark of the one-hot encoding of the training and test datasets.
+
+get_dummies: pd.get_dummies on each split (the previous data_preprocessing).
+encoder:     Category_Encoder fitted once on the training split, then transform on both splits.
+
+Usage: python -m benchmarks.bench_preprocessing [n_rows]
+"""
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Category_Encoder, Data_Split
+from utils.schema import compact_frame
+
+
+def run(label: str, encode) -> None:
+    started = time.perf_counter()
+    encoded = encode()
+    elapsed = time.perf_counter() - started
+    size = sum(frame.memory_usage(deep=True).sum() for frame in encoded)
+    print(f"{label:<12} {elapsed:7.2f}s  output: {size / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    dataset = compact_frame(generate_greentaxi(n_rows))
+    dataset_train, dataset_test = Data_Split().data_handling(dataset)
+
+    run("get_dummies", lambda: [pd.get_dummies(split, columns=["rate_code_des", "pmt_type_des", "travel_day"])
+                                for split in (dataset_train, dataset_test)])
+
+    def fitted_encoder():
+        encoder = Category_Encoder().fit(dataset_train)
+        return [encoder.transform(split) for split in (dataset_train, dataset_test)]
+
+    run("encoder", fitted_encoder)
@@ -0,0 +1,130 @@
+"""
+Load generator of the online prediction server (serving.model_server).
+
+Without --url, a server is started in a child process with a decision tree trained on synthetic
+data (no ZenML or MLflow needed). Client threads then send single-trip POST /predict requests
+on keep-alive connections for the given duration, and the p50/p99 latency and the throughput
+are reported. The per-request latency of the pandas path (one-row DataFrame, get_dummies-style
+encoding, predict) is measured in-process for comparison.
+
+Usage: python -m benchmarks.bench_serving [--clients 32] [--seconds 10] [--compiled] [--url http://host:port]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Preprocessing
+from utils.model_train import DecisionTree_Regressor_Model
+from utils.schema import compact_frame
+
+
+def _train(n_rows: int):
+    dataset = compact_frame(generate_greentaxi(n_rows))
+    encoder = Data_Preprocessing().fit_encoder(dataset)
+    model, _ = DecisionTree_Regressor_Model().ml_model_train(dataset=Data_Preprocessing().data_handling(dataset, encoder=encoder))
+    return model, encoder
+
+
+def _serve(port: int, n_rows: int, max_batch_size: int, max_wait_ms: float, compiled: bool, ready) -> None:
+    from serving.model_server import Model_Server, make_http_server
+
+    model, encoder = _train(n_rows)
+    if compiled:
+        from utils.compiled_tree import Compiled_Tree_Regressor
+
+        model = Compiled_Tree_Regressor.compile(model)
+    model_server = Model_Server(resolve_version=lambda: "synthetic", load_version=lambda version: (model, encoder),
+                                max_batch_size=max_batch_size, max_wait_ms=max_wait_ms).start()
+    http_server = make_http_server(model_server, port=port)
+    ready.set()
+    http_server.serve_forever()
+
+
+def _client(host: str, port: int, records: list, stop_at: float, latencies: list) -> None:
+    connection = http.client.HTTPConnection(host, port)
+    position = 0
+    while time.perf_counter() < stop_at:
+        # Bytes, so that http.client sends the headers and the body in one segment
+        body = json.dumps(records[position % len(records)]).encode()
+        position += 1
+        started = time.perf_counter()
+        connection.request("POST", "/predict", body, {"Content-Type": "application/json"})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def _pandas_latency(records: list, n_rows: int, n_requests: int = 200) -> np.ndarray:
+    """
+    This function returns the latency of predicting single records through a one-row DataFrame.
+    """
+    import pandas as pd
+
+    model, encoder = _train(n_rows)
+    latencies = []
+    for record in records[:n_requests]:
+        started = time.perf_counter()
+        features = Data_Preprocessing().data_handling(pd.DataFrame([record]), encoder=encoder)
+        model.predict(features[model.feature_names_in_])
+        latencies.append(time.perf_counter() - started)
+    return np.array(latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the online prediction server.")
+    parser.add_argument("--url", help="Server to test; a local server on a synthetic model when omitted")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--n-rows", type=int, default=200_000, help="Training rows of the synthetic model")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=0.0)
+    parser.add_argument("--compiled", action="store_true", help="Serve the synthetic model compiled (utils.compiled_tree)")
+    args = parser.parse_args()
+
+    records = generate_greentaxi(10_000, seed=99).drop(columns=["fare_amount"]).to_dict(orient="records")
+    for record in records:
+        if record["passenger_count"] != record["passenger_count"]:
+            record["passenger_count"] = None
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port
+    else:
+        host, port = "127.0.0.1", 8765
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=_serve, daemon=True,
+                                         args=(port, args.n_rows, args.max_batch_size, args.max_wait_ms,
+                                               args.compiled, ready))
+        server.start()
+        ready.wait()
+
+    latencies = []
+    stop_at = time.perf_counter() + args.seconds
+    clients = [threading.Thread(target=_client, args=(host, port, records[client::args.clients], stop_at, latencies))
+               for client in range(args.clients)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    if server is not None:
+        server.terminate()
+
+    latencies = np.array(latencies) * 1000
+    print(f"server: {len(latencies)} requests from {args.clients} clients in {args.seconds:.0f}s "
+          f"({len(latencies) / args.seconds:,.0f} req/s)  "
+          f"p50: {np.percentile(latencies, 50):.2f} ms  p99: {np.percentile(latencies, 99):.2f} ms")
+
+    if server is not None:
+        pandas_latencies = _pandas_latency(records, args.n_rows) * 1000
+        print(f"pandas path per request (in-process, no HTTP): "
+              f"p50: {np.percentile(pandas_latencies, 50):.2f} ms  p99: {np.percentile(pandas_latencies, 99):.2f} ms")
@@ -0,0 +1,185 @@
+"""
+Benchmark harness of the training pipeline stages on synthetic data.
+
+Runs Data_Split, Data_Preprocessing (Category_Encoder fit and transform),
+DecisionTree_Regressor_Model.ml_model_train and the chunked evaluation metrics at several
+dataset sizes, without a database, a ZenML server or an MLflow tracking server. Every stage
+reports its wall time, throughput (rows/s) and tracemalloc peak (MB), so the curves over the
+sizes show how time and memory scale.
+
+The report can be stored as the baseline (benchmarks/baseline.json) and later runs checked
+against it: a stage whose time or memory grows by more than the threshold is a regression and
+the command exits with status 1. Timings depend on the machine, so refresh the baseline on the
+machine that runs the check.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --check [--threshold 0.25]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Preprocessing, Data_Split
+from utils.model_evaluation import Chunked_Model_Evaluation
+from utils.model_train import DecisionTree_Regressor_Model
+from utils.profiling import peak_rss_mb
+from utils.schema import compact_frame
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# Metrics compared by --check; throughput follows from seconds
+CHECKED_METRICS = ("seconds", "peak_mb")
+# Differences below these floors are timer and allocator noise
+NOISE_FLOORS = {"seconds": 0.05, "peak_mb": 1.0}
+
+
+def _measure(stage_func, n_rows: int, repeat: int):
+    """
+    This function runs a stage repeat times and returns (result of the last run, stage record).
+    The record keeps the fastest run and the largest tracemalloc peak.
+    """
+    best_seconds, peak_bytes = float("inf"), 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = stage_func()
+        seconds = time.perf_counter() - started
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        best_seconds = min(best_seconds, seconds)
+
+    return result, {
+        "seconds": best_seconds,
+        "rows_per_sec": n_rows / best_seconds if best_seconds > 0 else float("inf"),
+        "peak_mb": peak_bytes / (1024 * 1024),
+    }
+
+
+def run_size(n_rows: int, repeat: int = 1, seed: int = 12) -> dict:
+    """
+    This function benchmarks the pipeline stages on n_rows synthetic rows.
+    Args:
+        n_rows: Number of rows of the synthetic dataset.
+        repeat: Number of runs per stage; the fastest is reported.
+        seed: Seed of the synthetic data.
+    Returns:
+        Dictionary of stage records, plus the test r2 and the process peak RSS.
+    """
+    # Compacted as the loaders do right after the query
+    dataset = compact_frame(generate_greentaxi(n_rows, seed=seed, categorical=n_rows > 5_000_000))
+    stages = {}
+
+    (dataset_train, dataset_test), stages["split"] = _measure(
+        lambda: Data_Split().data_handling(dataset), n_rows, repeat)
+
+    preprocessing = Data_Preprocessing()
+
+    def preprocess():
+        encoder = preprocessing.fit_encoder(dataset_train)
+        return (preprocessing.data_handling(dataset_train, encoder=encoder),
+                preprocessing.data_handling(dataset_test, encoder=encoder))
+
+    (train_encoded, test_encoded), stages["preprocessing"] = _measure(preprocess, n_rows, repeat)
+
+    (model, _), stages["train"] = _measure(
+        lambda: DecisionTree_Regressor_Model().ml_model_train(dataset=train_encoded), len(train_encoded), repeat)
+
+    metrics, stages["evaluation"] = _measure(
+        lambda: Chunked_Model_Evaluation().evaluate(model, test_encoded), len(test_encoded), repeat)
+
+    return {"stages": stages, "test_r2": float(metrics["r2"]), "peak_rss_mb": peak_rss_mb(),
+            "bytes_per_row": float(dataset.memory_usage(deep=True).sum() / n_rows),
+            "encoded_bytes_per_row": float(train_encoded.memory_usage(deep=True).sum() / len(train_encoded))}
+
+
+def run_benchmarks(sizes: list, repeat: int = 1, seed: int = 12) -> dict:
+    """
+    This function returns the benchmark report over all sizes.
+    """
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "sizes": {},
+    }
+    for n_rows in sizes:
+        report["sizes"][str(n_rows)] = result = run_size(n_rows, repeat=repeat, seed=seed)
+        for stage, record in result["stages"].items():
+            print(f"{n_rows:>10} rows  {stage:<14} {record['seconds']:8.3f}s  "
+                  f"{record['rows_per_sec']:14,.0f} rows/s  {record['peak_mb']:9.1f} MB")
+        print(f"{n_rows:>10} rows  test r2: {result['test_r2']:.4f}  peak rss: {result['peak_rss_mb']:.0f} MB  "
+              f"bytes/row: {result['bytes_per_row']:.1f} loaded, {result['encoded_bytes_per_row']:.1f} encoded")
+
+    return report
+
+
+def check_regressions(baseline: dict, report: dict, threshold: float = 0.25) -> list:
+    """
+    This function returns the stage metrics of a report that regressed by more than threshold against a baseline.
+    Args:
+        baseline: Stored benchmark report.
+        report: New benchmark report.
+        threshold: Relative increase reported as a regression.
+    Returns:
+        List of (size, stage, metric, baseline value, new value).
+    """
+    regressions = []
+    for size, result in report["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+        for stage, record in result["stages"].items():
+            before_record = baseline["sizes"][size]["stages"].get(stage, {})
+            for metric in CHECKED_METRICS:
+                before, after = before_record.get(metric), record.get(metric)
+                if before is None or after is None:
+                    continue
+                if after > before * (1 + threshold) and after - before > NOISE_FLOORS[metric]:
+                    regressions.append((size, stage, metric, before, after))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Dataset sizes (default: the baseline sizes)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest is reported")
+    parser.add_argument("--seed", type=int, default=12)
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the report as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative increase reported as a regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.check:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    sizes = args.sizes or ([int(size) for size in baseline["sizes"]] if baseline else DEFAULT_SIZES)
+    report = run_benchmarks(sizes, repeat=args.repeat, seed=args.seed)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    if baseline is not None:
+        found = check_regressions(baseline, report, threshold=args.threshold)
+        for size, stage, metric, before, after in found:
+            print(f"REGRESSION {size} rows {stage}: {metric} {before:.3f} -> {after:.3f}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,107 @@
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+# Value sets and frequencies of the descriptor columns in the green taxi data
+RATE_CODES = ["Standard rate", "JFK", "Newark", "Nassau or Westchester", "Negotiated fare", "Group ride"]
+RATE_CODE_PROBS = [0.93, 0.01, 0.005, 0.005, 0.048, 0.002]
+PAYMENT_TYPES = ["Credit card", "Cash", "No charge", "Dispute", "Unknown"]
+PAYMENT_TYPE_PROBS = [0.62, 0.35, 0.02, 0.005, 0.005]
+TRAVEL_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PASSENGER_COUNTS = [1, 2, 3, 4, 5, 6]
+PASSENGER_COUNT_PROBS = [0.82, 0.1, 0.03, 0.02, 0.02, 0.01]
+
+# Share of trips per dropoff hour (quiet at night, peaks in the morning and late afternoon)
+HOUR_WEIGHTS = np.array([2, 1.5, 1, 0.8, 0.7, 1, 2, 3.5, 4.5, 4.5, 4.5, 4.7,
+                         5, 5.2, 5.5, 5.8, 6, 6.2, 6, 5.2, 4.5, 4, 3.5, 2.8])
+HOUR_WEIGHTS = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+
+
+def _generate_chunk(n_rows: int, rng: np.random.Generator, start: np.datetime64, n_days: int,
+                    categorical: bool, with_timestamp: bool) -> pd.DataFrame:
+    days = rng.integers(0, n_days, size=n_rows)
+    dropoff_hours = rng.choice(24, size=n_rows, p=HOUR_WEIGHTS)
+    seconds = days * 86400 + dropoff_hours * 3600 + rng.integers(0, 3600, size=n_rows)
+    dropoff = start + seconds.astype("timedelta64[s]")
+
+    trip_distance = np.round(rng.lognormal(mean=0.7, sigma=0.8, size=n_rows), 2)
+    duration = (trip_distance * rng.uniform(2.5, 5.0, size=n_rows) * 60).astype(np.int64)
+    pickup = dropoff - duration.astype("timedelta64[s]")
+
+    rate_codes = rng.choice(len(RATE_CODES), size=n_rows, p=RATE_CODE_PROBS)
+    payment_types = rng.choice(len(PAYMENT_TYPES), size=n_rows, p=PAYMENT_TYPE_PROBS)
+    # 1970-01-01 was a Thursday
+    weekdays = ((dropoff.astype("datetime64[D]").astype(np.int64) + 3) % 7).astype(np.int8)
+
+    passenger_count = rng.choice(PASSENGER_COUNTS, size=n_rows, p=PASSENGER_COUNT_PROBS).astype(float)
+    passenger_count[rng.random(n_rows) < 0.05] = np.nan
+
+    # Metered fare from distance and time, flat fares for the airport and negotiated rates
+    fare_amount = 3.0 + 1.75 * trip_distance + 0.5 * duration / 60 + rng.normal(0, 1.0, size=n_rows)
+    fare_amount = np.where(rate_codes == RATE_CODES.index("JFK"), 70.0, fare_amount)
+    fare_amount = np.where(rate_codes == RATE_CODES.index("Newark"), fare_amount + 20.0, fare_amount)
+    negotiated = rate_codes == RATE_CODES.index("Negotiated fare")
+    fare_amount[negotiated] = rng.uniform(10, 60, size=negotiated.sum())
+    fare_amount = np.round(np.clip(fare_amount, 2.5, None), 2)
+
+    def descriptor(codes: np.ndarray, values: list):
+        if categorical:
+            return pd.Categorical.from_codes(codes, categories=values)
+        return np.asarray(values, dtype=object)[codes]
+
+    dataset = pd.DataFrame({
+        "passenger_count": passenger_count,
+        "trip_distance": trip_distance,
+        "rate_code_des": descriptor(rate_codes, RATE_CODES),
+        "pmt_type_des": descriptor(payment_types, PAYMENT_TYPES),
+        "pu_hour": pickup.astype("datetime64[h]").astype(np.int64) % 24,
+        "do_hour": dropoff_hours.astype(np.int64),
+        "travel_day": descriptor(weekdays, TRAVEL_DAYS),
+        "fare_amount": fare_amount,
+    })
+    if with_timestamp:
+        dataset["lpep_dropoff_datetime"] = dropoff.astype("datetime64[ns]")
+
+    return dataset
+
+
+def iter_greentaxi_chunks(n_rows: int, chunk_size: int = 1_000_000, seed: int = 12,
+                          start_date: str = "2023-01-01", n_days: int = 31,
+                          categorical: bool = False, with_timestamp: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    This function yields a synthetic dataset with the columns of load_dataset_sql in chunks.
+    Every chunk has its own seed, so the rows do not depend on how many chunks are consumed.
+    Args:
+        n_rows: Total number of rows.
+        chunk_size: Number of rows per chunk.
+        seed: Seed of the random generator.
+        start_date: First dropoff day.
+        n_days: Number of dropoff days.
+        categorical: Return the descriptor columns as categoricals instead of strings.
+        with_timestamp: Add the lpep_dropoff_datetime column.
+    """
+    start = np.datetime64(start_date, "s")
+    for chunk_number, chunk_start in enumerate(range(0, n_rows, chunk_size)):
+        rng = np.random.default_rng([seed, chunk_number])
+        yield _generate_chunk(min(chunk_size, n_rows - chunk_start), rng, start, n_days, categorical, with_timestamp)
+
+
+def generate_greentaxi(n_rows: int, seed: int = 12, categorical: bool = False,
+                       with_timestamp: bool = False, chunk_size: int = 1_000_000) -> pd.DataFrame:
+    """
+    This function returns a synthetic dataset with the columns of load_dataset_sql.
+    Args:
+        n_rows: Number of rows to generate (10k to 50M; use categorical=True for the large sizes).
+        seed: Seed of the random generator.
+        categorical: Return the descriptor columns as categoricals instead of strings.
+        with_timestamp: Add the lpep_dropoff_datetime column.
+        chunk_size: Number of rows generated at a time.
+    Returns:
+        The synthetic dataset, with the dtypes pd.read_sql would return unless categorical is set.
+    """
+    chunks = list(iter_greentaxi_chunks(n_rows, chunk_size=chunk_size, seed=seed,
+                                        categorical=categorical, with_timestamp=with_timestamp))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
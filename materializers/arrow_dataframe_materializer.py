@@ -0,0 +1,54 @@
+import os
+import tempfile
+from typing import Any, Dict, Type
+
+import pandas as pd
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.utils import io_utils
+from utils.arrow_io import read_dataframe_ipc, write_dataframe_ipc
+from utils.profiling import record_written_bytes
+
+DATA_FILENAME = "data.arrow"
+
+
+class Arrow_DataFrame_Materializer(BaseMaterializer):
+    """
+    Materializer storing DataFrames as Arrow IPC files that are read back memory-mapped.
+    On a local artifact store, the steps consuming the artifact share the pages of one file
+    instead of each deserializing its own copy.
+    """
+
+    ASSOCIATED_TYPES = (pd.DataFrame,)
+    ASSOCIATED_ARTIFACT_TYPE = ArtifactType.DATA
+
+    def load(self, data_type: Type[Any]) -> pd.DataFrame:
+        path = os.path.join(self.uri, DATA_FILENAME)
+
+        if io_utils.is_remote(path):
+            # Remote files are copied to a local file first, which is then mapped
+            local_path = os.path.join(tempfile.mkdtemp(), DATA_FILENAME)
+            fileio.copy(path, local_path)
+            path = local_path
+
+        return read_dataframe_ipc(path)
+
+    def save(self, data: pd.DataFrame) -> None:
+        path = os.path.join(self.uri, DATA_FILENAME)
+
+        if io_utils.is_remote(path):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                local_path = os.path.join(tmp_dir, DATA_FILENAME)
+                nbytes = write_dataframe_ipc(data, local_path)
+                fileio.copy(local_path, path, overwrite=True)
+        else:
+            nbytes = write_dataframe_ipc(data, path)
+
+        record_written_bytes(nbytes)
+
+    def extract_metadata(self, data: pd.DataFrame) -> Dict[str, Any]:
+        return {
+            "shape": list(data.shape),
+            "in_memory_bytes": int(data.memory_usage(deep=True).sum()),
+        }
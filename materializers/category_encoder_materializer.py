@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Any, Dict, Type
+
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from utils.data_handling import Category_Encoder
+from utils.profiling import record_written_bytes
+
+DATA_FILENAME = "category_encoder.json"
+
+
+class Category_Encoder_Materializer(BaseMaterializer):
+    """
+    Materializer storing a fitted Category_Encoder as JSON, so it can be read without unpickling.
+    """
+
+    ASSOCIATED_TYPES = (Category_Encoder,)
+    ASSOCIATED_ARTIFACT_TYPE = ArtifactType.DATA
+
+    def load(self, data_type: Type[Any]) -> Category_Encoder:
+        with fileio.open(os.path.join(self.uri, DATA_FILENAME), "r") as encoder_file:
+            return Category_Encoder.from_dict(json.load(encoder_file))
+
+    def save(self, data: Category_Encoder) -> None:
+        content = json.dumps(data.to_dict())
+        with fileio.open(os.path.join(self.uri, DATA_FILENAME), "w") as encoder_file:
+            encoder_file.write(content)
+
+        record_written_bytes(len(content.encode("utf-8")))
+
+    def extract_metadata(self, data: Category_Encoder) -> Dict[str, Any]:
+        return {"n_features": len(data.feature_names)}
@@ -0,0 +1,50 @@
+import os
+import tempfile
+from typing import Any, Dict, Type
+
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.utils import io_utils
+from utils.compiled_tree import Compiled_Tree_Regressor
+from utils.profiling import record_written_bytes
+
+
+class Compiled_Tree_Materializer(BaseMaterializer):
+    """
+    Materializer storing a Compiled_Tree_Regressor as .npy arrays with a JSON sidecar.
+    Loading it maps the arrays and imports neither sklearn nor pickle.
+    """
+
+    ASSOCIATED_TYPES = (Compiled_Tree_Regressor,)
+    ASSOCIATED_ARTIFACT_TYPE = ArtifactType.MODEL
+
+    def load(self, data_type: Type[Any]) -> Compiled_Tree_Regressor:
+        if io_utils.is_remote(self.uri):
+            # Remote files are copied to a local directory first, which is then mapped
+            local_dir = tempfile.mkdtemp()
+            for file in fileio.listdir(self.uri):
+                fileio.copy(os.path.join(self.uri, str(file)), os.path.join(local_dir, str(file)))
+            return Compiled_Tree_Regressor.load(local_dir)
+
+        return Compiled_Tree_Regressor.load(self.uri)
+
+    def save(self, data: Compiled_Tree_Regressor) -> None:
+        if io_utils.is_remote(self.uri):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                data.save(tmp_dir)
+                nbytes = sum(os.path.getsize(os.path.join(tmp_dir, file)) for file in os.listdir(tmp_dir))
+                for file in os.listdir(tmp_dir):
+                    fileio.copy(os.path.join(tmp_dir, file), os.path.join(self.uri, file), overwrite=True)
+        else:
+            data.save(self.uri)
+            nbytes = sum(os.path.getsize(os.path.join(self.uri, file)) for file in os.listdir(self.uri))
+
+        record_written_bytes(nbytes)
+
+    def extract_metadata(self, data: Compiled_Tree_Regressor) -> Dict[str, Any]:
+        return {
+            "n_trees": data.n_trees,
+            "n_nodes": len(data.nodes),
+            "max_depth": int(data.depths.max(initial=0)),
+        }
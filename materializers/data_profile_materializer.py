@@ -0,0 +1,34 @@
+import json
+import os
+from typing import Any, Dict, Type
+
+from zenml.enums import ArtifactType
+from zenml.io import fileio
+from zenml.materializers.base_materializer import BaseMaterializer
+from utils.data_profile import Data_Profile
+from utils.profiling import record_written_bytes
+
+DATA_FILENAME = "data_profile.json"
+
+
+class Data_Profile_Materializer(BaseMaterializer):
+    """
+    Materializer storing a Data_Profile as JSON; its column statistics are recorded as artifact metadata.
+    """
+
+    ASSOCIATED_TYPES = (Data_Profile,)
+    ASSOCIATED_ARTIFACT_TYPE = ArtifactType.DATA_ANALYSIS
+
+    def load(self, data_type: Type[Any]) -> Data_Profile:
+        with fileio.open(os.path.join(self.uri, DATA_FILENAME), "r") as profile_file:
+            return Data_Profile.from_dict(json.load(profile_file))
+
+    def save(self, data: Data_Profile) -> None:
+        content = json.dumps(data.to_dict())
+        with fileio.open(os.path.join(self.uri, DATA_FILENAME), "w") as profile_file:
+            profile_file.write(content)
+
+        record_written_bytes(len(content.encode("utf-8")))
+
+    def extract_metadata(self, data: Data_Profile) -> Dict[str, Any]:
+        return data.summary()
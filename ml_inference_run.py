@@ -0,0 +1,5 @@
+from pipelines.ml_inference import ml_inference_pipeline
+
+if __name__ == "__main__":
+    # Run the batch inference pipeline
+    ml_inference_pipeline()
@@ -0,0 +1,22 @@
+import argparse
+from serving.model_server import Model_Server, make_http_server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve online predictions of the production reg_model.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=0.0)
+    parser.add_argument("--poll-seconds", type=float, default=30.0)
+    parser.add_argument("--compiled", action="store_true", help="Serve the compiled model of the version")
+    args = parser.parse_args()
+
+    # Serve the model version at the 'production' stage, swapped when a new version is promoted
+    model_server = Model_Server(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                                poll_seconds=args.poll_seconds, compiled=args.compiled).start()
+    http_server = make_http_server(model_server, host=args.host, port=args.port)
+    try:
+        http_server.serve_forever()
+    finally:
+        http_server.server_close()
+        model_server.stop()
@@ -0,0 +1,19 @@
+from zenml import pipeline
+from steps.inference.production_model import production_model_version
+from steps.inference.batch_inference import batch_inference
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+@pipeline(enable_cache=False)
+def ml_inference_pipeline(start_date: str = "2023-02-01",
+                          end_date: str = "2023-02-28",
+                          stage: str = "production",
+                          fetch_size: int = 100000,
+                          prediction_table: str = "greentaxi_predictions"):
+    model_version_id = production_model_version(stage = stage)
+    batch_inference(model_version_id = model_version_id,
+                    start_date = start_date,
+                    end_date = end_date,
+                    fetch_size = fetch_size,
+                    prediction_table = prediction_table)
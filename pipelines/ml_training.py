@@ -1,30 +1,92 @@
 from zenml import pipeline
+from zenml.model.model_version import ModelVersion
 from steps.data_load.data_loader import load_data
 from steps.data_load.data_split import train_data_split
-from steps.data_load.data_preprocessing import data_preprocessing
+from steps.data_load.data_preprocessing import data_preprocessing, fit_category_encoder
+from steps.data_load.feature_window import feature_window
+from steps.data_load.data_drift import data_drift_check
 from steps.training.ml_train import ml_model_train
+from steps.training.ml_incremental_train import ml_model_incremental_train
+from steps.training.ml_search import ml_model_search
 from steps.training.ml_evaluation import model_evaluation
 from steps.training.ml_model_registry import ml_model_registry
+from steps.training.ml_model_export import ml_model_compile
 from steps.promotion.model_promotion import model_promotion_flag
+from utils.stack import get_experiment_tracker_name
 from zenml.logger import get_logger
 
 logger = get_logger(__name__)
 
-@pipeline(enable_cache=False)
-def ml_training_pipeline(metric_threshold: float = 0.5):
-    df = load_data()
-    dataset_train, dataset_test = train_data_split(df)
-    dataset_train_preprocessed = data_preprocessing(dataset_train)
-    dataset_test_preprocessed = data_preprocessing(dataset_test)
-    trained_model = ml_model_train(dataset_train = dataset_train_preprocessed)
-    test_r2_score, test_rmse, test_mse = model_evaluation(model = trained_model, 
+
+# Every step runs on every run, so the loaded data is never older than the database. With the "cached" engine the
+# load only fetches the partitions whose row count, latest dropoff or checksum changed (utils.data_cache); the
+# training and evaluation steps memoize their computation by content (utils.memoization, disabled with
+# STEP_MEMOIZATION=0) and log to MLflow on every run.
+# Every run creates a version of the reg_model model, to which the outputs of the steps are linked: reg_model (and
+# compiled_model) as model artifacts, category_encoder and data_profile as data artifacts, which utils.model_cache
+# loads for inference, serving and the drift check.
+@pipeline(enable_cache=False, model_version=ModelVersion(name="reg_model"))
+def ml_training_pipeline(metric_threshold: float = 0.5,
+                         start_date: str = "2023-01-01",
+                         end_date: str = "2023-01-31",
+                         load_engine: str = "read_sql",
+                         hyperparameter_search: bool = False,
+                         split_mode: str = "random",
+                         feature_store: bool = False,
+                         incremental: bool = False,
+                         history_start_date: str = "2023-01-01",
+                         compile_model: bool = False,
+                         drift_gate: bool = False,
+                         max_drift_psi: float = 0.25,
+                         max_drift_ks: float = 0.2):
+    # Resolved when the pipeline is composed (once per process), not when the step modules are imported
+    experiment_tracker = get_experiment_tracker_name()
+
+    # The time-ordered split and the feature store (partitioned by dropoff day) need the dropoff
+    # timestamps, which the preprocessing drops again
+    with_dropoff = split_mode == "time" or feature_store
+    df, data_profile = load_data(start_date = start_date, end_date = end_date, engine = load_engine,
+                                 with_dropoff = with_dropoff)
+    # Compares the profiles only (recorded at load time), no pass over the data; not run without the gate
+    drift_ok = True
+    if drift_gate:
+        drift_ok = data_drift_check(profile = data_profile, max_psi = max_drift_psi, max_ks = max_drift_ks)
+    train_index, test_index = train_data_split(df, mode = split_mode)
+    category_encoder = fit_category_encoder(dataset = df, index = train_index)
+    if feature_store:
+        dataset_train_preprocessed, dataset_test_preprocessed = feature_window(dataset = df,
+                                                                               encoder = category_encoder,
+                                                                               train_index = train_index,
+                                                                               test_index = test_index)
+    else:
+        dataset_train_preprocessed = data_preprocessing(dataset = df, index = train_index, encoder = category_encoder)
+        dataset_test_preprocessed = data_preprocessing(dataset = df, index = test_index, encoder = category_encoder)
+    if hyperparameter_search:
+        trained_model, _ = ml_model_search.with_options(experiment_tracker = experiment_tracker)(
+            dataset_train = dataset_train_preprocessed)
+    elif incremental:
+        # start_date and end_date select the new date partitions only; the days from history_start_date are
+        # loaded by the step only for a full retraining
+        trained_model = ml_model_incremental_train.with_options(experiment_tracker = experiment_tracker)(
+            dataset_train = dataset_train_preprocessed, encoder = category_encoder,
+            start_date = start_date, history_start_date = history_start_date)
+    else:
+        trained_model = ml_model_train.with_options(experiment_tracker = experiment_tracker)(
+            dataset_train = dataset_train_preprocessed)
+    test_r2_score, test_rmse, test_mse = model_evaluation.with_options(experiment_tracker = experiment_tracker)(
+                                                          model = trained_model, 
                                                           dataset_train = dataset_train_preprocessed, 
                                                           dataset_test = dataset_test_preprocessed,
                                                           train_r2_threshold = metric_threshold,
                                                           test_r2_threshold = metric_threshold
                                                         )
             
-    promoted = model_promotion_flag(r2_score = test_r2_score)
+    if compile_model:
+        # Tree models only; the compiled arrays are checked against the model predictions on the test dataset
+        ml_model_compile(model = trained_model, dataset = dataset_test_preprocessed)
+
+    promoted = model_promotion_flag(r2_score = test_r2_score, threshold = metric_threshold,
+                                    drift_ok = drift_ok)
     ml_model_registry(model = trained_model, promoted = promoted)
 
     
\ No newline at end of file
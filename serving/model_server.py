@@ -0,0 +1,358 @@
+import json
+import queue
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sklearn.base import RegressorMixin
+from zenml.logger import get_logger
+
+from utils.data_handling import Category_Encoder
+
+logger = get_logger(__name__)
+
+
+class Feature_Lookup:
+    """
+    Class that encodes raw trip records into the feature matrix of a model with precomputed lookup tables.
+
+    Every numeric feature maps to its column, and every (categorical column, value) pair maps to the
+    column of its indicator, so a record is encoded with a few dictionary lookups instead of a
+    pandas get_dummies round-trip.
+    """
+
+    def __init__(self, feature_names: list, encoder: Category_Encoder, dtype: type = np.float32):
+        """
+        Args:
+            feature_names: Features of the model, in the column order it was fitted with.
+            encoder: Encoder fitted on the training dataset of the model.
+            dtype: dtype of the feature matrix.
+        """
+        positions = {name: position for position, name in enumerate(feature_names)}
+
+        # {column: {value: indicator position}}; values the model was not trained with have no entry
+        self.indicators = {
+            col: {str(category): positions[f"{col}_{category}"]
+                  for category in encoder.vocabularies[col] if f"{col}_{category}" in positions}
+            for col in encoder.cols
+        }
+        encoded = {f"{col}_{category}" for col in encoder.cols for category in encoder.vocabularies[col]}
+        self.numeric = [(name, position) for name, position in positions.items() if name not in encoded]
+        self.n_features = len(feature_names)
+        self.dtype = dtype
+
+    def encode(self, records: List[dict]) -> np.ndarray:
+        """
+        This function returns the feature matrix of raw records (dicts of the load_dataset_sql columns).
+        Missing numeric fields are NaN; unknown or missing categories set no indicator. A record that is not
+        a dict raises a TypeError, a numeric field that is not a number a ValueError or a TypeError.
+        """
+        X = np.zeros((len(records), self.n_features), dtype=self.dtype)
+
+        for row, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise TypeError(f"Record {row} is a {type(record).__name__}, not an object")
+            for name, position in self.numeric:
+                value = record.get(name)
+                X[row, position] = np.nan if value is None else value
+            for col, lookup in self.indicators.items():
+                position = lookup.get(str(record.get(col)))
+                if position is not None:
+                    X[row, position] = 1
+
+        return X
+
+
+class Served_Model(NamedTuple):
+    """
+    The model version being served, swapped as one reference.
+    """
+    version: str
+    model: RegressorMixin
+    lookup: Feature_Lookup
+
+
+class Encoded_Request(NamedTuple):
+    """
+    The feature matrix of a request, with the served model whose lookup encoded it.
+    """
+    served: Served_Model
+    X: np.ndarray
+
+
+class _Pending(NamedTuple):
+    request: Encoded_Request
+    future: Future
+
+
+class Model_Server:
+    """
+    Class that serves online predictions of the production model.
+
+    Requests are encoded by the threads receiving them (so an invalid request fails alone), queued, and a
+    single batcher thread stacks the queued feature matrices (up to max_batch_size records) into one
+    vectorized predict call: while a batch is predicted the next
+    requests queue up, so batches grow with the load without delaying requests at low load. A watcher thread
+    polls the model version at the stage and, when it changes, loads the new version in the
+    background and swaps it in atomically: every batch is predicted by exactly one version.
+    Stopping the server fails the requests still queued with a RuntimeError("server stopped"), and the
+    requests made after it, instead of leaving them to their timeout.
+    """
+
+    def __init__(self, model_name: str = "reg_model", stage: str = "production",
+                 max_batch_size: int = 256, max_wait_ms: float = 0.0, poll_seconds: float = 30.0,
+                 compiled: bool = False,
+                 resolve_version: Optional[Callable[[], str]] = None,
+                 load_version: Optional[Callable[[str], Tuple[RegressorMixin, Category_Encoder]]] = None):
+        """
+        Args:
+            model_name: Name of the model.
+            stage: Stage of the model version served.
+            max_batch_size: Maximum number of records per predict call.
+            max_wait_ms: Extra time the batcher waits for more requests after the first one of a batch
+                (0: only the requests already queued are merged).
+            poll_seconds: Interval between two checks of the model version at the stage.
+            compiled: Serve the compiled model of the version (utils.compiled_tree) when it has one, which loads
+                without sklearn and predicts small batches with a Python loop instead of sklearn's checks.
+            resolve_version: Returns the version id to serve. The version at the stage in the ZenML model control plane when None.
+            load_version: Returns (model, encoder) of a version id. Loaded with utils.model_cache when None.
+        """
+        if resolve_version is None or load_version is None:
+            from utils.model_cache import load_model_version, resolve_model_version
+
+            resolve_version = resolve_version or (lambda: resolve_model_version(model_name, stage))
+            load_version = load_version or (lambda version_id: load_model_version(model_name, version_id,
+                                                                                  compiled=compiled)[2:])
+
+        self.resolve_version = resolve_version
+        self.load_version = load_version
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.poll_seconds = poll_seconds
+
+        self._served = None
+        self._requests = queue.Queue()
+        self._stopped = threading.Event()
+        # Held to queue a request and to stop, so that no request is queued once the queue is drained
+        self._queue_lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def version(self) -> Optional[str]:
+        served = self._served
+        return served.version if served is not None else None
+
+    def _load(self, version: str) -> Served_Model:
+        model, encoder = self.load_version(version)
+        return Served_Model(version, model, Feature_Lookup(list(model.feature_names_in_), encoder))
+
+    def refresh(self) -> bool:
+        """
+        This function swaps in the version at the stage when it has changed, and returns whether it did.
+        The new version is fully loaded before the swap, so requests never wait for a load.
+        """
+        version = self.resolve_version()
+        if version == self.version:
+            return False
+
+        served = self._load(version)
+        # A single reference assignment: batches see either the old or the new version, never a mix
+        self._served = served
+        logger.info(f"Serving model version {version}")
+        return True
+
+    def start(self) -> "Model_Server":
+        """
+        This function loads the current version and starts the batcher and watcher threads.
+        """
+        self.refresh()
+        self._stopped.clear()
+        self._threads = [threading.Thread(target=self._batch_loop, name="model-batcher", daemon=True),
+                         threading.Thread(target=self._watch_loop, name="model-watcher", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        This function stops the threads, after the batch being predicted, and fails the requests still queued.
+        """
+        with self._queue_lock:
+            self._stopped.set()
+        self._requests.put(None)
+        for thread in self._threads:
+            thread.join()
+
+        while True:
+            try:
+                pending = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                pending.future.set_exception(RuntimeError("server stopped"))
+
+    def encode(self, records: List[dict]) -> Encoded_Request:
+        """
+        This function returns the feature matrix of records, encoded for the version served now.
+        Invalid records raise a ValueError or a TypeError (see Feature_Lookup.encode).
+        """
+        served = self._served
+        if served is None:
+            raise RuntimeError("No model version is served")
+        return Encoded_Request(served, served.lookup.encode(records))
+
+    def predict_encoded(self, request: Encoded_Request, timeout: float = 10.0) -> Tuple[List[float], str]:
+        """
+        This function queues an encoded request for the next batch and returns (predictions, model version).
+        """
+        future = Future()
+        with self._queue_lock:
+            if self._stopped.is_set():
+                raise RuntimeError("server stopped")
+            self._requests.put(_Pending(request, future))
+        return future.result(timeout=timeout)
+
+    def predict(self, records: List[dict], timeout: float = 10.0) -> Tuple[List[float], str]:
+        """
+        This function encodes records, queues them for the next batch and returns (predictions, model version).
+        """
+        return self.predict_encoded(self.encode(records), timeout=timeout)
+
+    def _next_batch(self) -> List[_Pending]:
+        """
+        This function waits for a request, then collects the requests arriving within max_wait_ms.
+        """
+        first = self._requests.get()
+        if first is None:
+            return []
+
+        batch, n_records = [first], len(first.request.X)
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while n_records < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                pending = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self._stopped.set()
+                break
+            batch.append(pending)
+            n_records += len(pending.request.X)
+
+        return batch
+
+    def _batch_loop(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            # Requests encoded before a version swap are predicted by the version that encoded them,
+            # so every predict call stacks the requests of one version
+            by_version = {}
+            for pending in batch:
+                by_version.setdefault(id(pending.request.served), []).append(pending)
+            for group in by_version.values():
+                self._predict_group(group)
+
+    @staticmethod
+    def _predict_group(group: List[_Pending]) -> None:
+        """
+        This function predicts the stacked feature matrices of requests encoded for the same version.
+        """
+        served = group[0].request.served
+        try:
+            X = np.concatenate([pending.request.X for pending in group])
+            # Feature arrays carry no column names; the column order is set by the lookup
+            with warnings.catch_warnings():
+                warnings.filterwarnings("ignore", message="X does not have valid feature names")
+                predictions = served.model.predict(X).tolist() if len(X) else []
+        except Exception as error:
+            logger.error(f"Error found in predicting a batch of {len(group)} requests: {error}")
+            for pending in group:
+                pending.future.set_exception(error)
+            return
+
+        start = 0
+        for pending in group:
+            end = start + len(pending.request.X)
+            pending.future.set_result((predictions[start:end], served.version))
+            start = end
+
+    def _watch_loop(self) -> None:
+        while not self._stopped.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as error:
+                # Keep serving the current version
+                logger.error(f"Error found in refreshing the served model: {error}")
+
+
+def make_http_server(model_server: Model_Server, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """
+    This function returns the HTTP server of a started Model_Server.
+
+    Endpoints:
+        POST /predict  {"instances": [{<load_dataset_sql columns>}, ...]} (or a single record)
+                       -> {"predictions": [...], "model_version": "..."}
+        GET  /health   -> {"status": "ok", "model_version": "..."}
+    """
+
+    class Prediction_Handler(BaseHTTPRequestHandler):
+        # Keep-alive connections, so that clients do not pay a TCP handshake per request
+        protocol_version = "HTTP/1.1"
+        # Headers and body are written separately; without TCP_NODELAY the body waits for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def _reply(self, status: int, body: dict) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"status": "ok", "model_version": model_server.version})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                records = body["instances"] if isinstance(body, dict) and "instances" in body else [body]
+                if not isinstance(records, list):
+                    raise TypeError("instances is not a list")
+                # Encoded here, so that an invalid request gets its own 400 instead of failing a whole batch
+                request = model_server.encode(records)
+            except (ValueError, TypeError) as error:
+                self._reply(400, {"error": f"invalid request: {error}"})
+                return
+            except Exception as error:
+                self._reply(500, {"error": str(error)})
+                return
+            try:
+                predictions, version = model_server.predict_encoded(request)
+            except Exception as error:
+                self._reply(500, {"error": str(error)})
+                return
+            self._reply(200, {"predictions": predictions, "model_version": version})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    class Prediction_Server(ThreadingHTTPServer):
+        # Many clients connect at once; the default backlog of 5 resets their connections
+        request_queue_size = 128
+        daemon_threads = True
+
+    return Prediction_Server((host, port), Prediction_Handler)
@@ -0,0 +1,67 @@
+from zenml import step, log_artifact_metadata
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from utils.data_profile import Data_Profile
+from typing_extensions import Annotated
+
+logger = get_logger(__name__)
+
+@step(enable_cache=False)
+@profile_step
+def data_drift_check(profile: Data_Profile,
+                     model_name: str = "reg_model",
+                     stage: str = "production",
+                     max_psi: float = 0.25,
+                     max_ks: float = 0.2) -> Annotated[bool, "drift_ok"]:
+    """
+    This step compares the profile of the loaded dataset with the profile of the data the model version at
+    the stage was trained on, and returns whether the drift is acceptable (see Drift_Gate).
+    Only the two profiles are read, no dataset. Without a version at the stage, or a profile linked
+    to it, there is nothing to compare with and the check passes.
+
+    Args:
+        profile: Profile of the loaded dataset (from load_data).
+        model_name: Name of the model.
+        stage: Stage of the model version whose training profile is the reference.
+        max_psi: Largest population stability index of a column.
+        max_ks: Largest Kolmogorov-Smirnov statistic of a column.
+
+    Returns:
+        True when every column is within the limits.
+    """
+    try:
+        from utils.data_profile import Drift_Gate, drift_scores, finite_metadata
+        from utils.model_cache import load_version_profile, resolve_model_version
+
+        try:
+            version_id = resolve_model_version(model_name, stage)
+        except KeyError:
+            logger.info(f"No model version at the '{stage}' stage, no reference profile to compare with")
+            return True
+
+        reference = load_version_profile(model_name, version_id)
+        if reference is None:
+            return True
+
+        scores = drift_scores(reference, profile)
+        passed, reasons = Drift_Gate(max_psi=max_psi, max_ks=max_ks).check(scores)
+        for col, score in scores.items():
+            logger.info(f"Drift of {col} from the '{stage}' training data: psi {score['psi']:.4f}, ks {score['ks']:.4f}")
+        if not passed:
+            logger.warning(f"Data drift from the '{stage}' training data: {'; '.join(reasons)}")
+
+        log_artifact_metadata(
+            metadata = finite_metadata({
+                "reference_version": version_id,
+                "psi": {col: score["psi"] for col, score in scores.items()},
+                "ks": {col: score["ks"] for col, score in scores.items()},
+                "drift_reasons": reasons,
+            }),
+            artifact_name = "drift_ok",
+        )
+
+        return passed
+
+    except Exception as error:
+        logger.error(f"Error found in the data drift check: {error}")
+        raise error
@@ -1,24 +1,83 @@
 import pandas as pd
 from zenml import step
 from zenml.logger import get_logger
-from utils.data_handling import Data_Load_from_DB
+from utils.profiling import profile_step
+from materializers.arrow_dataframe_materializer import Arrow_DataFrame_Materializer
+from materializers.data_profile_materializer import Data_Profile_Materializer
+from utils.data_handling import (Data_Load_from_DB, Data_Load_from_DB_Cached, Data_Load_from_DB_Copy,
+                                 Data_Load_from_DB_Partitioned, Data_Load_from_DB_Pushdown,
+                                 Data_Load_from_DB_Stream)
+from utils.data_profile import Data_Profile
+from typing_extensions import Annotated
+from typing import Tuple
 
 logger = get_logger(__name__)
 
-@step
-def load_data() -> pd.DataFrame:
+
+@step(output_materializers={"dataset": Arrow_DataFrame_Materializer, "data_profile": Data_Profile_Materializer})
+@profile_step
+def load_data(start_date: str = "2023-01-01",
+              end_date: str = "2023-01-31",
+              engine: str = "read_sql",
+              fetch_size: int = 50000,
+              partition_freq: str = "day",
+              max_workers: int = 4,
+              with_dropoff: bool = False,
+              verify_cache: bool = False) -> Tuple[
+    Annotated[pd.DataFrame, "dataset"],
+    Annotated[Data_Profile, "data_profile"]]:
     """
-    Load dataset from database.
+    Load dataset from database, with the profile of its columns (utils.data_profile).
 
-    Args: None
+    Args:
+        start_date: First dropoff day of the dataset (ISO format).
+        end_date: Last dropoff day of the dataset (ISO format), inclusive.
+        engine: How the dataset is extracted: "read_sql" (one pd.read_sql call),
+            "stream" (chunks from a server-side cursor), "copy" (COPY ... TO STDOUT)
+            "partitioned" (date partitions fetched concurrently), "cached" (daily partitions
+            kept in a local Parquet cache, only new or changed partitions are fetched, see verify_cache)
+            or "pushdown" (categorical columns returned as integer codes by the database).
+        fetch_size: Number of rows per chunk when engine is "stream".
+        partition_freq: Partition length ("day" or "week") when engine is "partitioned".
+        max_workers: Number of concurrent partition queries when engine is "partitioned" or "cached".
+        with_dropoff: Also load the lpep_dropoff_datetime column, used by the time-ordered split.
+        verify_cache: When engine is "cached", check every cached partition against the database instead of
+            the partitions from the day of the cached watermark on (older days are assumed not to change).
 
-    Returns: pd.DataFrame
+    Returns:
+        The dataset and its profile. The "stream" engine profiles every chunk as it arrives; the other
+        engines profile the loaded dataset in one pass.
     """
 
-    try: 
-        data_from_db = Data_Load_from_DB()
-        df = data_from_db.data_handling()
-        return df
+    try:
+        if engine == "stream":
+            data_from_db = Data_Load_from_DB_Stream(start_date, end_date, fetch_size=fetch_size,
+                                                    with_dropoff=with_dropoff)
+        elif engine == "copy":
+            data_from_db = Data_Load_from_DB_Copy(start_date, end_date, with_dropoff=with_dropoff)
+        elif engine == "partitioned":
+            data_from_db = Data_Load_from_DB_Partitioned(start_date, end_date,
+                                                         partition_freq=partition_freq,
+                                                         max_workers=max_workers,
+                                                         with_dropoff=with_dropoff)
+        elif engine == "cached":
+            data_from_db = Data_Load_from_DB_Cached(start_date, end_date, max_workers=max_workers,
+                                                    verify=verify_cache, with_dropoff=with_dropoff)
+        elif engine == "pushdown":
+            data_from_db = Data_Load_from_DB_Pushdown(start_date, end_date, with_dropoff=with_dropoff)
+        elif engine == "read_sql":
+            data_from_db = Data_Load_from_DB(start_date, end_date, with_dropoff=with_dropoff)
+        else:
+            raise ValueError(f"Unknown data load engine: {engine}")
+
+        profile = Data_Profile()
+        if engine == "stream":
+            df = data_from_db.data_handling(profile=profile)
+        else:
+            df = data_from_db.data_handling()
+            profile.update(df)
+
+        return df, profile
     except Exception as error:
         logger.error(f"Error found: {error}")
-        raise error
\ No newline at end of file
+        raise error
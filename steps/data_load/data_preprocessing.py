@@ -1,23 +1,62 @@
 from zenml import step
 from zenml.logger import get_logger
+from utils.profiling import profile_step
+import numpy as np
 import pandas as pd
-from utils.data_handling import Data_Preprocessing
+from materializers.arrow_dataframe_materializer import Arrow_DataFrame_Materializer
+from materializers.category_encoder_materializer import Category_Encoder_Materializer
+from utils.arrow_io import take_rows
+from utils.data_handling import Category_Encoder, Data_Preprocessing
+from utils.schema import CATEGORICAL_COLS
 from typing_extensions import Annotated
+from typing import Optional
 
 logger = get_logger(__name__)
 
-@step
-def data_preprocessing(dataset: pd.DataFrame) -> Annotated[pd.DataFrame, "dataset_preprocessed"]:
+@step(output_materializers=Category_Encoder_Materializer)
+@profile_step
+def fit_category_encoder(dataset: pd.DataFrame, index: Optional[np.ndarray] = None) -> Annotated[Category_Encoder, "category_encoder"]:
+    """
+    This step returns the one-hot encoder fitted on the training dataset.
+    The encoder is persisted so that the test dataset and inference reuse the same vocabularies.
+    Args:
+        dataset: Dataset loaded from database.
+        index: Row positions of the training dataset. All rows when None.
+    Returns:
+        The fitted encoder.
+    """
+    try:
+        # Only the encoded columns of the training rows are read by the fit
+        dataset = dataset[CATEGORICAL_COLS]
+        if index is not None:
+            dataset = dataset.iloc[index]
+
+        encoder = Data_Preprocessing().fit_encoder(dataset, cols=CATEGORICAL_COLS)
+        logger.info(f"Category encoder fitted with {len(encoder.feature_names)} indicator columns")
+        return encoder
+    except Exception as error:
+        logger.error(f"Error found in fitting the category encoder: {error}")
+        raise error
+
+@step(output_materializers=Arrow_DataFrame_Materializer)
+@profile_step
+def data_preprocessing(dataset: pd.DataFrame, index: Optional[np.ndarray] = None,
+                       encoder: Optional[Category_Encoder] = None) -> Annotated[pd.DataFrame, "dataset_preprocessed"]:
     """
     This step returns the datasets preprocessed for training and evaluation.
     Args:
-        dataset: Dataset from data split process.
+        dataset: Dataset loaded from database.
+        index: Row positions of the split to preprocess (from the data split process). All rows when None.
+        encoder: Encoder fitted on the training dataset. The categories are found with pd.get_dummies when None.
     Returns:
         The datasets include datasets preprocessed.
     """
     try:
+        if index is not None:
+            dataset = take_rows(dataset, index)
+
         df = Data_Preprocessing()
-        ml_data_encoded =  df.data_handling(dataset)
+        ml_data_encoded =  df.data_handling(dataset, encoder=encoder)
         return ml_data_encoded
     except Exception as error:
         logger.error(f"Error found in the data preprocessing step: {error}")
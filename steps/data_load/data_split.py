@@ -1,5 +1,7 @@
 from zenml import step
 from zenml.logger import get_logger
+from utils.profiling import profile_step
+import numpy as np
 import pandas as pd
 from utils.data_handling import Data_Split
 from typing_extensions import Annotated
@@ -8,22 +10,32 @@ from typing import Tuple
 logger = get_logger(__name__)
 
 @step
+@profile_step
 def train_data_split(
-    dataset: pd.DataFrame) -> Tuple[
-    Annotated[pd.DataFrame, "dataset_train"],
-    Annotated[pd.DataFrame, "dataset_test"]
+    dataset: pd.DataFrame,
+    mode: str = "random",
+    test_size: float = 0.2,
+    n_bins: int = 10) -> Tuple[
+    Annotated[np.ndarray, "train_index"],
+    Annotated[np.ndarray, "test_index"]
     ]:
     """
-    This step returns the datasets split for training and testing.
+    This step returns the row positions of the datasets split for training and testing.
+    The splits are stored as index arrays over the loaded dataset rather than as copies of its rows.
     Args:
         dataset: Dataset loaded from database.
+        mode: "random", "stratified" (by target quantile bins) or "time" (latest dropoffs held out,
+            needs the dataset loaded with the dropoff timestamp).
+        test_size: Fraction of the rows in the test split.
+        n_bins: Number of target quantile bins when mode is "stratified".
     Returns:
-        The datasets include dataset_train, dataset_test.
+        The index arrays train_index, test_index.
     """
     try:
         data_split = Data_Split()
-        dataset_train, dataset_test =  data_split.data_handling(dataset)
-        return dataset_train, dataset_test
+        train_index, test_index = data_split.split_indices(dataset, test_size=test_size, mode=mode, n_bins=n_bins)
+        logger.info(f"{mode} split: {len(train_index)} training rows, {len(test_index)} test rows")
+        return train_index, test_index
     except Exception as error:
         logger.error(f"Error found: {error}")
         raise error
@@ -0,0 +1,46 @@
+from zenml import step
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+import numpy as np
+import pandas as pd
+from materializers.arrow_dataframe_materializer import Arrow_DataFrame_Materializer
+from utils.arrow_io import take_rows
+from utils.data_handling import Category_Encoder
+from utils.feature_store import Feature_Store
+from typing_extensions import Annotated
+from typing import Optional, Tuple
+
+logger = get_logger(__name__)
+
+@step(output_materializers=Arrow_DataFrame_Materializer)
+@profile_step
+def feature_window(dataset: pd.DataFrame,
+                   encoder: Category_Encoder,
+                   train_index: np.ndarray,
+                   test_index: np.ndarray,
+                   store_dir: Optional[str] = None,
+                   max_store_mb: float = 4096) -> Tuple[
+    Annotated[pd.DataFrame, "dataset_train_preprocessed"],
+    Annotated[pd.DataFrame, "dataset_test_preprocessed"]
+    ]:
+    """
+    This step returns the preprocessed training and test datasets from the feature store.
+    The encoded matrix of every dropoff day is read from the store when it was computed before
+    with the same encoder from the same rows; only the other days are preprocessed (and stored).
+    Args:
+        dataset: Dataset loaded from database with the dropoff timestamps.
+        encoder: Encoder fitted on the training dataset.
+        train_index: Row positions of the training dataset.
+        test_index: Row positions of the test dataset.
+        store_dir: Feature store directory (see Feature_Store).
+        max_store_mb: Store size above which the least recently used days are evicted.
+    Returns:
+        The preprocessed datasets dataset_train_preprocessed, dataset_test_preprocessed.
+    """
+    try:
+        store = Feature_Store(store_dir, max_size_mb=max_store_mb)
+        features, positions = store.features(dataset, encoder)
+        return take_rows(features, positions[train_index]), take_rows(features, positions[test_index])
+    except Exception as error:
+        logger.error(f"Error found in assembling the feature window: {error}")
+        raise error
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zenml import step
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from utils.data_handling import Data_Load_from_DB, Data_Load_from_DB_Stream
+from utils.model_cache import load_model_version
+from utils.model_inference import Batch_Scorer, copy_predictions, predictions_csv
+from utils.sql import build_predictions_table_sql
+from typing_extensions import Annotated
+
+logger = get_logger(__name__)
+
+@step(enable_cache=False)
+@profile_step
+def batch_inference(model_version_id: str,
+                    start_date: str = "2023-02-01",
+                    end_date: str = "2023-02-28",
+                    model_name: str = "reg_model",
+                    fetch_size: int = 100000,
+                    n_jobs: int = 1,
+                    prediction_table: str = "greentaxi_predictions") -> Annotated[int, "n_predictions"]:
+    """
+    This step scores the greentaxi trips of a dropoff date window and writes the predictions back to Postgres.
+
+    Trips are streamed from a server-side cursor in chunks of fetch_size rows, encoded with the
+    encoder of the model version and predicted chunk by chunk. The predictions of every chunk are
+    bulk-loaded with COPY ... FROM STDIN while the next chunk is fetched and scored; all chunks
+    are committed in one transaction.
+
+    Args:
+        model_version_id: Id of the model version to score with (from production_model_version).
+        start_date: First dropoff day of the trips to score (ISO format).
+        end_date: Last dropoff day of the trips to score (ISO format), inclusive.
+        model_name: Name of the model.
+        fetch_size: Number of trips per chunk.
+        n_jobs: Number of threads predicting chunks concurrently.
+        prediction_table: Table the predictions are written to (created when it does not exist).
+
+    Returns:
+        The number of trips scored.
+    """
+    conn = None
+    try:
+        # Deserialized once per process and model version
+        loaded_model = load_model_version(model_name, model_version_id)
+        scorer = Batch_Scorer(loaded_model.model, loaded_model.encoder)
+        model_version = str(loaded_model.version_number or model_version_id)
+
+        trips = Data_Load_from_DB_Stream(start_date, end_date, fetch_size=fetch_size,
+                                         cursor_name="greentaxi_inference", with_dropoff=True)
+
+        conn = Data_Load_from_DB._connect()
+        with conn.cursor() as cursor:
+            cursor.execute(build_predictions_table_sql(prediction_table))
+
+        n_predictions = 0
+        started = time.perf_counter()
+
+        # One COPY in flight in the writer thread while the next chunk is fetched and scored
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for chunk, predictions in scorer.score_chunks(trips.iter_chunks(), n_jobs=n_jobs):
+                buffer = predictions_csv(chunk, predictions, model_version)
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(copy_predictions, conn, buffer, prediction_table)
+                n_predictions += len(chunk)
+            if pending is not None:
+                pending.result()
+
+        conn.commit()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Scored {n_predictions} trips with {model_name} version {model_version} in {elapsed:.1f}s "
+                    f"({n_predictions / max(elapsed, 1e-9):.0f} rows/sec)")
+
+        return n_predictions
+
+    except Exception as error:
+        if conn is not None:
+            conn.rollback()
+        logger.error(f"Error found in the batch inference: {error}")
+        raise error
+
+    finally:
+        if conn is not None:
+            conn.close()
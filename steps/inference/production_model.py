@@ -0,0 +1,29 @@
+from zenml import step
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from utils.model_cache import resolve_model_version
+from typing_extensions import Annotated
+
+logger = get_logger(__name__)
+
+@step(enable_cache=False)
+@profile_step
+def production_model_version(model_name: str = "reg_model",
+                             stage: str = "production") -> Annotated[str, "model_version_id"]:
+    """
+    This step returns the id of the model version at the stage set by model_promotion_flag.
+
+    Args:
+        model_name: Name of the model.
+        stage: The stage of the model to score with. Default value is production
+
+    Returns:
+        The id of the model version.
+    """
+    try:
+        version_id = resolve_model_version(model_name, stage)
+        logger.info(f"Model version at the '{stage}' stage: {version_id}")
+        return version_id
+    except Exception as error:
+        logger.error(f"Error found in finding the '{stage}' model version: {error}")
+        raise error
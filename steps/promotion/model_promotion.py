@@ -1,93 +1,73 @@
 from zenml import step
-from zenml.client import Client
 from zenml.logger import get_logger
-# from zenml import ModelVersion
-from zenml.model.model_version import ModelVersion
+from utils.profiling import profile_step
+from utils.model_promotion import Model_Promotion_Service, ZenML_Model_Registry
 
 logger = get_logger(__name__)
 
+# Created on first use and kept by the process, so that the production snapshot is cached across runs
+_promotion_services = {}
+
+
+def get_promotion_service(model_name: str = "reg_model", threshold: float = 0.5,
+                          ttl_seconds: float = 60.0) -> Model_Promotion_Service:
+    """
+    This function returns the promotion service of a model in the ZenML model control plane.
+    """
+    key = (model_name, threshold, ttl_seconds)
+    if key not in _promotion_services:
+        _promotion_services[key] = Model_Promotion_Service(ZenML_Model_Registry(), model_name=model_name,
+                                                           metric="test_r2_score", threshold=threshold,
+                                                           ttl_seconds=ttl_seconds)
+    return _promotion_services[key]
+
+
 @step
+@profile_step
 def model_promotion_flag(r2_score: float, 
                         stage: str = "production",
-                        threshold: float = 0.5) -> bool:
+                        threshold: float = 0.5,
+                        model_name: str = "reg_model",
+                        drift_ok: bool = True,
+                        stage_cache_seconds: float = 60.0) -> bool:
     """
     This step promotes the model based on the stage and r2 score
     If the r2 score is below the pre-defined threshold, the model is not promoted. 
     If r2 score is above this threshold, the model is promoted to the 'production' stage specified. 
     In the case that there is an existing model in the 'production' stage, the model with the higher r2 score
-    wil be promoted.
+    wil be promoted; a model that does not improve on it is set to the 'staging' stage.
+
+    The model version at the stage is cached by the promotion service for stage_cache_seconds, and
+    dropped from the cache when the service moves a version to the stage. The stage transition is a
+    single registry call (the previous version at the stage is archived by the same call).
 
     Args:
         r2_score: r2 score of the model.
         stage: the stage to promote the model to. Default value is production
+        threshold: Minimum r2 score of a promoted model.
+        model_name: Name of the model.
+        drift_ok: Result of data_drift_check. A model trained on data that drifted from the data of the
+            production model is not promoted, whatever its r2 score.
+        stage_cache_seconds: Time the version at the stage is cached by the process. A promotion made by
+            another process is only seen when it expires; 0 reads the stage on every run.
 
     Returns:
         Decide if model was promoted or not (True: promoted and False: not promoted).
     """
-    
-    promoted = False
-
-    if r2_score < threshold:
-        logger.info(
-            f"Model's R2 score: {r2_score} is below pre-defined threshold, therefore model is not promoted."
-        )
-    else:
-        # Get the model in the current context
-        if r2_score > threshold:
-    
-            try:
-                current_model_version = ModelVersion(name = "reg_model")
-                current_version_number = current_model_version.number
-                logger.info(f"Current version of the newly-trained model is: {current_version_number}")
-
-                # if current_model_version:
-                #     try:
-                #         current_model_version = get_step_context().model_version
-                #     except Exception as error:
-                #         raise error
-
-                # # Set the model at 'staging' stage
-                # # Get the model in the current context
-                current_model_version.set_stage(stage="staging", force=True)
-                logger.info("Setting the 'staging' stage of model after training the model")
-
-            except Exception as error:
-                logger.info(f"Error found in setting the 'staging' stage of model after training the model: {error}")
-                raise error
-
-        # Get the model that is in the production stage
-        client = Client()
-        try:
-            # stage_model_version = client.get_model_version(
-            #     current_model_version.name, stage
-            # )
-
-            stage_model_version = client.get_model_version(
-                "reg_model", stage
-            )
+    try:
+        if not drift_ok:
+            logger.info(f"The training data drifted from the data of the '{stage}' model, the model is not promoted")
+            return False
 
-            # Compare metrics (R2) between the model to be considered and the current model
+        service = get_promotion_service(model_name, threshold, ttl_seconds=stage_cache_seconds)
 
-            # prod_r2 = (
-            #     stage_model_version.get_artifact("reg_model").run_metadata["test_r2_score"].value
-            # )
-            
-            prod_r2 = (
-                stage_model_version.run_metadata["test_r2_score"].value
-            )
-            # Promote model if R2 score improves (better than the current model)
-            if float(r2_score) > float(prod_r2):
-                # If current model has better metric (R2 score), the model is promoted
-                promoted = True
-                current_model_version.set_stage(stage, force=True)
-                 
-                logger.info(f"The newly trained is promoted to {stage}!")
+        # The newly-trained model is the latest version of the model
+        candidate = service.registry.get_versions(model_name, [], service.metric)[0]
+        logger.info(f"Current version of the newly-trained model is: {candidate.number}")
 
-        except KeyError:
-            # If model to consider fails to outperform, the current one is considered
-            promoted = True
-            current_model_version.set_stage(stage, force=True)
+        result = service.promote({candidate.version: r2_score}, stage=stage)
+        return result.promoted
 
-            logger.info(f"The existing model is currently set to {stage}!")
-    
-    return promoted
\ No newline at end of file
+    except Exception as error:
+        logger.error(f"Error found in promoting the model: {error}")
+        raise error
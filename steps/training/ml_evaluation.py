@@ -1,18 +1,16 @@
-import mlflow
 import pandas as pd
 from sklearn.base import RegressorMixin
 from zenml import step, log_artifact_metadata
-from zenml.client import Client
 from zenml.logger import get_logger
-from utils.model_evaluation import MSE, RMSE, R2_Score
+from utils.profiling import profile_step
 from typing_extensions import Annotated
 from typing import Tuple
 
 logger = get_logger(__name__)
 
-experiment_tracker = Client().active_stack.experiment_tracker
-
-@step(experiment_tracker=experiment_tracker.name)
+# The experiment tracker is set by the pipeline (utils.stack.get_experiment_tracker_name)
+@step
+@profile_step
 def model_evaluation(
     model: RegressorMixin,
     dataset_train: pd.DataFrame,
@@ -20,6 +18,8 @@ def model_evaluation(
     target: str = "fare_amount",
     train_r2_threshold: float = 0.5,
     test_r2_threshold: float = 0.5,
+    chunk_size: int = 100000,
+    n_jobs: int = 1,
 ) -> Tuple[
     Annotated[float, "test_r2_score"],
     Annotated[float, "test_rmse"],
@@ -36,53 +36,44 @@ def model_evaluation(
         dataset_train: The train dataset.
         dataset_test: The test dataset.
         target: Target column in dataset.
+        chunk_size: Number of rows predicted at a time.
+        n_jobs: Number of threads predicting row blocks concurrently.
     Return:
        mse, rmse, and r2 score
     """
 
     # Compute the model mse, rmse, r2 on the train and test set
     try:
-        X_train = dataset_train.drop(columns=[target])
-        y_train_pred = model.predict(X_train)
-        y_train = dataset_train[target]
-
-        X_test = dataset_test.drop(columns=[target])
-        y_test_pred = model.predict(X_test)
-        y_test = dataset_test[target] 
-
-        # Compute MSE
-        train_mse = MSE().metric_score(y_true=y_train, y_pred=y_train_pred)                       
-        logger.info(f"train mse score of model is: {train_mse}")
-        mlflow.log_metric("train mse score", train_mse)
-
-        test_mse = MSE().metric_score(y_true=y_test, y_pred=y_test_pred)                       
-        logger.info(f"test mse score of model is: {test_mse}")
-        mlflow.log_metric("test mse score", test_mse)
-
-        # Compute RMSE
-        train_rmse = RMSE().metric_score(y_true=y_train, y_pred=y_train_pred)                       
-        logger.info(f"train rmse score of model is: {train_rmse}")
-        mlflow.log_metric("train rmse score", train_rmse)
-
-        test_rmse = RMSE().metric_score(y_true=y_test, y_pred=y_test_pred)                       
-        logger.info(f"test rmse score of model is: {test_rmse}")
-        mlflow.log_metric("test rmse score", test_rmse)
-
-        # Compute R2
-        train_r2_score = R2_Score().metric_score(y_true=y_train, y_pred=y_train_pred)                       
-        logger.info(f"train r2 score of model is: {train_r2_score}")
-        mlflow.log_metric("train r2 score", train_r2_score)
-
-        test_r2_score = R2_Score().metric_score(y_true=y_test, y_pred=y_test_pred)                       
-        logger.info(f"test r2 score of model is: {test_r2_score}")
-        mlflow.log_metric("test r2 score", test_r2_score)
+        import mlflow
+        from utils.memoization import memoized_call
+        from utils.model_evaluation import Chunked_Model_Evaluation
+
+        evaluation = Chunked_Model_Evaluation(chunk_size=chunk_size, n_jobs=n_jobs)
+
+        # Compute mse, rmse, r2, mae and residual quantiles, one pass per split
+        metrics = {}
+        for split, dataset in (("train", dataset_train), ("test", dataset_test)):
+            # The metrics are kept in the memo index; they are logged to MLflow and ZenML below, hit or not
+            split_metrics = memoized_call(evaluation.evaluate, model, dataset, target=target)
+            for name, value in split_metrics.items():
+                key = f"{split} {name}" if name.startswith("residual") else f"{split} {name} score"
+                logger.info(f"{key} of model is: {value}")
+                metrics[key] = value
+
+        # One MLflow call for all metrics
+        mlflow.log_metrics(metrics)
+
+        train_mse = metrics["train mse score"]
+        train_rmse = metrics["train rmse score"]
+        train_r2_score = metrics["train r2 score"]
+        test_mse = metrics["test mse score"]
+        test_rmse = metrics["test rmse score"]
+        test_r2_score = metrics["test r2 score"]
 
         if train_r2_score < train_r2_threshold:
-            print(f"train r2 score of model is below the threshold")
+            logger.warning(f"train r2 score of model {train_r2_score} is below the threshold {train_r2_threshold}")
         if test_r2_score < test_r2_threshold:
-            print(f"test r2 score of model is below the threshold")
-        else:
-            pass
+            logger.warning(f"test r2 score of model {test_r2_score} is below the threshold {test_r2_threshold}")
 
         log_artifact_metadata(
             metadata = {
@@ -92,6 +83,8 @@ def model_evaluation(
                 "test_mse": float(test_mse),
                 "test_rmse": float(test_rmse),
                 "test_r2": float(test_r2_score),                
+                "train_mae": float(metrics["train mae score"]),
+                "test_mae": float(metrics["test mae score"]),
             },
 
             artifact_name = "reg_model",
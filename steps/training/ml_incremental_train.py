@@ -0,0 +1,96 @@
+from zenml import step
+from typing_extensions import Annotated
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from zenml import ArtifactConfig
+from sklearn.base import RegressorMixin
+from utils.config import ML_Model_Name_Config
+from utils.data_handling import Category_Encoder
+from typing import Optional
+import pandas as pd
+
+logger = get_logger(__name__)
+
+# The experiment tracker is set by the pipeline (utils.stack.get_experiment_tracker_name)
+@step
+@profile_step
+def ml_model_incremental_train(dataset_train: pd.DataFrame,
+                               ml_model_config: ML_Model_Name_Config,
+                               encoder: Optional[Category_Encoder] = None,
+                               start_date: Optional[str] = None,
+                               history_start_date: Optional[str] = None,
+                               model_name: str = "reg_model",
+                               stage: str = "production",
+                               max_r2_drop: float = 0.05) -> Annotated[
+    RegressorMixin, ArtifactConfig(name="reg_model", is_model_artifact=True)
+]:
+    """
+    This process updates the model at the stage with the new rows of the train dataset and returns it.
+    The model is trained from scratch instead when the model template cannot update it, when its features
+    differ or when drift is detected (see Incremental_Trainer): on the rows dropped off from history_start_date
+    up to start_date, loaded only then, and the train dataset.
+
+    Args:
+        dataset_train: The train dataset, with the new date partitions only.
+        ml_model_config: The model template and its training and update parameters.
+        encoder: The encoder of the train dataset, which preprocesses the earlier rows.
+        start_date: First dropoff day of the new date partitions (ISO format).
+        history_start_date: First dropoff day of the training history (ISO format). Without it (or without
+            start_date and encoder), the full training uses the train dataset only.
+        model_name: Name of the model.
+        stage: Stage of the model to update.
+        max_r2_drop: Drop of the r2 score on the new rows (from the recorded test r2 score) above which
+            the model is retrained.
+
+    Returns:
+        The trained model artifact.
+    """
+    try:
+        logger.info(f"Start incremental training process ...")
+
+        import mlflow
+        from functools import partial
+        from utils.data_handling import load_history
+        from utils.memoization import Step_Memo
+        from utils.model_cache import load_model_version
+        from utils.model_promotion import ZenML_Model_Registry
+        from utils.model_train import Incremental_Trainer, get_ml_model
+
+        mlflow.sklearn.autolog()
+
+        previous = ZenML_Model_Registry().get_stage_version(model_name, stage, "test_r2_score")
+        previous_model = load_model_version(model_name, previous.version).model if previous else None
+
+        model = get_ml_model(ml_model_config.ml_model, n_threads=ml_model_config.n_threads)
+        trainer = Incremental_Trainer(model, max_r2_drop=max_r2_drop)
+
+        history = None
+        if history_start_date is not None and start_date is not None and encoder is not None:
+            if history_start_date < start_date:
+                # Part of the memo key through its arguments: the days before the new partitions are
+                # assumed final, as by the cached loader
+                history = partial(load_history, history_start_date, start_date, encoder)
+        else:
+            logger.warning("No training history given, a full training uses the new rows only")
+
+        memo = Step_Memo(trainer.train, dataset_train, previous_model,
+                         previous_r2=previous.metric if previous else None,
+                         train_params=ml_model_config.model_params,
+                         update_params=ml_model_config.update_params,
+                         history=history,
+                         artifacts=("reg_model", None))
+        trained_model, mode = memo.call()
+        if memo.hit:
+            # No fit, so autolog has logged nothing for this run
+            mlflow.log_params(trained_model.get_params())
+            mlflow.sklearn.log_model(trained_model, "model")
+
+        mlflow.log_param("training_mode", mode)
+        if previous is not None:
+            mlflow.log_param("previous_model_version", previous.version)
+
+        return trained_model
+
+    except Exception as error:
+        logger.error(f"Error found in the incremental training: {error}")
+        raise error
@@ -0,0 +1,72 @@
+from zenml import ArtifactConfig, step, log_artifact_metadata
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from utils.compiled_tree import Compiled_Tree_Regressor
+from materializers.compiled_tree_materializer import Compiled_Tree_Materializer
+from sklearn.base import RegressorMixin
+from typing_extensions import Annotated
+import pandas as pd
+
+logger = get_logger(__name__)
+
+@step(output_materializers=Compiled_Tree_Materializer)
+@profile_step
+def ml_model_compile(model: RegressorMixin,
+                     dataset: pd.DataFrame,
+                     target: str = "fare_amount",
+                     max_parity_rows: int = 100000) -> Annotated[
+    Compiled_Tree_Regressor, ArtifactConfig(name="compiled_model", is_model_artifact=True)
+]:
+    """
+    This step compiles the trained tree model into flat arrays (utils.compiled_tree) for serving.
+
+    The compiled model must predict the same values as the model on the rows of the dataset: exactly,
+    except for a forest predicted on several threads, which sklearn sums in a varying order (see check_parity).
+
+    Args:
+        model: The trained model (DecisionTreeRegressor or RandomForestRegressor, binned or not,
+            or HistGradientBoostingRegressor).
+        dataset: The dataset the predictions are compared on, e.g. the test dataset.
+        target: Target column in dataset.
+        max_parity_rows: Number of rows of the dataset compared.
+
+    Returns:
+        The compiled model artifact.
+    """
+    try:
+        import pickle
+
+        from utils.compiled_tree import check_parity
+
+        compiled = Compiled_Tree_Regressor.compile(model)
+
+        features = dataset.drop(columns=[target]).iloc[:max_parity_rows]
+        max_difference = check_parity(model, compiled, features)
+        # Rounding of the sum of the trees when sklearn predicts a forest on several threads: around 1e-14
+        # for fares, so a larger difference is a compilation error
+        tolerance = 1e-9 if compiled.baseline is None and compiled.n_trees > 1 else 0.0
+        if max_difference > tolerance:
+            raise ValueError(f"The compiled model predictions differ from the model by up to {max_difference}")
+
+        pickle_bytes = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        compiled_bytes = compiled.nodes.nbytes + (compiled.bin_edges.nbytes if compiled.bin_edges is not None else 0)
+        logger.info(f"Compiled {compiled.source} into {compiled.n_trees} trees of {len(compiled.nodes)} nodes: "
+                    f"{compiled_bytes / 1e3:.0f} kB of arrays ({pickle_bytes / 1e3:.0f} kB pickled), "
+                    f"largest difference on {len(features)} rows: {max_difference}")
+
+        log_artifact_metadata(
+            metadata = {
+                "source": compiled.source,
+                "parity_rows": len(features),
+                "parity_max_difference": max_difference,
+                "array_bytes": int(compiled_bytes),
+                "pickle_bytes": pickle_bytes,
+            },
+            artifact_name = "compiled_model",
+        )
+
+        return compiled
+
+    except Exception as error:
+        logger.error(f"Error found in compiling the model: {error}")
+        raise error
@@ -1,18 +1,22 @@
-from zenml.integrations.mlflow.steps.mlflow_registry import mlflow_register_model_step
 from sklearn.base import RegressorMixin
 from zenml.logger import get_logger
+from utils.profiling import profile_step
 from zenml import step
 
 
 logger = get_logger(__name__)
 
 @step
+@profile_step
 def ml_model_registry(model: RegressorMixin, model_name: str = "reg_model", promoted: bool = False):
     """
     This step registers the model once it produces the model metrics as expected.
     """
     try:
         if promoted:
+            # The MLflow registry integration imports mlflow; only needed when a model is registered
+            from zenml.integrations.mlflow.steps.mlflow_registry import mlflow_register_model_step
+
             mlflow_register_model_step.entrypoint(
                 model=model,
                 name=model_name,
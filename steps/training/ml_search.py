@@ -0,0 +1,59 @@
+from zenml import step
+from typing_extensions import Annotated
+from zenml.logger import get_logger
+from utils.profiling import profile_step
+from zenml import ArtifactConfig
+from sklearn.base import RegressorMixin
+from typing import Optional, Tuple
+import pandas as pd
+
+logger = get_logger(__name__)
+
+# The experiment tracker is set by the pipeline (utils.stack.get_experiment_tracker_name)
+@step
+@profile_step
+def ml_model_search(dataset_train: pd.DataFrame,
+                    param_grid: Optional[dict] = None,
+                    n_candidates: Optional[int] = None,
+                    eta: int = 3,
+                    n_jobs: int = -1) -> Tuple[
+    Annotated[RegressorMixin, ArtifactConfig(name="reg_model", is_model_artifact=True)],
+    Annotated[pd.DataFrame, "search_leaderboard"]
+]:
+    """
+    This process searches the DecisionTreeRegressor parameters with successive halving
+    and returns the best model with the leaderboard of the search.
+
+    Args:
+        dataset_train: The train dataset.
+        param_grid: Parameter grid (lists of values per parameter). A default grid when None.
+        n_candidates: Number of candidates sampled at random from the grid. The whole grid when None.
+        eta: Only the best 1/eta candidates go on to the next rung, which uses eta times more rows.
+        n_jobs: Number of worker processes (-1 for all cores).
+
+    Returns:
+        The best model refitted on the train dataset, and the leaderboard.
+    """
+    try:
+        logger.info(f"Start hyperparameter search ...")
+
+        import mlflow
+        from utils.memoization import memoized_call
+        from utils.model_search import Successive_Halving_Search
+
+        search = Successive_Halving_Search(param_grid=param_grid, n_candidates=n_candidates,
+                                           eta=eta, n_jobs=n_jobs)
+        best_model, leaderboard = memoized_call(search.search, dataset=dataset_train,
+                                                artifacts=("reg_model", "search_leaderboard"))
+
+        # Logged explicitly (the candidates are fitted in worker processes, without autolog), so a run
+        # reusing the result of an earlier search logs the same as the run that computed it
+        mlflow.log_params(best_model.get_params())
+        mlflow.log_metric("search best val r2", float(leaderboard["val_r2"].iloc[0]))
+        mlflow.sklearn.log_model(best_model, "model")
+
+        return best_model, leaderboard
+
+    except Exception as error:
+        logger.error(f"Error found in the hyperparameter search: {error}")
+        raise error
@@ -1,29 +1,19 @@
 from zenml import step
 from typing_extensions import Annotated
 from zenml.logger import get_logger
+from utils.profiling import profile_step
 from zenml import ArtifactConfig, step
-from zenml.client import Client
-from zenml.integrations.mlflow.experiment_trackers import MLFlowExperimentTracker
 # from zenml.integrations.mlflow.steps.mlflow_registry import mlflow_register_model_step
-from utils.model_train import DecisionTree_Regressor_Model
 from sklearn.base import RegressorMixin
 from utils.config import ML_Model_Name_Config
 import pandas as pd
-import mlflow
-from zenml import ModelVersion
 
 logger = get_logger(__name__)
 
-experiment_tracker = Client().active_stack.experiment_tracker
-
-if not experiment_tracker or not isinstance(
-    experiment_tracker, MLFlowExperimentTracker
-):
-    raise RuntimeError(
-        "The active stack requires a MLFlow experiment tracker for this ML run to work."
-    )
-
-@step(experiment_tracker=experiment_tracker.name)
+# The experiment tracker is set by the pipeline (utils.stack.get_experiment_tracker_name),
+# so that importing this module does not query the active stack
+@step
+@profile_step
 def ml_model_train(dataset_train: pd.DataFrame, 
                    ml_model_config: ML_Model_Name_Config) -> Annotated[
     RegressorMixin, ArtifactConfig(name="reg_model", is_model_artifact=True)
@@ -41,30 +31,38 @@ def ml_model_train(dataset_train: pd.DataFrame,
         The trained model artifact.
     """
     try:
-        model = None
+        logger.info(f"Start training model process ...")
 
-        if ml_model_config.ml_model == "DecisionTreeRegressor":
+        # Imported in the step, so that composing the pipeline does not load mlflow and the model libraries
+        import mlflow
+        from utils.memoization import Step_Memo
+        from utils.model_train import get_ml_model
 
-            logger.info(f"Start training model process ...")
+        mlflow.sklearn.autolog()
 
-            mlflow.sklearn.autolog()
+        model = get_ml_model(ml_model_config.ml_model, n_threads=ml_model_config.n_threads)
+        logger.info(f"Training {ml_model_config.ml_model} with {model.n_threads} threads")
 
-            model = DecisionTree_Regressor_Model()
-            
-            trained_model, model_name = model.ml_model_train(dataset = dataset_train, 
-                                                             max_features = "sqrt",
-                                                             max_depth = 10,
-                                                             criterion = "squared_error")
+        # Loaded from the reg_model artifact of an earlier run when the same model was trained on the same rows
+        # with the same parameters
+        memo = Step_Memo(model.ml_model_train, dataset = dataset_train, artifacts = ("reg_model", None),
+                         **ml_model_config.model_params)
+        trained_model, model_name = memo.call()
+        if memo.hit:
+            # No fit, so autolog has logged nothing for this run
+            mlflow.log_params(trained_model.get_params())
+            mlflow.sklearn.log_model(trained_model, "model")
 
-            # register mlflow model
-            logger.info(f"Register the ML trained model ...")
+        # register mlflow model
+        logger.info(f"Register the ML trained model ...")
 
-            # mlflow_register_model_step.entrypoint(
-            #     model=trained_model,
-            #     name=model_name,
-            #     )
+        # mlflow_register_model_step.entrypoint(
+        #     model=trained_model,
+        #     name=model_name,
+        #     )
             
     except Exception as error:
         logger.info(f"Error found in the training model: {error}")
+        raise error
         
-    return trained_model
\ No newline at end of file
+    return trained_model
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Category_Encoder, Data_Preprocessing
+from utils.schema import CATEGORICAL_COLS, DUMMY_DTYPE, compact_frame
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return generate_greentaxi(5000, seed=0)
+
+
+def as_objects(dataset: pd.DataFrame) -> pd.DataFrame:
+    return dataset.astype({col: object for col in CATEGORICAL_COLS})
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["object", "categorical"])
+def test_transform_equals_get_dummies(dataset, compact):
+    data = compact_frame(dataset) if compact else dataset
+
+    encoded = Category_Encoder().fit(data).transform(data)
+    expected = pd.get_dummies(as_objects(data), columns=CATEGORICAL_COLS, dtype=DUMMY_DTYPE)
+
+    # Same columns in the same order, same values and dtypes
+    pd.testing.assert_frame_equal(encoded, expected)
+
+
+def test_categories_missing_from_the_rows_get_no_column(dataset):
+    data = compact_frame(dataset)
+    data["pmt_type_des"] = data["pmt_type_des"].cat.add_categories(["Voided"])
+
+    encoder = Category_Encoder().fit(data)
+
+    assert "Voided" not in encoder.vocabularies["pmt_type_des"]
+    assert list(encoder.transform(data).columns) == list(
+        pd.get_dummies(as_objects(data), columns=CATEGORICAL_COLS, dtype=DUMMY_DTYPE).columns)
+
+
+def test_unseen_and_missing_categories_get_all_zero_indicators(dataset):
+    encoder = Category_Encoder().fit(dataset)
+    new_rows = dataset.iloc[:4].copy()
+    new_rows["rate_code_des"] = ["Not a rate code", None, "Standard rate", np.nan]
+
+    encoded = encoder.transform(new_rows)
+
+    rate_code_cols = [f"rate_code_des_{category}" for category in encoder.vocabularies["rate_code_des"]]
+    assert encoded[rate_code_cols].sum(axis=1).tolist() == [0, 0, 1, 0]
+    assert encoded.loc[new_rows.index[2], "rate_code_des_Standard rate"] == 1
+    # Same columns as the training rows, whatever the new rows hold
+    assert list(encoded.columns) == list(encoder.transform(dataset).columns)
+
+
+def test_sparse_transform_has_the_same_values(dataset):
+    encoder = Category_Encoder().fit(dataset)
+
+    sparse = encoder.transform(dataset.iloc[:500], sparse=True)
+
+    assert all(isinstance(sparse[name].dtype, pd.SparseDtype) for name in encoder.feature_names)
+    dense = sparse.astype({name: DUMMY_DTYPE for name in encoder.feature_names})
+    pd.testing.assert_frame_equal(dense, encoder.transform(dataset.iloc[:500]))
+
+
+def test_saved_encoder_encodes_the_same(dataset):
+    encoder = Category_Encoder().fit(dataset)
+
+    for restored in (Category_Encoder.from_dict(encoder.to_dict()),
+                     Category_Encoder.from_feature_names(encoder.feature_names)):
+        assert restored.feature_names == encoder.feature_names
+        pd.testing.assert_frame_equal(restored.transform(dataset), encoder.transform(dataset))
+
+
+def test_preprocessing_with_the_encoder_keeps_the_training_columns(dataset):
+    preprocessing = Data_Preprocessing()
+    encoder = preprocessing.fit_encoder(dataset.iloc[:4000])
+
+    train = preprocessing.data_handling(dataset.iloc[:4000], encoder=encoder)
+    test = preprocessing.data_handling(dataset.iloc[4000:4010], encoder=encoder)
+
+    assert list(test.columns) == list(train.columns)
+
+
+def test_transform_needs_a_fitted_encoder(dataset):
+    with pytest.raises(ValueError):
+        Category_Encoder().transform(dataset)
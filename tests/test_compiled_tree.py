@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from utils.compiled_tree import Compiled_Tree_Regressor, check_parity
+from utils.model_train import Binned_Regressor
+
+N_FEATURES = 6
+# Small blocks, so that a few thousand rows go through several blocks
+BLOCK_SIZE = 1000
+
+
+def make_data(n_rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, N_FEATURES))
+    y = 3 * X[:, 0] + X[:, 1] ** 2 + rng.normal(scale=0.5, size=n_rows)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return pd.DataFrame(X, columns=[f"feature_{col}" for col in range(N_FEATURES)]), y
+
+
+MODELS = {
+    "decision_tree": lambda: DecisionTreeRegressor(max_depth=12, random_state=0),
+    "random_forest": lambda: RandomForestRegressor(n_estimators=20, max_depth=10, random_state=0),
+    "binned_random_forest": lambda: Binned_Regressor(RandomForestRegressor(n_estimators=10, max_depth=10,
+                                                                           random_state=0)),
+    "gradient_boosting": lambda: HistGradientBoostingRegressor(max_iter=30, random_state=0),
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    X_train, y_train = make_data(5000, seed=0)
+    X_test, _ = make_data(3 * BLOCK_SIZE + 17, seed=1)
+    return X_train, y_train, X_test
+
+
+@pytest.fixture(scope="module", params=list(MODELS))
+def fitted(request, data):
+    X_train, y_train, _ = data
+    model = MODELS[request.param]().fit(X_train, y_train)
+    return model, Compiled_Tree_Regressor.compile(model)
+
+
+@pytest.mark.parametrize("n_rows", [1, 10, BLOCK_SIZE, 3 * BLOCK_SIZE + 17])
+def test_compiled_predictions_equal_the_model(fitted, data, n_rows):
+    model, compiled = fitted
+    X = data[2].iloc[:n_rows]
+
+    # 1 and 10 rows are walked row by row, larger inputs level by level in blocks
+    expected = model.predict(X)
+    np.testing.assert_array_equal(compiled.predict(X, block_size=BLOCK_SIZE), expected)
+    np.testing.assert_array_equal(compiled.predict(X.to_numpy(), block_size=BLOCK_SIZE), expected)
+
+
+def test_saved_model_predicts_the_same(fitted, data, tmp_path):
+    model, compiled = fitted
+    compiled.save(str(tmp_path))
+
+    assert check_parity(model, Compiled_Tree_Regressor.load(str(tmp_path)), data[2]) == 0.0
+
+
+def test_threaded_forest_is_within_rounding(data):
+    X_train, y_train, X_test = data
+    model = RandomForestRegressor(n_estimators=50, max_depth=10, n_jobs=4, random_state=0).fit(X_train, y_train)
+
+    # sklearn sums the trees in the order its threads finish, the compiled model in the tree order
+    np.testing.assert_allclose(Compiled_Tree_Regressor.compile(model).predict(X_test), model.predict(X_test),
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_unsupported_models_are_rejected(data):
+    X_train, y_train, _ = data
+
+    with pytest.raises(TypeError):
+        Compiled_Tree_Regressor.compile(HistGradientBoostingRegressor(loss="poisson", max_iter=5)
+                                        .fit(X_train, np.abs(y_train)))
+    with pytest.raises(TypeError):
+        Compiled_Tree_Regressor.compile(RandomForestRegressor(n_estimators=2)
+                                        .fit(X_train.fillna(0), np.c_[y_train, y_train]))
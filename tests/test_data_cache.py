@@ -0,0 +1,126 @@
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Load_from_DB_Cached
+from utils.schema import DROPOFF_COL, compact_frame
+
+START_DATE, END_DATE = "2023-01-01", "2023-01-05"
+
+
+class Fake_Database_Loader(Data_Load_from_DB_Cached):
+    """
+    Cached loader reading its partitions and their statistics from an in-memory table instead of the database.
+    """
+
+    def __init__(self, table: pd.DataFrame, cache_dir: str, verify: bool = False,
+                 start_date: str = START_DATE, end_date: str = END_DATE):
+        super().__init__(start_date, end_date, cache_dir=cache_dir, verify=verify, with_dropoff=True)
+        self.table = table
+        self.fetched = []
+
+    def _rows(self, partition: tuple) -> pd.DataFrame:
+        start, end, end_inclusive = partition
+        dropoff = self.table[DROPOFF_COL]
+        in_end = dropoff <= pd.Timestamp(end) if end_inclusive else dropoff < pd.Timestamp(end)
+        return self.table[(dropoff >= pd.Timestamp(start)) & in_end]
+
+    def _database_partition_stats(self, partitions: list) -> dict:
+        stats = {}
+        for partition in partitions:
+            rows = self._rows(partition)
+            if len(rows):
+                # Like the sum of hashtext(row) of the stats query: every column of every row
+                checksum = int(pd.util.hash_pandas_object(rows.astype(str), index=False).astype(object).sum())
+                stats[partition[0].isoformat()] = (len(rows), rows[DROPOFF_COL].max().isoformat(), checksum)
+        return stats
+
+    def _fetch_partitions(self, partitions: list) -> list:
+        self.fetched.extend(partition[0].isoformat() for partition in partitions)
+        return [compact_frame(self._rows(partition).reset_index(drop=True)) for partition in partitions]
+
+
+@pytest.fixture
+def table():
+    return generate_greentaxi(20000, with_timestamp=True).sort_values(DROPOFF_COL, ignore_index=True)
+
+
+def load(table, cache_dir, verify: bool = False):
+    loader = Fake_Database_Loader(table, str(cache_dir), verify=verify)
+    return loader, loader.data_handling()
+
+
+def edit_row(table: pd.DataFrame, day: str) -> int:
+    # A correction in place: same row count, same latest dropoff, another payment type
+    position = table.index[table[DROPOFF_COL].dt.strftime("%Y-%m-%d") == day][0]
+    table.loc[position, "pmt_type_des"] = "Dispute" if table.loc[position, "pmt_type_des"] != "Dispute" else "Cash"
+    return position
+
+
+def test_unchanged_partitions_are_read_from_cache(table, tmp_path):
+    loader, first = load(table, tmp_path)
+    assert loader.fetched == ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+
+    loader, second = load(table, tmp_path)
+    # Only the partition of the watermark day is checked, and it is unchanged
+    assert loader.fetched == []
+    pd.testing.assert_frame_equal(second, first)
+
+
+def test_partition_edited_in_place_is_fetched_again(table, tmp_path):
+    load(table, tmp_path)
+    position = edit_row(table, "2023-01-04")
+
+    loader, reloaded = load(table, tmp_path)
+
+    assert loader.fetched == ["2023-01-04"]
+    row = reloaded[reloaded[DROPOFF_COL] == table.loc[position, DROPOFF_COL]]
+    assert (row["pmt_type_des"] == table.loc[position, "pmt_type_des"]).any()
+
+
+def test_older_partition_edited_in_place_is_fetched_again_when_verified(table, tmp_path):
+    load(table, tmp_path)
+    edit_row(table, "2023-01-02")
+
+    loader, _ = load(table, tmp_path)
+    # Days before the watermark are assumed final
+    assert loader.fetched == []
+
+    loader, _ = load(table, tmp_path, verify=True)
+    assert loader.fetched == ["2023-01-02"]
+
+
+def test_cache_entries_without_checksum_are_fetched_again(table, tmp_path):
+    loader, _ = load(table, tmp_path)
+    # Manifest written before the checksum was recorded
+    for query in loader.cache.manifest["queries"].values():
+        for entry in query["partitions"].values():
+            entry.pop("checksum")
+    loader.cache.save()
+
+    loader, _ = load(table, tmp_path, verify=True)
+
+    assert loader.fetched == ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04"]
+
+
+def _load_window(cache_dir: str, start_day: int) -> None:
+    table = generate_greentaxi(5000, with_timestamp=True).sort_values(DROPOFF_COL, ignore_index=True)
+    Fake_Database_Loader(table, cache_dir, start_date=f"2023-01-{start_day:02d}",
+                         end_date=f"2023-01-{start_day + 4:02d}").data_handling()
+
+
+def test_concurrent_loads_keep_every_partition(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_load_window, args=(str(tmp_path), start_day))
+                 for start_day in (1, 5, 9, 13, 17, 21)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    loader = Fake_Database_Loader(pd.DataFrame(), str(tmp_path))
+    (query,) = loader.cache.manifest["queries"].values()
+    assert sorted(query["partitions"]) == [f"2023-01-{day:02d}" for day in range(1, 25)]
@@ -0,0 +1,206 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_profile import (RELATIVE_ACCURACY, Category_Sketch, Data_Profile, Drift_Gate, Numeric_Sketch,
+                                category_drift, drift_scores, numeric_drift)
+from utils.schema import compact_frame
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return compact_frame(generate_greentaxi(30000, seed=0))
+
+
+def profile_of(*chunks) -> Data_Profile:
+    profile = Data_Profile()
+    for chunk in chunks:
+        profile.update(chunk)
+    return profile
+
+
+def assert_same_profile(first: Data_Profile, second: Data_Profile):
+    first, second = first.to_dict(), second.to_dict()
+    assert first["n_rows"] == second["n_rows"]
+    assert first["categorical"] == second["categorical"]
+    for col, sketch in first["numeric"].items():
+        other = second["numeric"][col]
+        assert sketch["buckets"] == other["buckets"]
+        assert (sketch["count"], sketch["null_count"], sketch["min"], sketch["max"]) == \
+               (other["count"], other["null_count"], other["min"], other["max"])
+        # Sums of floats in another order
+        np.testing.assert_allclose([sketch["sum"], sketch["sum_squares"]], [other["sum"], other["sum_squares"]],
+                                   rtol=1e-12)
+
+
+def test_merge_is_associative_and_equals_one_pass(dataset):
+    a, b, c = dataset.iloc[:7000], dataset.iloc[7000:19000], dataset.iloc[19000:]
+
+    left = profile_of(a).merge(profile_of(b)).merge(profile_of(c))
+    right = profile_of(a).merge(profile_of(b).merge(profile_of(c)))
+
+    assert_same_profile(left, right)
+    assert_same_profile(left, profile_of(dataset))
+    assert_same_profile(left, profile_of(a, b, c))
+
+
+def test_merge_keeps_nulls_and_empty_chunks(dataset):
+    with_nulls = dataset.copy()
+    with_nulls.loc[:99, "trip_distance"] = np.nan
+    with_nulls["rate_code_des"] = with_nulls["rate_code_des"].astype(object)
+    with_nulls.loc[:49, "rate_code_des"] = None
+
+    merged = profile_of(with_nulls.iloc[:0]).merge(profile_of(with_nulls.iloc[:100])).merge(
+        profile_of(with_nulls.iloc[100:]))
+
+    assert merged.numeric["trip_distance"].null_count == 100
+    assert merged.categorical["rate_code_des"].null_count == 50
+    assert_same_profile(merged, profile_of(with_nulls))
+
+
+@pytest.mark.parametrize("values", [
+    np.random.default_rng(0).lognormal(mean=1.0, sigma=1.0, size=100000),
+    np.random.default_rng(1).normal(loc=0.0, scale=10.0, size=100000),
+    np.r_[np.zeros(1000), np.random.default_rng(2).exponential(scale=50.0, size=50000)],
+], ids=["lognormal", "normal", "zeros"])
+def test_quantiles_are_within_the_relative_accuracy(values):
+    sketch = Numeric_Sketch()
+    sketch.update(pd.Series(values))
+    quantiles = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+    estimated = np.array(sketch.quantiles(quantiles))
+    exact = np.quantile(values, quantiles)
+
+    assert np.all(np.abs(estimated - exact) <= RELATIVE_ACCURACY * np.abs(exact) + 1e-9)
+
+
+def test_quantiles_of_nullable_integers_are_within_the_relative_accuracy(dataset):
+    sketch = Numeric_Sketch()
+    sketch.update(dataset["passenger_count"])
+    values = dataset["passenger_count"].dropna().to_numpy(dtype=np.float64)
+
+    assert sketch.null_count == dataset["passenger_count"].isna().sum()
+    assert sketch.quantiles((0.0, 0.5, 1.0)) == pytest.approx(np.quantile(values, (0.0, 0.5, 1.0)),
+                                                              rel=RELATIVE_ACCURACY)
+
+
+def numeric_sketch(values: np.ndarray) -> Numeric_Sketch:
+    sketch = Numeric_Sketch()
+    sketch.update(pd.Series(values))
+    return sketch
+
+
+def test_numeric_drift_of_the_same_distribution_is_small():
+    rng = np.random.default_rng(0)
+    reference, current = rng.lognormal(1.0, 0.8, 50000), rng.lognormal(1.0, 0.8, 50000)
+
+    scores = numeric_drift(numeric_sketch(reference), numeric_sketch(current))
+
+    assert scores["psi"] < 0.01 and scores["ks"] < 0.02
+
+
+def test_numeric_drift_of_a_shifted_distribution_is_large():
+    rng = np.random.default_rng(0)
+    reference, current = rng.lognormal(1.0, 0.8, 50000), rng.lognormal(1.5, 0.8, 50000)
+
+    scores = numeric_drift(numeric_sketch(reference), numeric_sketch(current))
+
+    assert scores["psi"] > 0.25 and scores["ks"] > 0.2
+
+
+def category_sketch(values: list) -> Category_Sketch:
+    sketch = Category_Sketch()
+    sketch.update(pd.Series(values))
+    return sketch
+
+
+def test_category_drift():
+    reference = category_sketch(["Cash"] * 350 + ["Credit card"] * 620 + ["Dispute"] * 30)
+    same = category_sketch(["Credit card"] * 62 + ["Cash"] * 35 + ["Dispute"] * 3)
+    shifted = category_sketch(["Cash"] * 700 + ["Credit card"] * 300)
+
+    assert category_drift(reference, same) == pytest.approx({"psi": 0.0, "ks": 0.0}, abs=1e-12)
+    scores = category_drift(reference, shifted)
+    assert scores["psi"] > 0.25 and scores["ks"] == pytest.approx(0.35)
+
+
+def test_profiles_of_samples_of_one_dataset_pass_the_gate(dataset):
+    scores = drift_scores(profile_of(dataset.iloc[:15000]), profile_of(dataset.iloc[15000:]))
+
+    assert set(scores) == set(Data_Profile().numeric) | set(Data_Profile().categorical)
+    assert Drift_Gate().check(scores) == (True, [])
+
+
+def test_gate_reports_every_column_over_a_limit():
+    scores = {"trip_distance": {"psi": 0.5, "ks": 0.1}, "pmt_type_des": {"psi": 0.1, "ks": 0.3},
+              "pu_hour": {"psi": 0.0, "ks": 0.0}}
+
+    passed, reasons = Drift_Gate(max_psi=0.25, max_ks=0.2).check(scores)
+
+    assert not passed
+    assert reasons == ["trip_distance: psi 0.500 above 0.25", "pmt_type_des: ks 0.300 above 0.2"]
+    # Only the gated columns count
+    assert Drift_Gate(columns=["pu_hour"]).check(scores) == (True, [])
+
+
+def test_drift_check_passes_without_a_reference(monkeypatch, dataset):
+    drift = pytest.importorskip("steps.data_load.data_drift")
+
+    def no_version(model_name, stage):
+        raise KeyError(stage)
+
+    model_cache = types.ModuleType("utils.model_cache")
+    model_cache.resolve_model_version = no_version
+    model_cache.load_version_profile = lambda model_name, version_id: None
+    monkeypatch.setitem(sys.modules, "utils.model_cache", model_cache)
+
+    assert drift.data_drift_check.entrypoint(profile=profile_of(dataset), max_psi=0.0, max_ks=0.0)
+
+    model_cache.resolve_model_version = lambda model_name, stage: "v1"
+    assert drift.data_drift_check.entrypoint(profile=profile_of(dataset), max_psi=0.0, max_ks=0.0)
+
+
+class Fake_Step:
+    """
+    Stand-in of a step in the pipeline composition, recording its calls.
+    """
+
+    def __init__(self, name: str, calls: dict, n_outputs: int = 1):
+        self.name = name
+        self.calls = calls
+        self.n_outputs = n_outputs
+
+    def with_options(self, **kwargs) -> "Fake_Step":
+        return self
+
+    def __call__(self, **kwargs):
+        self.calls[self.name] = kwargs
+        outputs = tuple(f"{self.name}.output_{position}" for position in range(self.n_outputs))
+        return outputs if self.n_outputs > 1 else outputs[0]
+
+
+def test_pipeline_runs_no_drift_check_without_the_gate(monkeypatch):
+    pytest.importorskip("zenml.model.model_version")
+    training = pytest.importorskip("pipelines.ml_training")
+
+    calls = {}
+    n_outputs = {"load_data": 2, "train_data_split": 2, "feature_window": 2, "ml_model_search": 2,
+                 "model_evaluation": 3}
+    for name in ("load_data", "data_drift_check", "train_data_split", "fit_category_encoder", "data_preprocessing",
+                 "feature_window", "ml_model_train", "ml_model_incremental_train", "ml_model_search",
+                 "model_evaluation", "ml_model_compile", "model_promotion_flag", "ml_model_registry"):
+        monkeypatch.setattr(training, name, Fake_Step(name, calls, n_outputs.get(name, 1)))
+    monkeypatch.setattr(training, "get_experiment_tracker_name", lambda: None)
+
+    training.ml_training_pipeline.entrypoint(drift_gate=False)
+    assert "data_drift_check" not in calls
+    assert calls["model_promotion_flag"]["drift_ok"] is True
+
+    calls.clear()
+    training.ml_training_pipeline.entrypoint(drift_gate=True)
+    assert calls["data_drift_check"]["profile"] == "load_data.output_1"
+    assert calls["model_promotion_flag"]["drift_ok"] == "data_drift_check.output_0"
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Split
+from utils.schema import DROPOFF_COL, compact_frame
+
+N_ROWS = 10000
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return compact_frame(generate_greentaxi(N_ROWS, seed=0, with_timestamp=True))
+
+
+def bin_shares(bins: np.ndarray, index: np.ndarray) -> np.ndarray:
+    return np.bincount(bins[index], minlength=bins.max() + 1) / len(index)
+
+
+@pytest.mark.parametrize("mode", Data_Split.split_modes)
+def test_split_is_a_partition_of_the_rows(dataset, mode):
+    train_index, test_index = Data_Split().split_indices(dataset, test_size=0.2, mode=mode)
+
+    assert len(test_index) == 0.2 * N_ROWS
+    assert len(np.intersect1d(train_index, test_index)) == 0
+    np.testing.assert_array_equal(np.sort(np.r_[train_index, test_index]), np.arange(N_ROWS))
+
+
+def test_stratified_split_keeps_the_target_distribution(dataset):
+    bins = Data_Split._target_bins(dataset, "fare_amount", 10)
+
+    train_index, test_index = Data_Split().split_indices(dataset, mode="stratified", n_bins=10)
+
+    shares = bin_shares(bins, np.arange(N_ROWS))
+    # Every bin within one row of its exact share
+    np.testing.assert_allclose(bin_shares(bins, train_index), shares, atol=1 / len(train_index) + 1e-12)
+    np.testing.assert_allclose(bin_shares(bins, test_index), shares, atol=1 / len(test_index) + 1e-12)
+
+
+def test_time_split_tests_on_the_latest_rows(dataset):
+    train_index, test_index = Data_Split().split_indices(dataset, mode="time")
+    dropoff = dataset[DROPOFF_COL].to_numpy()
+
+    assert dropoff[train_index].max() <= dropoff[test_index].min()
+    # Positions in ascending row order
+    assert np.all(np.diff(train_index) > 0) and np.all(np.diff(test_index) > 0)
+
+
+def test_time_split_needs_the_dropoff_column(dataset):
+    with pytest.raises(ValueError, match=DROPOFF_COL):
+        Data_Split().split_indices(dataset.drop(columns=[DROPOFF_COL]), mode="time")
+    with pytest.raises(ValueError):
+        Data_Split().split_indices(dataset, mode="by day")
+
+
+def test_split_rows_equal_the_split_dataset(dataset):
+    train_index, test_index = Data_Split().split_indices(dataset)
+
+    dataset_train, dataset_test = Data_Split().data_handling(dataset)
+
+    pd.testing.assert_frame_equal(dataset_train, dataset.iloc[train_index])
+    pd.testing.assert_frame_equal(dataset_test, dataset.iloc[test_index])
+
+
+@pytest.mark.parametrize("mode", Data_Split.split_modes)
+def test_folds_are_disjoint_and_cover_every_row(dataset, mode):
+    folds = list(Data_Split().kfold_indices(dataset, n_splits=5, mode=mode))
+    validation = np.concatenate([validation for _, validation in folds])
+
+    assert len(folds) == 5
+    for train_index, validation_index in folds:
+        assert len(np.intersect1d(train_index, validation_index)) == 0
+    # Each row is validated once; the time mode never validates the first rows, used to train the first fold
+    assert len(validation) == len(np.unique(validation))
+    if mode == "time":
+        dropoff = dataset[DROPOFF_COL].to_numpy()
+        assert all(dropoff[train].max() <= dropoff[valid].min() for train, valid in folds)
+    else:
+        np.testing.assert_array_equal(np.sort(validation), np.arange(N_ROWS))
+        for train_index, validation_index in folds:
+            np.testing.assert_array_equal(np.sort(np.r_[train_index, validation_index]), np.arange(N_ROWS))
+
+
+def test_stratified_folds_keep_the_target_distribution(dataset):
+    bins = Data_Split._target_bins(dataset, "fare_amount", 10)
+    shares = bin_shares(bins, np.arange(N_ROWS))
+
+    for _, validation_index in Data_Split().kfold_indices(dataset, n_splits=5, mode="stratified"):
+        np.testing.assert_allclose(bin_shares(bins, validation_index), shares,
+                                   atol=1 / len(validation_index) + 1e-12)
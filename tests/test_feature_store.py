@@ -0,0 +1,90 @@
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Preprocessing
+from utils.feature_store import Feature_Store, partition_days, source_fingerprints
+from utils.schema import DROPOFF_COL, compact_frame
+
+
+@pytest.fixture
+def dataset():
+    return compact_frame(generate_greentaxi(5000, with_timestamp=True))
+
+
+def fingerprints(dataset: pd.DataFrame) -> dict:
+    order, days = partition_days(dataset)
+    return source_fingerprints(dataset, order, days)
+
+
+def first_row_of_day(dataset: pd.DataFrame, day: str) -> int:
+    return int(np.flatnonzero(dataset[DROPOFF_COL].dt.strftime("%Y-%m-%d") == day)[0])
+
+
+@pytest.mark.parametrize("col, value", [
+    ("passenger_count", 6),
+    ("pu_hour", 3),
+    ("rate_code_des", "Group ride"),
+    ("pmt_type_des", "Dispute"),
+    ("travel_day", "Sunday"),
+    ("trip_distance", 123.0),
+    ("fare_amount", 99.0),
+])
+def test_change_of_any_raw_column_changes_the_fingerprint_of_its_day(dataset, col, value):
+    before = fingerprints(dataset)
+    edited = dataset.copy()
+    edited.iloc[first_row_of_day(dataset, "2023-01-05"), edited.columns.get_loc(col)] = value
+
+    after = fingerprints(edited)
+
+    assert [day for day in before if before[day] != after[day]] == ["2023-01-05"]
+
+
+def test_fingerprint_does_not_depend_on_the_loaded_dtypes(dataset):
+    raw = dataset.astype({"passenger_count": "float64", "pu_hour": "int64", "rate_code_des": "object",
+                          "pmt_type_des": "object", "travel_day": "object", "trip_distance": "float32"})
+    raw[DROPOFF_COL] = raw[DROPOFF_COL].astype("datetime64[ms]")
+
+    assert fingerprints(raw) == fingerprints(dataset)
+
+
+def test_edited_day_is_preprocessed_again(dataset, tmp_path):
+    encoder = Data_Preprocessing().fit_encoder(dataset)
+    store = Feature_Store(str(tmp_path))
+    store.features(dataset, encoder)
+
+    edited = dataset.copy()
+    position = first_row_of_day(dataset, "2023-01-05")
+    edited.iloc[position, edited.columns.get_loc("pmt_type_des")] = "Dispute"
+    features, positions = Feature_Store(str(tmp_path)).features(edited, encoder)
+
+    pd.testing.assert_frame_equal(
+        features.iloc[positions].reset_index(drop=True),
+        Data_Preprocessing().data_handling(edited, encoder=encoder).reset_index(drop=True))
+
+
+def _store_days(store_dir: str, first_day: int) -> None:
+    dataset = compact_frame(generate_greentaxi(2000, with_timestamp=True))
+    days = dataset[DROPOFF_COL].dt.day
+    dataset = dataset[(days >= first_day) & (days < first_day + 4)].reset_index(drop=True)
+    encoder = Data_Preprocessing().fit_encoder(compact_frame(generate_greentaxi(2000, with_timestamp=True)))
+    Feature_Store(store_dir).features(dataset, encoder)
+
+
+def test_concurrent_runs_keep_every_partition(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_store_days, args=(str(tmp_path), first_day))
+                 for first_day in (1, 5, 9, 13, 17, 21)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    store = Feature_Store(str(tmp_path))
+    (partitions,) = [stored["partitions"] for stored in store.index["specs"].values()]
+    assert sorted(partitions) == [f"2023-01-{day:02d}" for day in range(1, 25)]
+    assert all(store.entry(spec, day) is not None for spec in store.index["specs"] for day in partitions)
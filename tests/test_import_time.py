@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import_time import DEFERRED_MODULES, FRAMEWORK_MODULES, REPO_ROOT
+
+pytest.importorskip("zenml")
+
+# Listed from the files, steps.promotion has no __init__
+STEP_MODULES = sorted(".".join(path.relative_to(REPO_ROOT).with_suffix("").parts)
+                      for path in (REPO_ROOT / "steps").glob("*/*.py") if path.name != "__init__.py")
+
+_probe = """
+import json, sys
+for name in {frameworks!r}:
+    __import__(name)
+before = set(sys.modules)
+try:
+    __import__({module!r})
+except ModuleNotFoundError as error:
+    if not (error.name or "").startswith("zenml"):
+        raise
+    print(json.dumps({{"missing": error.name}}))
+    sys.exit(0)
+print(json.dumps({{"loaded": [name for name in {deferred!r} if name in sys.modules and name not in before]}}))
+"""
+
+
+def imported_deferred_modules(module: str) -> list:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])))
+    code = _probe.format(frameworks=FRAMEWORK_MODULES, module=module, deferred=DEFERRED_MODULES)
+    completed = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if "missing" in result:
+        pytest.skip(f"{result['missing']} is not part of the installed zenml")
+    return result["loaded"]
+
+
+def test_every_step_module_is_covered():
+    assert "steps.training.ml_train" in STEP_MODULES
+    assert "steps.promotion.model_promotion" in STEP_MODULES
+
+
+@pytest.mark.parametrize("module", STEP_MODULES)
+def test_step_module_does_not_import_sklearn_estimators_or_mlflow(module):
+    # A fresh interpreter, so that the modules imported by the other tests do not hide an import
+    assert imported_deferred_modules(module) == []
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils.data_handling import Data_Preprocessing
+from utils.model_train import Incremental_Trainer, SGD_Regressor_Model
+
+TRAIN_PARAMS = {"n_epochs": 1}
+
+
+class Recording_SGD_Model(SGD_Regressor_Model):
+    """
+    SGD model template recording the number of rows of every training and update.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.trained_rows = []
+        self.updated_rows = []
+
+    def ml_model_train(self, dataset: pd.DataFrame, **kwargs):
+        self.trained_rows.append(len(dataset))
+        return super().ml_model_train(dataset, **kwargs)
+
+    def ml_model_update(self, model, dataset: pd.DataFrame, **kwargs):
+        self.updated_rows.append(len(dataset))
+        return super().ml_model_update(model, dataset, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def data():
+    history, new_rows = generate_greentaxi(6000, seed=0), generate_greentaxi(1000, seed=1)
+    preprocessing = Data_Preprocessing()
+    encoder = preprocessing.fit_encoder(new_rows)
+    return preprocessing.data_handling(history, encoder=encoder), preprocessing.data_handling(new_rows, encoder=encoder)
+
+
+@pytest.fixture
+def previous_model(data):
+    history, _ = data
+    model, _ = SGD_Regressor_Model().ml_model_train(history, **TRAIN_PARAMS)
+    return model
+
+
+class History:
+    def __init__(self, rows: pd.DataFrame):
+        self.rows = rows
+        self.calls = 0
+
+    def __call__(self) -> pd.DataFrame:
+        self.calls += 1
+        # Loaded columns are not in the order of the new rows
+        return self.rows[self.rows.columns[::-1]]
+
+
+def test_update_trains_on_the_new_rows_only(data, previous_model):
+    history_rows, new_rows = data
+    ml_model = Recording_SGD_Model()
+    history = History(history_rows)
+
+    _, mode = Incremental_Trainer(ml_model, min_r2=-1.0).train(new_rows, previous_model, history=history,
+                                                             train_params=TRAIN_PARAMS)
+
+    assert mode == "update"
+    assert ml_model.updated_rows == [len(new_rows)] and ml_model.trained_rows == []
+    assert history.calls == 0
+
+
+@pytest.mark.parametrize("fallback", ["drift", "no previous model"])
+def test_full_training_uses_the_history_and_the_new_rows(data, previous_model, fallback):
+    history_rows, new_rows = data
+    ml_model = Recording_SGD_Model()
+    history = History(history_rows)
+    if fallback == "drift":
+        # No r2 score can be within 0 of a perfect recorded score
+        trainer, previous_r2 = Incremental_Trainer(ml_model, max_r2_drop=0.0), 1.0
+    else:
+        trainer, previous_r2, previous_model = Incremental_Trainer(ml_model), None, None
+
+    model, mode = trainer.train(new_rows, previous_model, previous_r2=previous_r2, history=history,
+                                train_params=TRAIN_PARAMS)
+
+    assert mode == "full"
+    assert ml_model.trained_rows == [len(history_rows) + len(new_rows)] and ml_model.updated_rows == []
+    assert history.calls == 1
+    assert list(model.feature_names_in_) == [col for col in new_rows.columns if col != "fare_amount"]
+
+
+def test_full_training_without_history_uses_the_new_rows(data):
+    _, new_rows = data
+    ml_model = Recording_SGD_Model()
+
+    _, mode = Incremental_Trainer(ml_model).train(new_rows, train_params=TRAIN_PARAMS)
+
+    assert mode == "full" and ml_model.trained_rows == [len(new_rows)]
@@ -0,0 +1,161 @@
+import importlib.util
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from utils import memoization
+from utils.memoization import Memo_Store, Step_Memo, fingerprint, memo_key
+from utils.schema import compact_frame
+
+
+@pytest.fixture
+def dataset():
+    return compact_frame(generate_greentaxi(2000, seed=0))
+
+
+def total_fare(dataset: pd.DataFrame, scale: float = 1.0) -> float:
+    return float(dataset["fare_amount"].sum() * scale)
+
+
+def test_fingerprint_depends_on_the_content_only(dataset):
+    # Another frame with the same content: copied, columns rebuilt from other buffers
+    rebuilt = pd.DataFrame({col: dataset[col].copy() for col in dataset.columns})
+
+    assert fingerprint(rebuilt) == fingerprint(dataset)
+    # Row labels other than 0..n-1 are part of the content
+    rows = dataset.iloc[1000:]
+    assert fingerprint(rows) != fingerprint(rows.reset_index(drop=True))
+    assert fingerprint(rows.iloc[::-1]) != fingerprint(rows.iloc[::-1].reset_index(drop=True))
+    assert fingerprint(rows.sample(frac=1.0, random_state=0)) != fingerprint(rows)
+    assert fingerprint({"b": 1, "a": [1.0, "x"]}) == fingerprint({"a": [1.0, "x"], "b": 1})
+
+
+@pytest.mark.parametrize("change", ["value", "dtype", "column name", "category"])
+def test_fingerprint_changes_with_the_content(dataset, change):
+    changed = dataset.copy()
+    if change == "value":
+        changed.loc[10, "trip_distance"] += 0.01
+    elif change == "dtype":
+        changed["pu_hour"] = changed["pu_hour"].astype("int64")
+    elif change == "column name":
+        changed = changed.rename(columns={"pu_hour": "hour"})
+    else:
+        changed["pmt_type_des"] = changed["pmt_type_des"].cat.add_categories(["Voided"])
+
+    assert fingerprint(changed) != fingerprint(dataset)
+
+
+def _key_in_process(queue) -> None:
+    dataset = compact_frame(generate_greentaxi(2000, seed=0))
+    queue.put(memo_key(total_fare, {"dataset": dataset, "scale": 2.0}, extra={"source": "db"}))
+
+
+def test_key_is_stable_across_processes(dataset):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_key_in_process, args=(queue,))
+    process.start()
+    key = queue.get(timeout=60)
+    process.join()
+
+    assert key == memo_key(total_fare, {"dataset": dataset, "scale": 2.0}, extra={"source": "db"})
+    assert key != memo_key(total_fare, {"dataset": dataset, "scale": 3.0}, extra={"source": "db"})
+    assert key != memo_key(total_fare, {"dataset": dataset, "scale": 2.0}, extra={"source": "cache"})
+
+
+def load_function(directory, source: str):
+    # One file per version, as linecache keeps the source of a path
+    directory.mkdir()
+    path = directory / "memo_target.py"
+    path.write_text(source)
+    spec = importlib.util.spec_from_file_location("memo_target", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.compute
+
+
+def test_key_changes_with_the_function_source(tmp_path):
+    before = load_function(tmp_path / "before", "def compute(x):\n    return x + 1\n")
+    same = load_function(tmp_path / "same", "def compute(x):\n    return x + 1\n")
+    after = load_function(tmp_path / "after", "def compute(x):\n    return x + 2\n")
+
+    assert memo_key(before, {"x": 1}) == memo_key(same, {"x": 1})
+    assert memo_key(before, {"x": 1}) != memo_key(after, {"x": 1})
+
+
+class Scaler:
+    def __init__(self, factor: float):
+        self.factor = factor
+
+    def apply(self, x: float) -> float:
+        return x * self.factor
+
+
+def test_key_of_a_method_depends_on_its_object():
+    assert memo_key(Scaler(2.0).apply, {"x": 1.0}) == memo_key(Scaler(2.0).apply, {"x": 1.0})
+    assert memo_key(Scaler(2.0).apply, {"x": 1.0}) != memo_key(Scaler(3.0).apply, {"x": 1.0})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    store = Memo_Store(str(tmp_path), max_entries=2)
+    for position, key in enumerate(("a", "b", "c")):
+        store.write(key, "compute", position, None, step_run="run", seconds=1.0)
+        store.index["entries"][key]["last_access"] = position
+    # a is read again, so b is the least recently used
+    store.touch("a")
+
+    store.evict()
+    store.save()
+
+    assert sorted(Memo_Store(str(tmp_path)).index["entries"]) == ["a", "c"]
+
+
+def test_values_the_index_cannot_hold_are_rejected(tmp_path):
+    store = Memo_Store(str(tmp_path))
+
+    with pytest.raises(TypeError):
+        store.write("a", "compute", np.arange(3), None, step_run="run", seconds=1.0)
+    with pytest.raises(ValueError):
+        store.write("a", "compute", (1, 2), ("model", None, None), step_run="run", seconds=1.0)
+
+
+def _write_entries(memo_dir: str, worker: int) -> None:
+    for position in range(20):
+        store = Memo_Store(memo_dir)
+        with store.locked():
+            store.write(f"{worker}-{position}", "compute", position, None, step_run=f"run-{worker}", seconds=0.0)
+
+
+def test_concurrent_writers_keep_every_entry(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_write_entries, args=(str(tmp_path), worker)) for worker in range(6)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    entries = Memo_Store(str(tmp_path)).index["entries"]
+    assert sorted(entries) == sorted(f"{worker}-{position}" for worker in range(6) for position in range(20))
+
+
+def test_call_with_arguments_of_the_same_content_is_reused(dataset, tmp_path, monkeypatch):
+    monkeypatch.setenv(memoization.MEMO_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(memoization, "_current_step_run", lambda: "run")
+    calls = []
+
+    def counted(dataset: pd.DataFrame, scale: float = 1.0) -> float:
+        calls.append(scale)
+        return total_fare(dataset, scale)
+
+    first = Step_Memo(counted, dataset, scale=2.0)
+    second = Step_Memo(counted, dataset.copy(), 2.0)
+    other = Step_Memo(counted, dataset, scale=3.0)
+
+    assert first.call() == second.call() == total_fare(dataset, 2.0)
+    assert other.call() == total_fare(dataset, 3.0)
+    assert calls == [2.0, 3.0]
+    assert not first.hit and second.hit and not other.hit
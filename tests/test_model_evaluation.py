@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.tree import DecisionTreeRegressor
+
+from utils.model_evaluation import Chunked_Model_Evaluation, Regression_Metrics, Regression_Metrics_Accumulator
+
+TARGET = "fare_amount"
+
+
+def make_predictions(n_rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    y_true = rng.gamma(2.0, 8.0, size=n_rows)
+    return y_true, y_true + rng.normal(scale=3.0, size=n_rows)
+
+
+def assert_matches_sklearn(metrics: dict, y_true: np.ndarray, y_pred: np.ndarray):
+    assert metrics["mse"] == pytest.approx(mean_squared_error(y_true, y_pred), rel=1e-10)
+    assert metrics["rmse"] == pytest.approx(np.sqrt(mean_squared_error(y_true, y_pred)), rel=1e-10)
+    assert metrics["r2"] == pytest.approx(r2_score(y_true, y_pred), rel=1e-10)
+    assert metrics["mae"] == pytest.approx(mean_absolute_error(y_true, y_pred), rel=1e-10)
+
+
+@pytest.mark.parametrize("chunk_sizes", [[5000], [1, 4999], [1234, 0, 7, 3000, 1759], [2500, 2500]])
+def test_accumulated_metrics_equal_sklearn(chunk_sizes):
+    y_true, y_pred = make_predictions(sum(chunk_sizes))
+    accumulator = Regression_Metrics_Accumulator()
+
+    for start, stop in zip(np.cumsum([0] + chunk_sizes[:-1]), np.cumsum(chunk_sizes)):
+        accumulator.update(y_true[start:stop], y_pred[start:stop])
+
+    assert_matches_sklearn(accumulator.result(), y_true, y_pred)
+
+
+def test_r2_is_stable_for_a_large_target_offset():
+    # Chan's merge of the chunk deviations, not a sum of squares, keeps r2 exact around a large mean
+    y_true, y_pred = make_predictions(4000)
+    accumulator = Regression_Metrics_Accumulator()
+    for start in range(0, 4000, 333):
+        accumulator.update(y_true[start:start + 333] + 1e9, y_pred[start:start + 333] + 1e9)
+
+    assert accumulator.result()["r2"] == pytest.approx(r2_score(y_true, y_pred), rel=1e-6)
+
+
+def test_residual_quantiles_are_exact_when_every_residual_is_kept():
+    y_true, y_pred = make_predictions(3000)
+
+    metrics = Regression_Metrics().metric_score(y_true, y_pred)
+
+    assert_matches_sklearn(metrics, y_true, y_pred)
+    for quantile in Regression_Metrics_Accumulator.quantiles:
+        assert metrics[f"residual_q{int(quantile * 100):02d}"] == pytest.approx(
+            np.quantile(y_pred - y_true, quantile))
+
+
+def test_residual_sample_is_bounded():
+    y_true, y_pred = make_predictions(10000)
+    accumulator = Regression_Metrics_Accumulator(max_sample=500)
+    for start in range(0, 10000, 999):
+        accumulator.update(y_true[start:start + 999], y_pred[start:start + 999])
+
+    assert len(accumulator.sample) == 500
+    # The median of a uniform sample of 500 residuals is within a few standard errors of the true one
+    assert accumulator.result()["residual_q50"] == pytest.approx(np.median(y_pred - y_true), abs=0.5)
+
+
+def test_empty_accumulator_is_rejected():
+    with pytest.raises(ValueError):
+        Regression_Metrics_Accumulator().result()
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(1)
+    dataset = pd.DataFrame(rng.normal(size=(7001, 4)), columns=["a", "b", "c", "d"])
+    dataset[TARGET] = 5 * dataset["a"] - dataset["b"] ** 2 + rng.normal(size=len(dataset))
+    model = DecisionTreeRegressor(max_depth=8, random_state=0).fit(dataset.drop(columns=TARGET), dataset[TARGET])
+    # The target sits between the features, and the feature columns are not in the fitted order
+    return model, dataset[["c", "a", TARGET, "d", "b"]]
+
+
+@pytest.mark.parametrize("chunk_size, n_jobs", [(7001, 1), (1000, 1), (999, 1), (1000, 4), (333, 3)])
+def test_chunked_metrics_equal_sklearn(fitted, chunk_size, n_jobs):
+    model, dataset = fitted
+    y_pred = model.predict(dataset[list(model.feature_names_in_)].astype(np.float32))
+
+    metrics = Chunked_Model_Evaluation(chunk_size=chunk_size, n_jobs=n_jobs).evaluate(model, dataset, TARGET)
+
+    assert_matches_sklearn(metrics, dataset[TARGET].to_numpy(), y_pred)
+
+
+def test_threaded_evaluation_equals_the_serial_one(fitted):
+    model, dataset = fitted
+
+    serial = Chunked_Model_Evaluation(chunk_size=500, n_jobs=1).evaluate(model, dataset, TARGET)
+    threaded = Chunked_Model_Evaluation(chunk_size=500, n_jobs=4).evaluate(model, dataset, TARGET)
+
+    # Blocks are reduced in order whatever the thread that predicted them
+    assert threaded == serial
+
+
+def test_model_without_feature_names_uses_every_other_column():
+    dataset = pd.DataFrame({"a": np.arange(10.0), TARGET: 2 * np.arange(10.0), "b": np.ones(10)})
+    model = LinearRegression().fit(dataset[["a", "b"]].to_numpy(), dataset[TARGET])
+
+    metrics = Chunked_Model_Evaluation(chunk_size=3).evaluate(model, dataset, TARGET)
+
+    assert metrics["mse"] == pytest.approx(0.0, abs=1e-20)
+
+
+def test_missing_feature_is_rejected(fitted):
+    model, dataset = fitted
+
+    with pytest.raises(ValueError, match="Features missing"):
+        Chunked_Model_Evaluation().evaluate(model, dataset.drop(columns="d"), TARGET)
@@ -0,0 +1,109 @@
+import pytest
+
+from utils.model_promotion import In_Memory_Model_Registry, Model_Promotion_Service
+
+MODEL = "reg_model"
+
+
+def make_service(versions: dict, production: str = None, ttl_seconds: float = 60.0):
+    registry = In_Memory_Model_Registry()
+    for version, r2 in versions.items():
+        registry.add_version(MODEL, version, {"test_r2_score": r2})
+    if production is not None:
+        registry.stages[MODEL] = {"production": production}
+    return registry, Model_Promotion_Service(registry, model_name=MODEL, threshold=0.5, ttl_seconds=ttl_seconds)
+
+
+def test_promote_without_production_version():
+    registry, service = make_service({"v1": 0.7})
+
+    result = service.promote({"v1": 0.7})
+
+    assert result.promoted and result.version == "v1"
+    assert registry.stages[MODEL] == {"production": "v1"}
+
+
+def test_promote_replaces_and_archives_the_production_version():
+    registry, service = make_service({"v1": 0.6, "v2": 0.8}, production="v1")
+
+    result = service.promote({"v2": 0.8})
+
+    assert result.promoted and result.stages == {"v2": "production"}
+    # The previous version leaves the stage with the same call
+    assert registry.stages[MODEL] == {"production": "v2"}
+    assert "v1" not in registry.stages[MODEL].values()
+
+
+def test_worse_candidate_is_staged():
+    registry, service = make_service({"v1": 0.8, "v2": 0.6}, production="v1")
+
+    result = service.promote({"v2": 0.6})
+
+    assert not result.promoted
+    assert registry.stages[MODEL] == {"production": "v1", "staging": "v2"}
+
+
+def test_candidate_below_threshold_is_not_touched():
+    registry, service = make_service({"v1": 0.8, "v2": 0.3}, production="v1")
+    round_trips = registry.round_trips
+
+    result = service.promote({"v2": 0.3})
+
+    assert not result.promoted and result.stages == {}
+    assert registry.stages[MODEL] == {"production": "v1"}
+    assert registry.round_trips == round_trips
+
+
+def test_best_of_several_candidates_is_promoted_and_the_others_staged():
+    registry, service = make_service({"v1": 0.6, "v2": 0.9, "v3": 0.7}, production="v1")
+
+    result = service.promote({"v2": None, "v3": None})
+
+    assert result.promoted and result.version == "v2" and result.metric == 0.9
+    assert registry.stages[MODEL] == {"production": "v2", "staging": "v3"}
+
+
+def test_snapshot_is_dropped_after_a_promotion():
+    registry, service = make_service({"v1": 0.6, "v2": 0.7, "v3": 0.8})
+
+    assert service.promote({"v1": 0.6}).promoted
+    round_trips = registry.round_trips
+    # The stage was written, so it is read again instead of being served from the cache
+    assert service.stage_version("production").version == "v1"
+    assert registry.round_trips == round_trips + 1
+    assert service.stage_version("production").version == "v1"
+    assert registry.round_trips == round_trips + 1
+
+
+def test_snapshot_expires_after_ttl():
+    registry, service = make_service({"v1": 0.6, "v2": 0.9}, production="v1", ttl_seconds=0.0)
+    assert service.stage_version("production").version == "v1"
+
+    # Promoted by another process
+    registry.set_stages(MODEL, {"v2": "production"})
+
+    assert service.stage_version("production").version == "v2"
+    assert not service.promote({"v1": 0.6}).promoted
+
+
+def test_round_trips_count_each_transition():
+    registry, service = make_service({"v1": 0.6, "v2": 0.9, "v3": 0.7})
+
+    result = service.promote({"v2": 0.9, "v3": 0.7})
+
+    # One read of the stage, then one call per transition
+    assert result.stages == {"v3": "staging", "v2": "production"}
+    assert registry.round_trips == 1 + 2
+
+
+def test_promotion_step_does_not_promote_on_drift(monkeypatch):
+    promotion = pytest.importorskip("steps.promotion.model_promotion")
+    registry, service = make_service({"v1": 0.6, "v2": 0.9}, production="v1")
+    monkeypatch.setattr(promotion, "get_promotion_service", lambda *args, **kwargs: service)
+
+    assert not promotion.model_promotion_flag.entrypoint(r2_score=0.9, drift_ok=False)
+    assert registry.stages[MODEL] == {"production": "v1"}
+    assert registry.round_trips == 0
+
+    assert promotion.model_promotion_flag.entrypoint(r2_score=0.9, drift_ok=True)
+    assert registry.stages[MODEL] == {"production": "v2"}
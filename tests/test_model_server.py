@@ -0,0 +1,197 @@
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_greentaxi
+from serving.model_server import Feature_Lookup, Model_Server, make_http_server
+from utils.data_handling import Data_Preprocessing
+from utils.model_train import DecisionTree_Regressor_Model
+from utils.schema import compact_frame
+
+
+class Recording_Model:
+    """
+    Model recording the number of rows of every predict call, optionally held until a gate opens.
+    """
+
+    def __init__(self, model, offset: float = 0.0, gate: threading.Event = None):
+        self.model = model
+        self.offset = offset
+        self.gate = gate
+        self.feature_names_in_ = model.feature_names_in_
+        self.batches = []
+
+    def predict(self, X) -> np.ndarray:
+        if self.gate is not None:
+            self.gate.wait()
+        self.batches.append(len(X))
+        return self.model.predict(X) + self.offset
+
+
+@pytest.fixture(scope="module")
+def trained():
+    dataset = compact_frame(generate_greentaxi(5000))
+    encoder = Data_Preprocessing().fit_encoder(dataset)
+    model, _ = DecisionTree_Regressor_Model().ml_model_train(dataset=Data_Preprocessing().data_handling(dataset,
+                                                                                                       encoder=encoder))
+    records = generate_greentaxi(40, seed=1).drop(columns=["fare_amount"]).to_dict("records")
+    return model, encoder, records
+
+
+def make_server(trained, models: dict, version: list):
+    _, encoder, _ = trained
+    # version[0] is the version at the stage
+    return Model_Server(resolve_version=lambda: version[0], load_version=lambda name: (models[name], encoder),
+                        poll_seconds=3600)
+
+
+def expected(trained, model: Recording_Model, records: list) -> list:
+    _, encoder, _ = trained
+    X = Feature_Lookup(list(model.feature_names_in_), encoder).encode(records)
+    return (model.model.predict(pd.DataFrame(X, columns=model.feature_names_in_)) + model.offset).tolist()
+
+
+def queue_requests(server: Model_Server, requests: list, results: dict) -> list:
+    """
+    This function sends every request from its own thread and returns once they are all queued.
+    """
+    def send(key, records):
+        try:
+            results[key] = server.predict(records, timeout=10)
+        except Exception as error:
+            results[key] = error
+
+    queued = server._requests.qsize()
+    threads = [threading.Thread(target=send, args=(key, records)) for key, records in requests]
+    for thread in threads:
+        thread.start()
+    while server._requests.qsize() < queued + len(requests):
+        time.sleep(0.005)
+    return threads
+
+
+def test_concurrent_requests_are_predicted_in_one_batch(trained):
+    model, _, records = trained
+    recording = Recording_Model(model)
+    server = make_server(trained, {"v1": recording}, ["v1"])
+    server.refresh()
+    requests = [(key, records[key * 5:key * 5 + 5]) for key in range(8)]
+    results = {}
+
+    threads = queue_requests(server, requests, results)
+    server.start()
+    for thread in threads:
+        thread.join()
+    server.stop()
+
+    assert recording.batches == [40]
+    for key, request_records in requests:
+        predictions, version = results[key]
+        assert version == "v1"
+        np.testing.assert_allclose(predictions, expected(trained, recording, request_records), rtol=1e-6)
+
+
+def test_version_swap_mid_stream_predicts_each_batch_with_one_version(trained):
+    model, _, records = trained
+    v1, v2 = Recording_Model(model), Recording_Model(model, offset=1000.0)
+    version = ["v1"]
+    server = make_server(trained, {"v1": v1, "v2": v2}, version)
+    server.refresh()
+    results = {}
+
+    threads = queue_requests(server, [("before", records[:3]), ("before_2", records[3:5])], results)
+    version[0] = "v2"
+    assert server.refresh()
+    threads += queue_requests(server, [("after", records[5:9])], results)
+    server.start()
+    for thread in threads:
+        thread.join()
+    server.stop()
+
+    # The queued requests are merged, then split by the version that encoded them
+    assert v1.batches == [5] and v2.batches == [4]
+    assert [results[key][1] for key in ("before", "before_2", "after")] == ["v1", "v1", "v2"]
+    np.testing.assert_allclose(results["after"][0], expected(trained, v2, records[5:9]), rtol=1e-6)
+
+
+def post(port: int, body) -> tuple:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("POST", "/predict", json.dumps(body).encode(), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    reply = json.loads(response.read())
+    connection.close()
+    return response.status, reply
+
+
+def test_invalid_record_gets_a_400_without_failing_its_batch(trained):
+    model, _, records = trained
+    gate = threading.Event()
+    recording = Recording_Model(model, gate=gate)
+    server = make_server(trained, {"v1": recording}, ["v1"]).start()
+    http_server = make_http_server(server, port=0)
+    port = http_server.server_address[1]
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    replies = {}
+
+    def send(key, body):
+        replies[key] = post(port, body)
+
+    try:
+        # The first request holds the batcher, the next ones queue up behind it
+        senders = [threading.Thread(target=send, args=(key, {"instances": records[key:key + 2]}))
+                   for key in range(3)]
+        for sender in senders:
+            sender.start()
+        while server._requests.qsize() < 2:
+            time.sleep(0.005)
+        status, reply = post(port, {"instances": [records[0], {"trip_distance": "far"}]})
+        assert status == 400 and "invalid request" in reply["error"]
+        assert post(port, {"instances": "not a list"})[0] == 400
+
+        gate.set()
+        for sender in senders:
+            sender.join()
+    finally:
+        gate.set()
+        http_server.shutdown()
+        server.stop()
+
+    assert sum(recording.batches) == 6
+    for key in range(3):
+        status, reply = replies[key]
+        assert status == 200 and reply["model_version"] == "v1"
+        np.testing.assert_allclose(reply["predictions"], expected(trained, recording, records[key:key + 2]),
+                                   rtol=1e-6)
+
+
+def test_stop_fails_the_queued_requests(trained):
+    model, _, records = trained
+    gate = threading.Event()
+    recording = Recording_Model(model, gate=gate)
+    server = make_server(trained, {"v1": recording}, ["v1"]).start()
+    results = {}
+
+    # The batcher holds the first request until the gate opens; the others stay queued
+    threads = queue_requests(server, [("running", records[:2])], results)
+    while server._requests.qsize():
+        time.sleep(0.005)
+    threads += queue_requests(server, [("queued", records[2:4]), ("queued_2", records[4:6])], results)
+
+    stopping = threading.Thread(target=server.stop)
+    stopping.start()
+    gate.set()
+    stopping.join(timeout=5)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert not stopping.is_alive()
+    assert results["running"][1] == "v1"
+    for key in ("queued", "queued_2"):
+        assert isinstance(results[key], RuntimeError) and str(results[key]) == "server stopped"
+    with pytest.raises(RuntimeError, match="server stopped"):
+        server.predict(records[:1])
@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.parallel_runner import Parallel_Runner, Task, read_handoff, write_handoff
+
+MODULE = "test_parallel_runner"
+
+
+def timed_sleep(seconds: float = 0.3, after=None) -> dict:
+    started = time.time()
+    time.sleep(seconds)
+    return {"started": started, "ended": time.time()}
+
+
+def fail(after=None):
+    raise ValueError("worker failed")
+
+
+def overlap(first: dict, second: dict) -> bool:
+    return first["started"] < second["ended"] and second["started"] < first["ended"]
+
+
+def run(tasks: list, tmp_path, **options) -> dict:
+    outputs = Parallel_Runner(run_dir=str(tmp_path), **options).run(tasks)
+    return {name.split(".")[0]: read_handoff(path) for name, path in outputs.items()}
+
+
+def test_running_tasks_stay_within_the_cpu_budget(tmp_path):
+    tasks = [Task("wide", f"{MODULE}:timed_sleep", threads=2),
+             Task("narrow_1", f"{MODULE}:timed_sleep"),
+             Task("narrow_2", f"{MODULE}:timed_sleep")]
+
+    times = run(tasks, tmp_path, max_workers=4, cpu_budget=2)
+
+    # The two narrow tasks fit in the budget together, not beside the wide one
+    assert overlap(times["narrow_1"], times["narrow_2"])
+    assert not overlap(times["wide"], times["narrow_1"]) and not overlap(times["wide"], times["narrow_2"])
+
+
+def test_task_wider_than_the_budget_runs_alone(tmp_path):
+    tasks = [Task("narrow", f"{MODULE}:timed_sleep"),
+             Task("too_wide", f"{MODULE}:timed_sleep", threads=4)]
+
+    times = run(tasks, tmp_path, max_workers=2, cpu_budget=2)
+
+    assert not overlap(times["narrow"], times["too_wide"])
+
+
+def test_tasks_start_after_their_inputs(tmp_path):
+    tasks = [Task("first", f"{MODULE}:timed_sleep", params={"seconds": 0.1}),
+             Task("second", f"{MODULE}:timed_sleep", inputs={"after": "first.output"}, params={"seconds": 0.1})]
+
+    times = run(tasks, tmp_path, max_workers=2)
+
+    assert times["second"]["started"] >= times["first"]["ended"]
+
+
+def test_handoff_round_trip(tmp_path):
+    dataset = pd.DataFrame({"trip_distance": np.linspace(0, 10, 50),
+                            "passenger_count": np.arange(50, dtype=np.int16),
+                            "travel_day": pd.Categorical(["Monday", "Friday"] * 25)})
+    index = np.arange(0, 50, 3)
+    encoder_config = {"travel_day": ["Friday", "Monday"]}
+
+    paths = {name: write_handoff(value, str(tmp_path / name))
+             for name, value in (("dataset", dataset), ("index", index), ("config", encoder_config))}
+
+    assert [path.rsplit(".", 1)[1] for path, _ in paths.values()] == ["arrow", "npy", "joblib"]
+    assert all(size > 0 for _, size in paths.values())
+    pd.testing.assert_frame_equal(read_handoff(paths["dataset"][0]), dataset)
+    np.testing.assert_array_equal(read_handoff(paths["index"][0]), index)
+    assert read_handoff(paths["config"][0]) == encoder_config
+
+
+def test_critical_path_is_the_longest_chain():
+    tasks = [Task("load", "m:f"),
+             Task("split", "m:f", inputs={"dataset": "load.output"}),
+             Task("preprocess_train", "m:f", inputs={"index": "split.output"}),
+             Task("preprocess_test", "m:f", inputs={"index": "split.output"}),
+             Task("train", "m:f", inputs={"dataset": "preprocess_train.output"}),
+             Task("evaluate", "m:f", inputs={"model": "train.output", "dataset": "preprocess_test.output"})]
+    seconds = {"load": 2.0, "split": 1.0, "preprocess_train": 3.0, "preprocess_test": 4.0,
+               "train": 5.0, "evaluate": 1.0}
+
+    length, path = Parallel_Runner.critical_path(tasks, seconds)
+
+    assert length == 12.0
+    assert path == ["load", "split", "preprocess_train", "train", "evaluate"]
+    assert Parallel_Runner.critical_path([], {}) == (0.0, [])
+
+
+def test_worker_error_stops_the_run(tmp_path):
+    tasks = [Task("failing", f"{MODULE}:fail"),
+             Task("downstream", f"{MODULE}:timed_sleep", inputs={"after": "failing.output"})]
+
+    with pytest.raises(ValueError, match="worker failed"):
+        run(tasks, tmp_path, max_workers=2)
+    assert not (tmp_path / "downstream").exists()
+
+
+def test_inputs_must_come_from_earlier_tasks(tmp_path):
+    tasks = [Task("second", f"{MODULE}:timed_sleep", inputs={"after": "first.output"}),
+             Task("first", f"{MODULE}:timed_sleep")]
+
+    with pytest.raises(ValueError, match="topological order"):
+        run(tasks, tmp_path)
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils import profiling
+from utils.profiling import Peak_RSS_Sampler, compare_profiles, profile_step, record_written_bytes
+
+ALLOCATED_MB = 200
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(profiling.PROFILE_DIR_ENV, str(tmp_path))
+    monkeypatch.setattr(profiling, "_step_context", lambda: ("run", None))
+    return tmp_path
+
+
+def allocate(mb: int = ALLOCATED_MB) -> float:
+    buffer = np.ones(mb * 1024 * 1024 // 8)
+    # Held long enough for a few samples
+    buffer[::512] += 1
+    return float(buffer[0])
+
+
+@profile_step(enabled=True)
+def large_step():
+    allocate()
+    return np.arange(10)
+
+
+@profile_step(enabled=True)
+def small_step():
+    return np.arange(10)
+
+
+def steps(profile_dir) -> dict:
+    with open(profile_dir / "run.json") as profile_file:
+        return json.load(profile_file)["steps"]
+
+
+def test_sampler_measures_the_peak_within_the_block():
+    with Peak_RSS_Sampler(interval=0.001) as rss:
+        allocate()
+
+    assert rss.increase_mb > ALLOCATED_MB * 0.8
+
+
+def test_peak_of_a_step_does_not_include_the_earlier_steps(profile_dir):
+    large_step()
+    small_step()
+
+    records = steps(profile_dir)
+    assert records["large_step"]["peak_rss_increase_mb"] > ALLOCATED_MB * 0.8
+    # The process peak (ru_maxrss) stays at the large step, the peak of the small step does not
+    assert records["small_step"]["peak_rss_increase_mb"] < ALLOCATED_MB * 0.2
+    assert records["small_step"]["output_nbytes_in_memory"] == np.arange(10).nbytes
+
+
+def test_written_bytes_are_added_to_the_record_of_the_running_step(profile_dir, monkeypatch):
+    small_step()
+    monkeypatch.setattr(profiling, "_step_context", lambda: ("run", "small_step"))
+
+    record_written_bytes(1000)
+    record_written_bytes(24)
+    # Not profiled: nothing recorded
+    monkeypatch.setattr(profiling, "_step_context", lambda: ("run", "other_step"))
+    record_written_bytes(1000)
+
+    records = steps(profile_dir)
+    assert records["small_step"]["output_bytes_written"] == 1024
+    assert "other_step" not in records
+
+
+def test_compare_profiles_reports_regressions(tmp_path):
+    for name, seconds in (("baseline", 1.0), ("candidate", 1.5)):
+        with open(tmp_path / f"{name}.json", "w") as profile_file:
+            json.dump({"steps": {"train": {"wall_seconds": seconds, "peak_rss_increase_mb": 10.0}}}, profile_file)
+
+    assert compare_profiles(str(tmp_path / "baseline.json"), str(tmp_path / "candidate.json")) == [
+        ("train", "wall_seconds", 1.0, 1.5)]
@@ -0,0 +1,164 @@
+from datetime import date
+
+import pytest
+
+from utils.data_handling import Data_Load_from_DB_Pushdown
+from utils.sql import (_window_params, build_dictionary_sql, build_load_dataset_sql, build_partition_stats_sql,
+                       build_pushdown_sql, feature_spec, partition_date_range)
+
+VOCABULARIES = {
+    "rate_code_des": ["JFK", "Standard rate"],
+    "pmt_type_des": ["Cash", "Credit card", "No charge"],
+    "travel_day": ["Friday", "Monday"],
+}
+
+
+def test_window_params_are_iso_dates_and_operator():
+    assert _window_params("2023-01-01", "2023-01-31", True) == dict(
+        start_date="2023-01-01", end_date="2023-01-31", end_operator="<=")
+    assert _window_params(date(2023, 1, 1), date(2023, 1, 1), False)["end_operator"] == "<"
+
+
+@pytest.mark.parametrize("bad_date", ["2023-13-01", "2023-02-30", "01/02/2023", "",
+                                      "2023-01-01' OR '1'='1", "2023-01-01; DROP TABLE greentaxi"])
+def test_bad_iso_dates_are_rejected(bad_date):
+    with pytest.raises(ValueError):
+        _window_params(bad_date, "2023-01-31", True)
+    with pytest.raises(ValueError):
+        _window_params("2023-01-01", bad_date, True)
+    with pytest.raises(ValueError):
+        partition_date_range(bad_date, "2023-01-31")
+
+
+def test_inverted_window_is_rejected():
+    with pytest.raises(ValueError, match="before start_date"):
+        build_load_dataset_sql("2023-01-31", "2023-01-01")
+    with pytest.raises(ValueError, match="before start_date"):
+        build_partition_stats_sql("2023-01-31", "2023-01-01")
+    with pytest.raises(ValueError, match="before start_date"):
+        partition_date_range("2023-01-31", "2023-01-01")
+
+
+def test_window_is_formatted_into_the_queries():
+    sql = build_load_dataset_sql("2023-01-01", "2023-01-31", end_inclusive=False, with_dropoff=True)
+
+    assert "lpep_dropoff_datetime >= '2023-01-01' And lpep_dropoff_datetime < '2023-01-31'" in sql
+    assert "fare_amount,\n                            lpep_dropoff_datetime\n" in sql
+
+
+def test_daily_partitions_are_half_open_except_the_last():
+    partitions = partition_date_range("2023-01-01", "2023-01-04")
+
+    assert partitions == [(date(2023, 1, 1), date(2023, 1, 2), False),
+                          (date(2023, 1, 2), date(2023, 1, 3), False),
+                          (date(2023, 1, 3), date(2023, 1, 4), True)]
+
+
+@pytest.mark.parametrize("start_date, end_date, freq, expected", [
+    # A one-day window is one inclusive partition, like BETWEEN on the same day
+    ("2023-01-01", "2023-01-01", "day", [(date(2023, 1, 1), date(2023, 1, 1), True)]),
+    ("2023-01-01", "2023-01-02", "day", [(date(2023, 1, 1), date(2023, 1, 2), True)]),
+    # A window of exactly one week is not followed by an empty partition
+    ("2023-01-01", "2023-01-08", "week", [(date(2023, 1, 1), date(2023, 1, 8), True)]),
+    ("2023-01-01", "2023-01-10", "week", [(date(2023, 1, 1), date(2023, 1, 8), False),
+                                          (date(2023, 1, 8), date(2023, 1, 10), True)]),
+    # Across a month and a leap day
+    ("2024-02-28", "2024-03-01", "day", [(date(2024, 2, 28), date(2024, 2, 29), False),
+                                         (date(2024, 2, 29), date(2024, 3, 1), True)]),
+])
+def test_partition_boundaries(start_date, end_date, freq, expected):
+    assert partition_date_range(start_date, end_date, freq) == expected
+
+
+@pytest.mark.parametrize("freq", ["day", "week"])
+def test_partitions_cover_the_window_without_gaps(freq):
+    partitions = partition_date_range("2023-01-01", "2023-03-15", freq)
+
+    assert partitions[0][0] == date(2023, 1, 1) and partitions[-1][1] == date(2023, 3, 15)
+    assert all(previous[1] == current[0] for previous, current in zip(partitions, partitions[1:]))
+    assert [end_inclusive for _, _, end_inclusive in partitions] == [False] * (len(partitions) - 1) + [True]
+
+
+def test_unknown_partition_frequency_is_rejected():
+    with pytest.raises(ValueError, match="Unknown partition frequency"):
+        partition_date_range("2023-01-01", "2023-01-31", "month")
+
+
+def test_pushdown_codes_follow_the_vocabulary_order():
+    sql = build_pushdown_sql(VOCABULARIES, "2023-01-01", "2023-01-31")
+
+    # array_position is 1-based, the categorical codes are 0-based
+    assert ("(array_position(ARRAY['Cash', 'Credit card', 'No charge']::text[], pmt_type_des::text) - 1)"
+            "::smallint AS pmt_type_des") in sql
+    assert "lpep_dropoff_datetime <= '2023-01-31'" in sql
+
+
+def test_pushdown_selects_the_columns_in_feature_spec_order():
+    sql = build_pushdown_sql(VOCABULARIES, with_dropoff=True)
+    select_list = sql.split("SELECT", 1)[1].split("FROM", 1)[0]
+
+    columns = [line.strip().rstrip(",").split(" AS ")[-1].split("::")[0] for line in select_list.strip().splitlines()]
+    assert columns == [col for col, _ in feature_spec] + ["lpep_dropoff_datetime"]
+
+
+def test_pushdown_quotes_the_vocabulary_values():
+    sql = build_pushdown_sql({**VOCABULARIES, "pmt_type_des": ["Driver's choice", "Cash"]})
+
+    assert "ARRAY['Driver''s choice', 'Cash']" in sql
+
+
+def test_pushdown_needs_every_categorical_vocabulary():
+    with pytest.raises(KeyError):
+        build_pushdown_sql({"rate_code_des": ["JFK"]})
+
+
+def test_pushdown_and_dictionary_reject_a_bad_window():
+    with pytest.raises(ValueError):
+        build_pushdown_sql(VOCABULARIES, "2023-01-31", "2023-01-01")
+    with pytest.raises(ValueError):
+        build_dictionary_sql("2023-01-01", "2023-01-01' OR '1'='1")
+
+
+def test_dictionary_groups_every_categorical_column():
+    sql = build_dictionary_sql("2023-01-01", "2023-01-31", end_inclusive=False)
+
+    assert "SELECT rate_code_des, pmt_type_des, travel_day" in sql
+    assert "GROUP BY GROUPING SETS ((rate_code_des), (pmt_type_des), (travel_day))" in sql
+    assert "lpep_dropoff_datetime < '2023-01-31'" in sql
+
+
+class Fake_Cursor:
+    """
+    Cursor returning the rows of the dictionary query: one non-null column per grouping set.
+    """
+
+    description = [("rate_code_des",), ("pmt_type_des",), ("travel_day",)]
+
+    def __init__(self):
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def fetchall(self):
+        return [("Standard rate", None, None), ("JFK", None, None), (None, "Credit card", None),
+                (None, "Cash", None), (None, None, "Monday"), (None, None, "Friday"),
+                # The NULL group of a column that has missing values
+                (None, None, None)]
+
+
+def test_dictionary_rows_become_sorted_vocabularies():
+    cursor = Fake_Cursor()
+    conn = type("Fake_Connection", (), {"cursor": lambda self: cursor})()
+
+    vocabularies = Data_Load_from_DB_Pushdown("2023-01-01", "2023-01-31")._load_vocabularies(conn)
+
+    assert vocabularies == {"rate_code_des": ["JFK", "Standard rate"], "pmt_type_des": ["Cash", "Credit card"],
+                            "travel_day": ["Friday", "Monday"]}
+    assert cursor.executed == [build_dictionary_sql("2023-01-01", "2023-01-31")]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+
+def write_dataframe_ipc(dataset: pd.DataFrame, path: str) -> int:
+    """
+    This function writes a dataset as an uncompressed Arrow IPC (Feather v2) file.
+    Uncompressed buffers are what allows the file to be read back memory-mapped.
+    Args:
+        dataset: The dataset to write.
+        path: Path of the file.
+    Returns:
+        Size of the file in bytes.
+    """
+    # pyarrow is imported when an artifact is written or read, not when the steps are imported
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(dataset)
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.tell()
+
+
+def read_dataframe_ipc(path: str) -> pd.DataFrame:
+    """
+    This function reads an Arrow IPC file through a memory map.
+    Numeric columns without nulls are backed by the mapped pages instead of being copied;
+    the map stays open as long as a column references it.
+    Args:
+        path: Path of the file.
+    Returns:
+        The dataset.
+    """
+    import pyarrow as pa
+
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+
+    return table.to_pandas(split_blocks=True)
+
+
+def take_rows(dataset: pd.DataFrame, index: np.ndarray) -> pd.DataFrame:
+    """
+    This function returns the rows of a dataset at the given positions, with a fresh RangeIndex.
+    """
+    return dataset.take(index).reset_index(drop=True)
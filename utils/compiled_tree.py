@@ -0,0 +1,387 @@
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Version of the file layout; files of another version are not read (version 1 files have no boosted trees)
+COMPILED_FORMAT_VERSION = 2
+READABLE_FORMAT_VERSIONS = (1, 2)
+NODES_FILENAME = "nodes.npy"
+BIN_EDGES_FILENAME = "bin_edges.npy"
+METADATA_FILENAME = "model.json"
+
+# One record per node: the split (feature, threshold, side of the missing values), the children and the value.
+# A leaf is its own left and right child with an infinite threshold, so rows that reached it stay there.
+NODE_DTYPE = np.dtype([
+    ("feature", np.int32),
+    ("missing_left", np.uint8),
+    ("left", np.int32),
+    ("right", np.int32),
+    ("threshold", np.float64),
+    ("value", np.float64),
+])
+# Value of the binned features for a missing value (see utils.model_train.Feature_Binner)
+MISSING_BIN = 255
+
+
+def _tree_nodes(tree, offset: int) -> np.ndarray:
+    """
+    This function returns the nodes of a fitted sklearn tree (tree_) as NODE_DTYPE records,
+    with the children shifted by offset (the position of the root in the flat nodes array).
+    """
+    n_nodes = tree.node_count
+    positions = np.arange(n_nodes, dtype=np.int32)
+    is_leaf = tree.children_left < 0
+
+    nodes = np.empty(n_nodes, dtype=NODE_DTYPE)
+    nodes["feature"] = np.where(is_leaf, 0, tree.feature)
+    nodes["threshold"] = np.where(is_leaf, np.inf, tree.threshold)
+    nodes["left"] = np.where(is_leaf, positions, tree.children_left) + offset
+    nodes["right"] = np.where(is_leaf, positions, tree.children_right) + offset
+    # Trees fitted without missing values have no missing_go_to_left; sklearn then sends NaN right
+    missing_left = getattr(tree, "missing_go_to_left", None)
+    nodes["missing_left"] = missing_left if missing_left is not None else 0
+    nodes["value"] = tree.value[:, 0, 0]
+
+    return nodes
+
+
+def _predictor_nodes(predictor, offset: int) -> np.ndarray:
+    """
+    This function returns the nodes of a tree of a fitted HistGradientBoostingRegressor (TreePredictor) as
+    NODE_DTYPE records, with the children shifted by offset.
+    """
+    source = predictor.nodes
+    if source["is_categorical"].any():
+        raise TypeError("Boosted trees with categorical splits cannot be compiled")
+    positions = np.arange(len(source), dtype=np.int32)
+    is_leaf = source["is_leaf"].astype(bool)
+
+    nodes = np.empty(len(source), dtype=NODE_DTYPE)
+    nodes["feature"] = np.where(is_leaf, 0, source["feature_idx"])
+    nodes["threshold"] = np.where(is_leaf, np.inf, source["num_threshold"])
+    nodes["left"] = np.where(is_leaf, positions, source["left"]) + offset
+    nodes["right"] = np.where(is_leaf, positions, source["right"]) + offset
+    nodes["missing_left"] = source["missing_go_to_left"]
+    nodes["value"] = source["value"]
+
+    return nodes
+
+
+class Compiled_Tree_Regressor:
+    """
+    Class for a fitted regression tree, forest or gradient boosting model compiled into flat NumPy arrays.
+
+    The nodes of all trees are laid out in one NODE_DTYPE array, each tree starting at its root
+    position. Batches are predicted level by level: every row of a block moves one level down at
+    each step, so a tree of depth d costs d vectorized gathers; a handful of rows (online requests)
+    are walked down the trees one by one instead. Trees fitted on binned features (Binned_Regressor)
+    keep their bin edges and bin the rows the same way. Only numpy is needed to load and predict:
+    the arrays are saved as .npy files next to a JSON sidecar and loaded memory-mapped.
+
+    The trees are summed in their order, like sklearn does without threads: a forest predicts the sum
+    divided by the number of trees, a boosted model its baseline plus the sum. Predictions are then
+    equal to sklearn's, except for a forest predicted by sklearn on several threads, which add the trees
+    in the order they finish: the two then differ by the rounding of the sum (about 1e-14 relative).
+    """
+
+    def __init__(self, nodes: np.ndarray, roots: np.ndarray, depths: np.ndarray, feature_names: List[str],
+                 bin_edges: Optional[np.ndarray] = None, bin_offsets: Optional[np.ndarray] = None,
+                 baseline: Optional[float] = None, float64_features: bool = False, source: str = ""):
+        """
+        Args:
+            nodes: NODE_DTYPE records of all trees.
+            roots: Position of the root of every tree in nodes.
+            depths: Depth of every tree.
+            feature_names: Features of the model, in the column order it was fitted with.
+            bin_edges: Bin edges of all features concatenated, for trees fitted on binned features. None otherwise.
+            bin_offsets: Start of the bin edges of every feature in bin_edges (n_features + 1 values).
+            baseline: Initial prediction of a boosted model, to which the trees are added. None for a
+                tree or forest, whose trees are averaged.
+            float64_features: Compare the features in float64 (HistGradientBoostingRegressor) instead of float32.
+            source: Class of the compiled model, for the logs.
+        """
+        self.nodes = nodes
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.depths = np.asarray(depths, dtype=np.int64)
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(feature_names)
+        self.bin_edges = bin_edges
+        self.bin_offsets = bin_offsets
+        self.baseline = baseline
+        self.float64_features = float64_features
+        self.source = source
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _aggregate(self, total: np.ndarray) -> np.ndarray:
+        # Boosted trees start from the baseline (see _start), forests average their trees
+        if self.baseline is not None or self.n_trees == 1:
+            return total
+        return total / self.n_trees
+
+    def _start(self) -> float:
+        return self.baseline if self.baseline is not None else 0.0
+
+    @classmethod
+    def compile(cls, model) -> "Compiled_Tree_Regressor":
+        """
+        This function returns the compiled form of a fitted DecisionTreeRegressor or RandomForestRegressor,
+        bare or wrapped in a Binned_Regressor, or of a HistGradientBoostingRegressor with an identity link
+        (squared_error, absolute_error or quantile loss) and no categorical features.
+        """
+        from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+        from sklearn.tree import DecisionTreeRegressor
+
+        from utils.model_train import Binned_Regressor
+
+        estimator, bin_edges, bin_offsets = model, None, None
+        if isinstance(model, Binned_Regressor):
+            estimator = model.estimator
+            edges = model.binner.bin_edges_
+            bin_offsets = np.r_[0, np.cumsum([len(feature_edges) for feature_edges in edges])].astype(np.int64)
+            bin_edges = np.concatenate(edges).astype(np.float64) if len(edges) else np.empty(0)
+
+        if isinstance(estimator, HistGradientBoostingRegressor):
+            return cls._compile_boosting(estimator)
+        if isinstance(estimator, DecisionTreeRegressor):
+            trees = [estimator]
+        elif isinstance(estimator, RandomForestRegressor):
+            trees = list(estimator.estimators_)
+        else:
+            raise TypeError(f"Cannot compile a {type(estimator).__name__}: only DecisionTreeRegressor, "
+                            f"RandomForestRegressor and HistGradientBoostingRegressor are supported")
+        if any(tree.n_outputs_ != 1 for tree in trees):
+            raise TypeError("Only single-output trees can be compiled")
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        if feature_names is None:
+            feature_names = [f"x{position}" for position in range(trees[0].n_features_in_)]
+
+        node_arrays, roots, offset = [], [], 0
+        for tree in trees:
+            node_arrays.append(_tree_nodes(tree.tree_, offset))
+            roots.append(offset)
+            offset += tree.tree_.node_count
+
+        return cls(np.concatenate(node_arrays), np.array(roots), [tree.tree_.max_depth for tree in trees],
+                   list(feature_names), bin_edges=bin_edges, bin_offsets=bin_offsets, source=type(model).__name__)
+
+    @classmethod
+    def _compile_boosting(cls, model) -> "Compiled_Tree_Regressor":
+        """
+        This function returns the compiled form of a fitted HistGradientBoostingRegressor: its baseline and trees.
+        """
+        if model.loss not in ("squared_error", "absolute_error", "quantile"):
+            raise TypeError(f"Cannot compile a HistGradientBoostingRegressor with the {model.loss} loss: "
+                            f"its predictions go through a link function")
+        if model.is_categorical_ is not None and model.is_categorical_.any():
+            raise TypeError("Cannot compile a HistGradientBoostingRegressor with categorical features")
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        if feature_names is None:
+            feature_names = [f"x{position}" for position in range(model.n_features_in_)]
+
+        # One tree per iteration for a regression
+        predictors = [iteration[0] for iteration in model._predictors]
+        node_arrays, roots, depths, offset = [], [], [], 0
+        for predictor in predictors:
+            node_arrays.append(_predictor_nodes(predictor, offset))
+            roots.append(offset)
+            depths.append(int(predictor.nodes["depth"].max()))
+            offset += len(predictor.nodes)
+
+        nodes = np.concatenate(node_arrays) if node_arrays else np.empty(0, dtype=NODE_DTYPE)
+        return cls(nodes, np.array(roots, dtype=np.int64), depths, list(feature_names),
+                   baseline=float(np.ravel(model._baseline_prediction)[0]), float64_features=True,
+                   source=type(model).__name__)
+
+    def _features(self, X) -> np.ndarray:
+        """
+        This function returns the features the trees split on, as a C-ordered float32 array
+        (sklearn casts the features to float32 before comparing them with the float64 thresholds), float64 for
+        a boosted model, which sklearn compares in float64.
+        """
+        # Binned features are binned from float64 values, like Feature_Binner does
+        dtype = np.float64 if self.bin_edges is not None or self.float64_features else np.float32
+        # DataFrames are recognised without importing pandas, which the serving process may not need
+        if hasattr(X, "columns"):
+            X = X[self.feature_names_in_].to_numpy(dtype=dtype)
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got an array of shape {X.shape}")
+
+        if self.bin_edges is None:
+            return np.ascontiguousarray(X, dtype=dtype)
+
+        # Same bins as Feature_Binner.transform, one column at a time
+        binned = np.empty(X.shape, dtype=np.float32)
+        for col in range(X.shape[1]):
+            values = np.asarray(X[:, col], dtype=np.float64)
+            edges = self.bin_edges[self.bin_offsets[col]:self.bin_offsets[col + 1]]
+            binned[:, col] = np.searchsorted(edges, values, side="right")
+            binned[np.isnan(values), col] = MISSING_BIN
+        return binned
+
+    def _arrays(self) -> tuple:
+        """
+        This function returns the node fields as contiguous arrays (feature, threshold, children, missing_left,
+        value), children holding the left and right child of node i at 2 * i and 2 * i + 1. They are built on
+        the first predict, so that loading only maps the file.
+        """
+        if getattr(self, "_node_arrays", None) is None:
+            children = np.empty(2 * len(self.nodes), dtype=np.intp)
+            children[0::2], children[1::2] = self.nodes["left"], self.nodes["right"]
+            self._node_arrays = (self.nodes["feature"].astype(np.intp), np.ascontiguousarray(self.nodes["threshold"]),
+                                 children, self.nodes["missing_left"].astype(bool),
+                                 np.ascontiguousarray(self.nodes["value"]))
+        return self._node_arrays
+
+    def _node_lists(self) -> tuple:
+        """
+        This function returns the node fields as Python lists, for the row by row traversal of small batches.
+        """
+        if getattr(self, "_node_lists_cache", None) is None:
+            self._node_lists_cache = tuple(self.nodes[field].tolist()
+                                           for field in ("feature", "threshold", "left", "right", "missing_left", "value"))
+        return self._node_lists_cache
+
+    def _predict_rows(self, X: np.ndarray) -> np.ndarray:
+        """
+        This function predicts a few rows one at a time: for a handful of rows, a Python loop over the
+        levels costs less than the numpy calls of a vectorized level.
+        """
+        feature, threshold, left, right, missing_left, value = self._node_lists()
+        roots = self.roots.tolist()
+
+        predictions = []
+        for row in X.tolist():
+            total = self._start()
+            for node in roots:
+                while left[node] != node:
+                    x = row[feature[node]]
+                    if x <= threshold[node]:
+                        node = left[node]
+                    elif x != x:
+                        node = left[node] if missing_left[node] else right[node]
+                    else:
+                        node = right[node]
+                total += value[node]
+            predictions.append(total)
+
+        return self._aggregate(np.array(predictions, dtype=np.float64))
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        """
+        This function predicts a block of rows level by level: at every level, each row reads the feature of its
+        node, compares it with the threshold and moves to a child. Leaves are their own children, so all rows
+        take depth steps without masking.
+        """
+        feature, threshold, children, missing_left, value = self._arrays()
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_starts = np.arange(n_rows, dtype=np.intp) * n_features
+        # Nodes sending the missing values left only matter when the block has missing values
+        has_missing = missing_left.any() and np.isnan(flat).any()
+
+        total = np.full(n_rows, self._start(), dtype=np.float64)
+        for root, depth in zip(self.roots, self.depths):
+            node = np.full(n_rows, root, dtype=np.intp)
+            for _ in range(depth):
+                values = flat[feature[node] + row_starts]
+                # Negated, so that NaN (never <= threshold) goes right like in sklearn
+                go_right = ~(values <= threshold[node])
+                if has_missing:
+                    missing = np.isnan(values)
+                    go_right[missing] = ~missing_left[node[missing]]
+                node = children[2 * node + go_right]
+            total += value[node]
+
+        return self._aggregate(total)
+
+    def predict(self, X, block_size: int = 65536, max_rows_loop: int = 16) -> np.ndarray:
+        """
+        This function returns the predictions of X (DataFrame with the model features, or array in their order).
+        Args:
+            X: The features.
+            block_size: Rows traversed together, so that the node positions of a block stay in cache.
+            max_rows_loop: Up to this number of rows, rows are traversed one by one (see _predict_rows).
+        """
+        X = self._features(X)
+        if len(X) <= max_rows_loop:
+            return self._predict_rows(X)
+        if len(X) <= block_size:
+            return self._predict_block(X)
+        return np.concatenate([self._predict_block(X[start:start + block_size])
+                               for start in range(0, len(X), block_size)])
+
+    def save(self, path: str) -> int:
+        """
+        This function writes the arrays (.npy) and the JSON sidecar to the directory path.
+        Returns:
+            Size of the files in bytes.
+        """
+        os.makedirs(path, exist_ok=True)
+        metadata = {
+            "version": COMPILED_FORMAT_VERSION,
+            "feature_names": [str(name) for name in self.feature_names_in_],
+            "roots": self.roots.tolist(),
+            "depths": self.depths.tolist(),
+            "bin_offsets": self.bin_offsets.tolist() if self.bin_offsets is not None else None,
+            "baseline": self.baseline,
+            "float64_features": self.float64_features,
+            "source": self.source,
+        }
+        np.save(os.path.join(path, NODES_FILENAME), np.ascontiguousarray(self.nodes))
+        files = [NODES_FILENAME, METADATA_FILENAME]
+        if self.bin_edges is not None:
+            np.save(os.path.join(path, BIN_EDGES_FILENAME), self.bin_edges)
+            files.append(BIN_EDGES_FILENAME)
+        with open(os.path.join(path, METADATA_FILENAME), "w") as metadata_file:
+            json.dump(metadata, metadata_file)
+
+        return sum(os.path.getsize(os.path.join(path, file)) for file in files)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "Compiled_Tree_Regressor":
+        """
+        This function reads a compiled model written by save. With mmap, the arrays are memory-mapped
+        instead of read, so loading costs the same whatever the number of nodes.
+        """
+        with open(os.path.join(path, METADATA_FILENAME)) as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata["version"] not in READABLE_FORMAT_VERSIONS:
+            raise ValueError(f"Compiled model format {metadata['version']} is not supported "
+                             f"(expected one of {READABLE_FORMAT_VERSIONS})")
+
+        mmap_mode = "r" if mmap else None
+        nodes = np.load(os.path.join(path, NODES_FILENAME), mmap_mode=mmap_mode)
+        bin_edges = bin_offsets = None
+        if metadata["bin_offsets"] is not None:
+            bin_edges = np.load(os.path.join(path, BIN_EDGES_FILENAME), mmap_mode=mmap_mode)
+            bin_offsets = np.asarray(metadata["bin_offsets"], dtype=np.int64)
+
+        return cls(nodes, metadata["roots"], metadata["depths"], metadata["feature_names"],
+                   bin_edges=bin_edges, bin_offsets=bin_offsets, baseline=metadata.get("baseline"),
+                   float64_features=metadata.get("float64_features", False), source=metadata["source"])
+
+
+def check_parity(model, compiled: Compiled_Tree_Regressor, X) -> float:
+    """
+    This function returns the largest absolute difference between the predictions of a model and of its
+    compiled form on X. It is 0.0 when sklearn sums the trees in their order; a forest predicted by sklearn
+    on several threads (n_jobs) sums them in the order the threads finish, and the two then differ by the
+    rounding of the sum, e.g. up to 7e-15 for fares of a forest of 100 trees.
+    """
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        expected = model.predict(X)
+    return float(np.max(np.abs(expected - compiled.predict(X)), initial=0.0))
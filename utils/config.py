@@ -1,7 +1,14 @@
+from typing import Optional
 from zenml.steps import BaseParameters
 
 class ML_Model_Name_Config(BaseParameters):
     """
     class defines ML model name
     """
-    ml_model: str = "DecisionTreeRegressor"
\ No newline at end of file
+    ml_model: str = "DecisionTreeRegressor"
+    # Keyword arguments of the ml_model_train method of the model (e.g. max_depth)
+    model_params: dict = {}
+    # Keyword arguments of the ml_model_update method of the model, in incremental training (e.g. n_estimators)
+    update_params: dict = {}
+    # Threads/cores used by training, for the models that train in parallel (None for their default)
+    n_threads: Optional[int] = None
\ No newline at end of file
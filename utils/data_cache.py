@@ -0,0 +1,159 @@
+import contextlib
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from zenml.logger import get_logger
+
+from utils.file_lock import file_lock, write_json_atomic
+
+logger = get_logger(__name__)
+
+
+class Parquet_Dataset_Cache:
+    """
+    Class for a local cache of extracted date partitions stored as Parquet files.
+
+    The files are laid out as <cache_dir>/<query hash>/date=<partition>.parquet and tracked in
+    <cache_dir>/manifest.json with their row count, latest dropoff time, checksum and last access time.
+    Loads sharing the cache (e.g. concurrent pipeline runs) work on it within locked(), which reloads the
+    manifest under a file lock and saves it before releasing the lock, so that no entry is lost and no
+    partition is evicted while another load reads it.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: float = 2048):
+        """
+        Args:
+            cache_dir: Cache directory. Defaults to the DATA_CACHE_DIR environment variable or .data_cache.
+            max_size_mb: Size of the Parquet files above which the least recently used partitions are evicted.
+        """
+        self.cache_dir = Path(cache_dir or os.getenv("DATA_CACHE_DIR", ".data_cache"))
+        self.max_size_mb = max_size_mb
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.manifest = self._load_manifest()
+
+    @staticmethod
+    def query_key(sql: str) -> str:
+        """
+        This function returns the cache key of a query, ignoring whitespace differences.
+        """
+        return hashlib.sha256(" ".join(sql.split()).encode("utf-8")).hexdigest()[:16]
+
+    @contextlib.contextmanager
+    def locked(self):
+        with file_lock(self.manifest_path):
+            self.manifest = self._load_manifest()
+            yield self
+            self._save_manifest()
+
+    def _load_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            with open(self.manifest_path) as manifest_file:
+                return json.load(manifest_file)
+        return {"queries": {}}
+
+    def _save_manifest(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Written then renamed, so that an interrupted run never leaves a truncated manifest
+        write_json_atomic(self.manifest_path, self.manifest, indent=2)
+
+    def _entries(self, key: str) -> dict:
+        return self.manifest["queries"].setdefault(key, {"watermark": None, "partitions": {}})["partitions"]
+
+    def entry(self, key: str, partition: str) -> Optional[dict]:
+        """
+        This function returns the manifest entry of a cached partition, or None when it is not cached.
+        """
+        entry = self._entries(key).get(partition)
+        if entry is None:
+            return None
+        if entry["file"] is not None and not (self.cache_dir / entry["file"]).exists():
+            return None
+        return entry
+
+    def watermark(self, key: str) -> Optional[str]:
+        """
+        This function returns the latest dropoff time (ISO format) cached for a query.
+        """
+        return self.manifest["queries"].get(key, {}).get("watermark")
+
+    def read(self, key: str, partition: str) -> Optional[pd.DataFrame]:
+        """
+        This function returns a cached partition, or None when the partition has no rows.
+        """
+        entry = self._entries(key)[partition]
+        entry["last_access"] = time.time()
+
+        if entry["file"] is None:
+            return None
+        return pd.read_parquet(self.cache_dir / entry["file"])
+
+    def write(self, key: str, partition: str, dataset: pd.DataFrame, row_count: int, max_dropoff: Optional[str],
+              checksum: Optional[int] = None) -> None:
+        """
+        This function stores a partition and records its row count, latest dropoff time and checksum.
+        Args:
+            key: Query key.
+            partition: Partition date (ISO format).
+            dataset: The partition rows.
+            row_count: Row count reported by the database for the partition.
+            max_dropoff: Latest dropoff time of the partition (ISO format), None for an empty partition.
+            checksum: Sum of the row hashes of the partition reported by the database.
+        """
+        file = None
+        size = 0
+
+        if len(dataset):
+            file = f"{key}/date={partition}.parquet"
+            path = self.cache_dir / file
+            path.parent.mkdir(parents=True, exist_ok=True)
+            dataset.to_parquet(path, index=False)
+            size = path.stat().st_size
+
+        self._entries(key)[partition] = {
+            "file": file,
+            "bytes": size,
+            "rows": row_count,
+            "max_dropoff": max_dropoff,
+            "checksum": checksum,
+            "last_access": time.time(),
+        }
+
+        query = self.manifest["queries"][key]
+        if max_dropoff is not None and (query["watermark"] is None or max_dropoff > query["watermark"]):
+            query["watermark"] = max_dropoff
+
+    def evict(self, keep: tuple = ()) -> None:
+        """
+        This function removes the least recently used partitions until the cache fits in max_size_mb.
+        Args:
+            keep: (key, partition) pairs evicted only after every other partition.
+        """
+        entries = [
+            (key, partition, entry)
+            for key, query in self.manifest["queries"].items()
+            for partition, entry in query["partitions"].items()
+        ]
+        total_bytes = sum(entry["bytes"] for _, _, entry in entries)
+        max_bytes = self.max_size_mb * 1024 * 1024
+
+        entries.sort(key=lambda item: ((item[0], item[1]) in keep, item[2]["last_access"]))
+
+        for key, partition, entry in entries:
+            if total_bytes <= max_bytes:
+                break
+            if entry["file"] is not None:
+                (self.cache_dir / entry["file"]).unlink(missing_ok=True)
+            total_bytes -= entry["bytes"]
+            del self.manifest["queries"][key]["partitions"][partition]
+            logger.info(f"Evicted cached partition {partition} of query {key}")
+
+    def save(self) -> None:
+        """
+        This function persists the manifest.
+        """
+        self._save_manifest()
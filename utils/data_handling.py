@@ -1,15 +1,25 @@
 from abc import ABC, abstractmethod
 from pandas.core.api import DataFrame as DataFrame
 import numpy as np
-import psycopg2
-from utils.sql import load_dataset_sql
+from utils.sql import (build_dictionary_sql, build_load_dataset_sql, build_load_dataset_template,
+                       build_partition_stats_sql, build_pushdown_sql, partition_date_range)
+from utils.data_cache import Parquet_Dataset_Cache
+from utils.schema import CATEGORICAL_COLS, DROPOFF_COL, DUMMY_DTYPE, compact_frame, concat_frames
+from utils.profiling import peak_rss_mb
+import io
 import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from zenml.logger import get_logger
 from typing_extensions import Annotated
-from typing import Tuple
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
+
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+    from utils.data_profile import Data_Profile
 
 logger = get_logger(__name__)
 
@@ -27,27 +37,82 @@ class Data_Load_from_DB(Data_Handling_Template):
     Class for loading dataset from Postgres database
     """
 
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31", with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.with_dropoff = with_dropoff
+        self.sql = build_load_dataset_sql(start_date, end_date, with_dropoff=with_dropoff)
+
+    @staticmethod
+    def _connection_params() -> dict:
+        """
+        This function returns the connection parameters configured in the .env file.
+        """
+        load_dotenv()
+
+        return dict(database=os.getenv('DB_NAME'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASS'),
+                    host=os.getenv('DB_HOST'),
+                    port=os.getenv('DB_PORT'))
+
+    @classmethod
+    def _connect(cls):
+        """
+        This function returns a new connection to the database configured in the .env file.
+        """
+        # Imported on first connection, so that importing the steps does not load the driver
+        import psycopg2
+
+        conn = psycopg2.connect(**cls._connection_params())
+
+        print("Database connected successfully")
+
+        return conn
+
+    def _log_load_stats(self, loaded_data: pd.DataFrame, started: float) -> None:
+        """
+        This function logs and keeps the throughput and memory figures of a load.
+        Args:
+            loaded_data: The dataset loaded from database.
+            started: Start time of the load (time.perf_counter).
+        """
+        elapsed = time.perf_counter() - started
+        rows = len(loaded_data)
+
+        self.load_stats = {
+            "rows": rows,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else float("inf"),
+            "frame_mb": loaded_data.memory_usage(deep=True).sum() / (1024 * 1024),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+        logger.info(
+            f"Loaded {rows} rows in {elapsed:.2f}s ({self.load_stats['rows_per_sec']:.0f} rows/sec), "
+            f"frame size: {self.load_stats['frame_mb']:.1f} MB, peak RSS: {self.load_stats['peak_rss_mb']:.1f} MB"
+        )
+
     def data_handling(self) -> pd.DataFrame:
         """
         This function returns the dataset loaded from database.
         """
         logger.info("Load data from database")
 
-        load_dotenv()
-
         conn = None
+        started = time.perf_counter()
 
         try:
             # Set up connect to database
-            conn = psycopg2.connect(database=os.getenv('DB_NAME'),
-                                    user=os.getenv('DB_USER'),
-                                    password=os.getenv('DB_PASS'),
-                                    host=os.getenv('DB_HOST'),
-                                    port=os.getenv('DB_PORT'))
-            
-            print("Database connected successfully")
+            conn = self._connect()
                 
-            loaded_data = pd.read_sql(load_dataset_sql, conn)
+            loaded_data = compact_frame(pd.read_sql(self.sql, conn))
 
         except Exception as error:
             raise error
@@ -57,42 +122,768 @@ class Data_Load_from_DB(Data_Handling_Template):
             if conn is not None:
                 conn.close()
 
+        self._log_load_stats(loaded_data, started)
+
+        return loaded_data
+
+class Data_Load_from_DB_Stream(Data_Load_from_DB):
+    """
+    Class for loading dataset from Postgres database in chunks through a server-side cursor.
+    Only one chunk of raw rows is held in client memory at a time.
+    """
+
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                 fetch_size: int = 50000, cursor_name: str = "greentaxi_stream", with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            fetch_size: Number of rows fetched from the server per round-trip (and per chunk).
+            cursor_name: Name of the server-side cursor.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        super().__init__(start_date, end_date, with_dropoff=with_dropoff)
+        self.fetch_size = fetch_size
+        self.cursor_name = cursor_name
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        This function yields the dataset from database as compacted chunks of at most fetch_size rows.
+        """
+        logger.info(f"Stream data from database (fetch size: {self.fetch_size})")
+
+        conn = None
+
+        try:
+            conn = self._connect()
+
+            # A named cursor keeps the result set on the server until rows are fetched
+            with conn.cursor(name=self.cursor_name) as cursor:
+                cursor.itersize = self.fetch_size
+                cursor.execute(self.sql)
+
+                while True:
+                    rows = cursor.fetchmany(self.fetch_size)
+                    if not rows:
+                        break
+
+                    columns = [desc[0] for desc in cursor.description]
+                    yield compact_frame(pd.DataFrame.from_records(rows, columns=columns))
+
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def data_handling(self, profile: Optional["Data_Profile"] = None) -> pd.DataFrame:
+        """
+        This function returns the dataset loaded from database, assembled from the streamed chunks.
+        Args:
+            profile: Data_Profile updated with every chunk as it arrives, so the dataset is profiled without another pass.
+        """
+        started = time.perf_counter()
+
+        chunks = []
+        for chunk in self.iter_chunks():
+            if profile is not None:
+                profile.update(chunk)
+            chunks.append(chunk)
+        if chunks:
+            loaded_data = concat_frames(chunks)
+        else:
+            loaded_data = pd.DataFrame()
+        del chunks
+
+        self._log_load_stats(loaded_data, started)
+
         return loaded_data
     
+class Data_Load_from_DB_Copy(Data_Load_from_DB):
+    """
+    Class for loading dataset from Postgres database through COPY ... TO STDOUT.
+    The CSV stream is parsed column-wise (pyarrow when installed, else the pandas C parser),
+    so no per-row Python tuples are built.
+    """
+
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31", spool_size_mb: int = 256,
+                 with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            spool_size_mb: Size of the COPY stream kept in memory before it is spilled to a temporary file.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        super().__init__(start_date, end_date, with_dropoff=with_dropoff)
+        self.spool_size_mb = spool_size_mb
+
+    @staticmethod
+    def parse_copy_stream(stream: io.IOBase, categorical_cols: list = CATEGORICAL_COLS, compact: bool = True) -> pd.DataFrame:
+        """
+        This function parses a COPY stream in CSV format (with header) into a dataset.
+        Args:
+            stream: File-like object positioned at the start of the COPY stream.
+            categorical_cols: Text columns to dictionary-encode while parsing.
+            compact: Apply compact_frame to the parsed dataset.
+        Returns:
+            The parsed dataset.
+        """
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pa_csv
+        except ImportError:
+            parsed = pd.read_csv(stream, engine="c")
+            return compact_frame(parsed) if compact else parsed
+
+        # Descriptor columns are dictionary-encoded while parsing and arrive as pandas categoricals
+        convert_options = pa_csv.ConvertOptions(
+            column_types={col: pa.dictionary(pa.int32(), pa.string()) for col in categorical_cols},
+            strings_can_be_null=True,
+        )
+        table = pa_csv.read_csv(stream, convert_options=convert_options)
+        parsed = table.to_pandas(split_blocks=True, self_destruct=True)
+
+        return compact_frame(parsed) if compact else parsed
+
+    def _copy(self, conn, sql: str, categorical_cols: list = CATEGORICAL_COLS, compact: bool = True) -> pd.DataFrame:
+        """
+        This function returns the result of a query extracted with COPY ... TO STDOUT.
+        """
+        copy_sql = f"COPY ({sql.strip()}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_size_mb * 1024 * 1024) as buffer:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(copy_sql, buffer)
+            buffer.seek(0)
+            return self.parse_copy_stream(buffer, categorical_cols, compact)
+
+    def data_handling(self) -> pd.DataFrame:
+        """
+        This function returns the dataset loaded from database through COPY.
+        """
+        logger.info("Load data from database through COPY")
+
+        conn = None
+        started = time.perf_counter()
+
+        try:
+            conn = self._connect()
+            loaded_data = self._copy(conn, self.sql)
+
+        except Exception as error:
+            raise error
+
+        finally:
+            if conn is not None:
+                conn.close()
+
+        self._log_load_stats(loaded_data, started)
+
+        return loaded_data
+
+class Data_Load_from_DB_Pushdown(Data_Load_from_DB_Copy):
+    """
+    Class for loading dataset with the categorical encoding pushed down into the database.
+    The descriptor columns are returned as smallint codes into a dictionary of their values,
+    and the pandas categoricals are built directly from the codes.
+    """
+
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                 vocabularies: dict = None, spool_size_mb: int = 256, with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            vocabularies: Categories per categorical column (e.g. Category_Encoder.vocabularies).
+                Read from the database with one GROUPING SETS query when None.
+            spool_size_mb: Size of the COPY stream kept in memory before it is spilled to a temporary file.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        super().__init__(start_date, end_date, spool_size_mb=spool_size_mb, with_dropoff=with_dropoff)
+        self.vocabularies = vocabularies
+
+    def _load_vocabularies(self, conn) -> dict:
+        """
+        This function returns the sorted distinct values of every categorical column in the date window.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute(build_dictionary_sql(self.start_date, self.end_date))
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+
+        return {
+            col: sorted({row[position] for row in rows if row[position] is not None})
+            for position, col in enumerate(columns)
+        }
+
+    def data_handling(self) -> pd.DataFrame:
+        """
+        This function returns the dataset loaded from database with the categorical codes decoded into categoricals.
+        """
+        logger.info("Load data from database with categorical pushdown")
+
+        conn = None
+        started = time.perf_counter()
+
+        try:
+            conn = self._connect()
+
+            vocabularies = self.vocabularies or self._load_vocabularies(conn)
+            loaded_data = self._copy(conn, build_pushdown_sql(vocabularies, self.start_date, self.end_date,
+                                                              with_dropoff=self.with_dropoff),
+                                     categorical_cols=[], compact=False)
+
+        except Exception as error:
+            raise error
+
+        finally:
+            if conn is not None:
+                conn.close()
+
+        for col, categories in vocabularies.items():
+            # NULL codes (values outside the dictionary) become missing categories
+            codes = loaded_data[col].fillna(-1).to_numpy().astype(np.int16)
+            loaded_data[col] = pd.Categorical.from_codes(codes, categories=categories)
+
+        loaded_data = compact_frame(loaded_data)
+
+        self._log_load_stats(loaded_data, started)
+
+        return loaded_data
+
+class Data_Load_from_DB_Partitioned(Data_Load_from_DB):
+    """
+    Class for loading dataset from Postgres database as date partitions fetched concurrently.
+    Each partition is one query on a connection from a bounded pool; the partitions are
+    concatenated in date order.
+    """
+
+
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                 partition_freq: str = "day", max_workers: int = 4,
+                 max_retries: int = 3, retry_backoff: float = 1.0, with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            partition_freq: Partition length, either "day" or "week".
+            max_workers: Number of partitions fetched at the same time (and size of the connection pool).
+            max_retries: Number of attempts per partition.
+            retry_backoff: Seconds to wait before the first retry, doubled after every failed attempt.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        super().__init__(start_date, end_date, with_dropoff=with_dropoff)
+        self.partition_freq = partition_freq
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.partition_stats = []
+
+    @staticmethod
+    def _transient_errors() -> tuple:
+        """
+        This function returns the errors after which a partition is fetched again on a fresh connection.
+        """
+        import psycopg2
+
+        return (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+    def _fetch_partition(self, pool: "ThreadedConnectionPool", partition: tuple) -> pd.DataFrame:
+        """
+        This function returns one compacted partition, retrying transient failures.
+        Args:
+            pool: Connection pool shared by the workers.
+            partition: (partition start, partition end, end inclusive).
+        """
+        start, end, end_inclusive = partition
+        sql = build_load_dataset_sql(start, end, end_inclusive=end_inclusive, with_dropoff=self.with_dropoff)
+
+        for attempt in range(1, self.max_retries + 1):
+            conn = None
+            broken = False
+            started = time.perf_counter()
+
+            try:
+                conn = pool.getconn()
+                partition_data = compact_frame(pd.read_sql(sql, conn))
+                conn.rollback()
+
+                elapsed = time.perf_counter() - started
+                self.partition_stats.append({
+                    "partition": start.isoformat(),
+                    "rows": len(partition_data),
+                    "seconds": elapsed,
+                    "attempts": attempt,
+                })
+                logger.info(f"Partition {start} loaded: {len(partition_data)} rows in {elapsed:.2f}s (attempt {attempt})")
+
+                return partition_data
+
+            except self._transient_errors() as error:
+                broken = True
+                if attempt == self.max_retries:
+                    logger.error(f"Partition {start} failed after {attempt} attempts: {error}")
+                    raise error
+
+                wait = self.retry_backoff * 2 ** (attempt - 1)
+                logger.warning(f"Transient error on partition {start} (attempt {attempt}), retrying in {wait}s: {error}")
+                time.sleep(wait)
+
+            finally:
+                if conn is not None:
+                    pool.putconn(conn, close=broken)
+
+    def _fetch_partitions(self, partitions: list) -> list:
+        """
+        This function returns the given partitions, fetched concurrently, in the order given.
+        """
+        self.partition_stats = []
+
+        from psycopg2.pool import ThreadedConnectionPool
+
+        pool = ThreadedConnectionPool(1, self.max_workers, **self._connection_params())
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # map keeps the partitions in date order whatever order they finish in
+                frames = list(executor.map(lambda partition: self._fetch_partition(pool, partition), partitions))
+        finally:
+            pool.closeall()
+
+        self.partition_stats.sort(key=lambda stats: stats["partition"])
+
+        return frames
+
+    def data_handling(self) -> pd.DataFrame:
+        """
+        This function returns the dataset loaded from database partition by partition.
+        """
+        partitions = partition_date_range(self.start_date, self.end_date, self.partition_freq)
+        logger.info(f"Load data from database in {len(partitions)} partitions with {self.max_workers} workers")
+
+        started = time.perf_counter()
+
+        frames = self._fetch_partitions(partitions)
+
+        non_empty = [frame for frame in frames if len(frame)]
+        loaded_data = concat_frames(non_empty) if non_empty else frames[0]
+        del frames, non_empty
+
+        self._log_load_stats(loaded_data, started)
+
+        return loaded_data
+
+class Data_Load_from_DB_Cached(Data_Load_from_DB_Partitioned):
+    """
+    Class for loading dataset through a local Parquet cache of daily partitions.
+    Cached partitions before the day of the cached high-watermark (latest lpep_dropoff_datetime)
+    are read from disk; the other partitions (all of them with verify) are checked against their row
+    count, latest dropoff and checksum in the database and fetched again only when they are missing
+    or changed. The checksum covers every column of every row, so rows corrected in place are fetched again.
+    """
+
+    def __init__(self, start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                 max_workers: int = 4, max_retries: int = 3, retry_backoff: float = 1.0,
+                 cache_dir: str = None, max_cache_mb: float = 2048, verify: bool = False,
+                 with_dropoff: bool = False):
+        """
+        Args:
+            start_date: First dropoff day of the dataset (ISO format).
+            end_date: Last dropoff day of the dataset (ISO format), inclusive.
+            max_workers: Number of partitions fetched at the same time.
+            max_retries: Number of attempts per partition.
+            retry_backoff: Seconds to wait before the first retry, doubled after every failed attempt.
+            cache_dir: Cache directory (see Parquet_Dataset_Cache).
+            max_cache_mb: Cache size above which the least recently used partitions are evicted.
+            verify: Check every cached partition against the database, not only those from the watermark day on.
+            with_dropoff: Also load the lpep_dropoff_datetime column (needed by the time-ordered split).
+        """
+        super().__init__(start_date, end_date, partition_freq="day", max_workers=max_workers,
+                         max_retries=max_retries, retry_backoff=retry_backoff, with_dropoff=with_dropoff)
+        self.cache = Parquet_Dataset_Cache(cache_dir, max_size_mb=max_cache_mb)
+        self.verify = verify
+
+    def _database_partition_stats(self, partitions: list) -> dict:
+        """
+        This function returns {partition: (row count, latest dropoff, checksum)} from the database for the given partitions.
+        """
+        first_start = partitions[0][0]
+        last_start, last_end, last_inclusive = partitions[-1]
+
+        conn = None
+        try:
+            conn = self._connect()
+            with conn.cursor() as cursor:
+                cursor.execute(build_partition_stats_sql(first_start, last_end, end_inclusive=last_inclusive))
+                rows = cursor.fetchall()
+        finally:
+            if conn is not None:
+                conn.close()
+
+        stats = {}
+        for partition_date, row_count, max_dropoff, checksum in rows:
+            # Rows dropped off exactly at midnight of end_date belong to the last partition
+            partition = min(partition_date, last_start).isoformat()
+            previous_count, previous_max, previous_checksum = stats.get(partition, (0, None, 0))
+            max_dropoff = max_dropoff.isoformat()
+            # The sum of the row hashes is a numeric, kept as a Python int
+            stats[partition] = (previous_count + row_count,
+                                max_dropoff if previous_max is None else max(previous_max, max_dropoff),
+                                previous_checksum + int(checksum))
+
+        return stats
+
+    def data_handling(self) -> pd.DataFrame:
+        """
+        This function returns the dataset from the cache, fetching only new or changed partitions from database.
+        """
+        started = time.perf_counter()
+
+        # Held until the manifest is saved, so that no other load evicts the partitions read here
+        with self.cache.locked():
+            partitions = partition_date_range(self.start_date, self.end_date, "day")
+            key = self.cache.query_key(build_load_dataset_template(self.with_dropoff))
+            watermark = self.cache.watermark(key)
+
+            # Partitions that have to be checked against the database
+            candidates = [
+                partition for partition in partitions
+                if self.verify
+                or watermark is None
+                or partition[0].isoformat() >= watermark[:10]
+                or self.cache.entry(key, partition[0].isoformat()) is None
+            ]
+
+            stats = self._database_partition_stats(candidates) if candidates else {}
+
+            to_fetch = []
+            for partition in candidates:
+                name = partition[0].isoformat()
+                entry = self.cache.entry(key, name)
+                row_count, max_dropoff, checksum = stats.get(name, (0, None, 0))
+                # Entries written before the checksum existed have none and are fetched again
+                if (entry is None or entry["rows"] != row_count or entry["max_dropoff"] != max_dropoff
+                        or entry.get("checksum") != checksum):
+                    to_fetch.append(partition)
+
+            logger.info(f"Data cache {key}: {len(partitions) - len(to_fetch)} partitions cached, "
+                        f"{len(to_fetch)} fetched from database")
+
+            fetched = {}
+            if to_fetch:
+                for partition, partition_data in zip(to_fetch, self._fetch_partitions(to_fetch)):
+                    name = partition[0].isoformat()
+                    row_count, max_dropoff, checksum = stats.get(name, (0, None, 0))
+                    self.cache.write(key, name, partition_data, row_count, max_dropoff, checksum=checksum)
+                    fetched[name] = partition_data
+
+            frames = []
+            for partition in partitions:
+                name = partition[0].isoformat()
+                partition_data = fetched[name] if name in fetched else self.cache.read(key, name)
+                if partition_data is not None and len(partition_data):
+                    frames.append(partition_data)
+
+            self.cache.evict(keep=tuple((key, partition[0].isoformat()) for partition in partitions))
+
+        loaded_data = concat_frames(frames) if frames else pd.DataFrame()
+        del frames, fetched
+
+        self._log_load_stats(loaded_data, started)
+
+        return loaded_data
+
 class Data_Split(Data_Handling_Template):
     """
     Class that defines the split process for the loaded dataset.
+    Splits are returned as row positions, so the dataset itself is never copied by the split.
+
+    Split modes:
+        "random": rows shuffled at random (sklearn train_test_split).
+        "stratified": random, with the same distribution of target quantile bins in every split.
+        "time": the rows dropped off last form the test split (needs the lpep_dropoff_datetime column).
     """
 
+    split_modes = ("random", "stratified", "time")
+
+    @staticmethod
+    def _target_bins(dataset: pd.DataFrame, target: str, n_bins: int) -> np.ndarray:
+        """
+        This function returns the quantile bin of every row of the target column.
+        """
+        return pd.qcut(dataset[target], q=n_bins, labels=False, duplicates="drop").to_numpy()
+
+    @staticmethod
+    def _time_order(dataset: pd.DataFrame, time_col: str) -> np.ndarray:
+        """
+        This function returns the row positions sorted by time_col.
+        """
+        if time_col not in dataset.columns:
+            raise ValueError(f"Time-ordered split needs the {time_col} column (load the dataset with with_dropoff=True)")
+        return np.argsort(dataset[time_col].to_numpy(), kind="stable")
+
+    @staticmethod
+    def index_mask(index: np.ndarray, n_rows: int) -> np.ndarray:
+        """
+        This function returns the boolean mask of n_rows rows selecting the row positions in index.
+        """
+        mask = np.zeros(n_rows, dtype=bool)
+        mask[index] = True
+        return mask
+
+    def split_indices(self, dataset: pd.DataFrame, test_size: float = 0.2,
+                      random_state: float = 12, shuffle: bool = True,
+                      mode: str = "random", target: str = "fare_amount",
+                      n_bins: int = 10, time_col: str = DROPOFF_COL) -> Tuple[
+        Annotated[np.ndarray, "train_index"],
+        Annotated[np.ndarray, "test_index"]]:
+        """
+        This function returns the row positions of the training and test datasets.
+        Splitting positions instead of the dataset gives the same split as data_handling
+        without copying the rows.
+        Args:
+            dataset: The loaded dataset.
+            test_size: Fraction of the rows in the test split.
+            random_state: Seed of the random and stratified modes.
+            shuffle: Shuffle the rows before a random split.
+            mode: One of split_modes.
+            target: Target column binned by the stratified mode.
+            n_bins: Number of target quantile bins of the stratified mode.
+            time_col: Timestamp column ordering the rows in the time mode.
+        Returns:
+            The row positions of the training and test datasets. In the time mode they are in
+            ascending row order, and every test row is dropped off at or after every training row.
+        """
+        positions = np.arange(len(dataset))
+
+        if mode == "random":
+            stratify = None
+        elif mode == "stratified":
+            stratify = self._target_bins(dataset, target, n_bins)
+        elif mode == "time":
+            order = self._time_order(dataset, time_col)
+            n_test = int(np.ceil(len(dataset) * test_size))
+            return np.sort(order[:len(order) - n_test]), np.sort(order[len(order) - n_test:])
+        else:
+            raise ValueError(f"Unknown split mode: {mode}")
+
+        from sklearn.model_selection import train_test_split
+
+        train_index, test_index = train_test_split(
+                                                positions,
+                                                test_size=test_size,
+                                                random_state=random_state,
+                                                shuffle=shuffle or stratify is not None,
+                                                stratify=stratify,
+                                                )
+
+        return train_index, test_index
+
+    def kfold_indices(self, dataset: pd.DataFrame, n_splits: int = 5, random_state: float = 12,
+                      mode: str = "random", target: str = "fare_amount",
+                      n_bins: int = 10, time_col: str = DROPOFF_COL) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        This function yields the (training, validation) row positions of every cross-validation fold.
+        In the time mode the folds are expanding windows: every fold trains on all rows dropped off
+        before its validation rows (sklearn TimeSeriesSplit over the rows sorted by time_col).
+        Args:
+            dataset: The dataset to cross-validate on.
+            n_splits: Number of folds.
+            random_state: Seed of the random and stratified modes.
+            mode: One of split_modes.
+            target: Target column binned by the stratified mode.
+            n_bins: Number of target quantile bins of the stratified mode.
+            time_col: Timestamp column ordering the rows in the time mode.
+        """
+        from sklearn.model_selection import KFold, StratifiedKFold, TimeSeriesSplit
+
+        # The splitters only need the number of rows; a placeholder avoids materializing the features
+        placeholder = np.empty((len(dataset), 0))
+
+        if mode == "random":
+            folds = KFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(placeholder)
+        elif mode == "stratified":
+            folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state).split(
+                placeholder, self._target_bins(dataset, target, n_bins))
+        elif mode == "time":
+            order = self._time_order(dataset, time_col)
+            folds = ((np.sort(order[train]), np.sort(order[validation]))
+                     for train, validation in TimeSeriesSplit(n_splits=n_splits).split(placeholder))
+        else:
+            raise ValueError(f"Unknown split mode: {mode}")
+
+        yield from folds
+
     def data_handling(self, dataset: pd.DataFrame, test_size: float = 0.2, 
-                      random_state: float = 12, shuffle: bool = True) -> Tuple[
+                      random_state: float = 12, shuffle: bool = True, mode: str = "random") -> Tuple[
         Annotated[pd.DataFrame, "dataset_train"],
         Annotated[pd.DataFrame, "dataset_test"]]:
         
-        dataset_train, dataset_test = train_test_split(
-                                                dataset,
-                                                test_size=test_size,
-                                                random_state=random_state,
-                                                shuffle=shuffle,
-                                                )
+        train_index, test_index = self.split_indices(dataset, test_size=test_size,
+                                                     random_state=random_state, shuffle=shuffle, mode=mode)
 
-        dataset_train = pd.DataFrame(dataset_train, columns=dataset.columns)
-        dataset_test = pd.DataFrame(dataset_test, columns=dataset.columns)
+        dataset_train = dataset.iloc[train_index]
+        dataset_test = dataset.iloc[test_index]
 
         return dataset_train, dataset_test
 
+class Category_Encoder:
+    """
+    Class that defines a one-hot encoder fitted once on the training dataset.
+    The category vocabularies learned by fit are reused by every transform, so the training,
+    test and inference datasets always get the same indicator columns.
+    """
+
+    def __init__(self, cols: list = CATEGORICAL_COLS, vocabularies: dict = None):
+        """
+        Args:
+            cols: Categorical columns to encode.
+            vocabularies: Categories per column, in indicator column order. Set by fit.
+        """
+        self.cols = list(cols)
+        self.vocabularies = vocabularies or {}
+
+    def fit(self, dataset: pd.DataFrame) -> "Category_Encoder":
+        """
+        This function learns the sorted categories of every encoded column.
+        """
+        for col in self.cols:
+            values = dataset[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Only the categories present in the rows, as get_dummies would produce
+                codes = values.cat.codes.to_numpy()
+                present = np.bincount(codes[codes >= 0], minlength=len(values.cat.categories)) > 0
+                categories = values.cat.categories[present]
+            else:
+                categories = [category for category in pd.unique(values) if not pd.isna(category)]
+            self.vocabularies[col] = sorted(categories)
+
+        return self
+
+    @property
+    def feature_names(self) -> list:
+        """
+        Names of the indicator columns, in the get_dummies naming ("<column>_<category>").
+        """
+        return [f"{col}_{category}" for col in self.cols for category in self.vocabularies[col]]
+
+    def codes(self, dataset: pd.DataFrame, col: str) -> np.ndarray:
+        """
+        This function returns the position of every value of a column in its vocabulary (-1 when unknown or null).
+        The values are factorized once and only the distinct values are looked up in the vocabulary.
+        """
+        values = dataset[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            value_codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            value_codes, uniques = pd.factorize(values)
+
+        # The extra -1 at the end maps the null code (-1) to unknown
+        lookup = np.append(pd.Index(self.vocabularies[col]).get_indexer(uniques), -1).astype(np.int16)
+
+        return lookup[value_codes]
+
+    def transform(self, dataset: pd.DataFrame, sparse: bool = False) -> pd.DataFrame:
+        """
+        This function replaces the encoded columns with uint8 indicator columns.
+        Args:
+            dataset: Dataset with the encoded columns.
+            sparse: Return the indicator columns as pandas sparse arrays.
+        Returns:
+            The dataset with the other columns first, then the indicator columns (as pd.get_dummies).
+        """
+        if not self.vocabularies:
+            raise ValueError("Category_Encoder must be fitted before transform")
+
+        feature_names = self.feature_names
+
+        # One row per indicator column, so that every column is contiguous and they form a single block
+        indicators = np.empty((len(feature_names), len(dataset)), dtype=DUMMY_DTYPE)
+
+        position = 0
+        for col in self.cols:
+            codes = self.codes(dataset, col)
+            for code in range(len(self.vocabularies[col])):
+                np.equal(codes, code, out=indicators[position].view(bool))
+                position += 1
+
+        if sparse:
+            encoded = pd.DataFrame({name: pd.arrays.SparseArray(indicators[position], fill_value=0)
+                                    for position, name in enumerate(feature_names)}, index=dataset.index)
+        else:
+            encoded = pd.DataFrame(indicators.T, columns=feature_names, index=dataset.index)
+
+        return pd.concat([dataset.drop(columns=self.cols), encoded], axis=1)
+
+    def to_dict(self) -> dict:
+        """
+        This function returns the fitted encoder as a JSON-serializable dict.
+        """
+        return {"cols": self.cols, "vocabularies": {col: [str(category) for category in self.vocabularies[col]]
+                                                    for col in self.cols}}
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "Category_Encoder":
+        """
+        This function returns the encoder saved by to_dict.
+        """
+        return cls(cols=config["cols"], vocabularies=config["vocabularies"])
+
+    @classmethod
+    def from_feature_names(cls, feature_names: list, cols: list = CATEGORICAL_COLS) -> "Category_Encoder":
+        """
+        This function returns the encoder whose indicator columns are the given feature names,
+        e.g. the feature_names_in_ of a model trained before the encoder was persisted.
+        """
+        vocabularies = {col: [name[len(col) + 1:] for name in feature_names if str(name).startswith(f"{col}_")]
+                        for col in cols}
+        return cls(cols=cols, vocabularies=vocabularies)
+
 class Data_Preprocessing(Data_Handling_Template):
     """
     Class that defines the data preprocessing step 
     """    
-    def data_handling(self, dataset: pd.DataFrame, cols: list = ["rate_code_des", "pmt_type_des", "travel_day"]) -> Annotated[pd.DataFrame, "dataset_preprocessed"]:
+    def data_handling(self, dataset: pd.DataFrame, cols: list = ["rate_code_des", "pmt_type_des", "travel_day"],
+                      encoder: Category_Encoder = None) -> Annotated[pd.DataFrame, "dataset_preprocessed"]:
         """
         The function returns the dataset preprocessed for ml model training. 
+        When a fitted encoder is given, its vocabularies are used instead of the categories found in the dataset.
         """
         
+        # The dropoff timestamp only orders the time-based split, it is not a feature
+        if DROPOFF_COL in dataset.columns:
+            dataset = dataset.drop(columns=[DROPOFF_COL])
+
         # Encoding categorical variables
-        ml_data_encoded = pd.get_dummies(dataset, columns= cols)
+        if encoder is not None:
+            ml_data_encoded = encoder.transform(dataset)
+        else:
+            ml_data_encoded = pd.get_dummies(dataset, columns= cols, dtype=DUMMY_DTYPE)
 
         return ml_data_encoded
 
+    def fit_encoder(self, dataset: pd.DataFrame, cols: list = ["rate_code_des", "pmt_type_des", "travel_day"]) -> Category_Encoder:
+        """
+        The function returns the encoder fitted on the training dataset.
+        """
+        return Category_Encoder(cols=cols).fit(dataset)
+
+def load_history(start_date: str, end_date: str, encoder: Category_Encoder, cache_dir: str = None) -> pd.DataFrame:
+    """
+    This function returns the rows dropped off from start_date up to end_date (excluded), preprocessed with the
+    encoder, e.g. the training history before the new date partitions of an incremental training.
+    The rows are read through the Parquet cache (Data_Load_from_DB_Cached), so only the days missing from it
+    (and the day of its watermark) are fetched from the database.
+    Args:
+        start_date: First dropoff day of the history (ISO format).
+        end_date: First dropoff day after the history (ISO format), excluded.
+        encoder: The fitted encoder of the new rows, so that both have the same columns.
+        cache_dir: Cache directory (see Parquet_Dataset_Cache).
+    """
+    dataset = Data_Load_from_DB_Cached(start_date, end_date, cache_dir=cache_dir, with_dropoff=True).data_handling()
+    if not len(dataset):
+        return dataset
+
+    # The last partition also holds the rows dropped off exactly at midnight of end_date, which are new rows
+    dataset = dataset[dataset[DROPOFF_COL] < pd.Timestamp(end_date)]
 
+    return Data_Preprocessing().data_handling(dataset, encoder=encoder)
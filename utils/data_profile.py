@@ -0,0 +1,378 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from zenml.logger import get_logger
+
+from utils.schema import CATEGORICAL_COLS, FLOAT_COLS, INTEGER_COLS
+
+logger = get_logger(__name__)
+
+# Increase when the sketches change, so that profiles of another version are not compared
+PROFILE_VERSION = 1
+# Columns profiled at load time (the dropoff timestamps drift by construction and are left out)
+NUMERIC_COLS = INTEGER_COLS + FLOAT_COLS
+PROFILE_COLS = NUMERIC_COLS + CATEGORICAL_COLS
+
+# Quantile sketch: a value x > 0 falls in the bucket ceil(log(x) / log(GAMMA)), whose values are within
+# RELATIVE_ACCURACY of each other, so every quantile is known within RELATIVE_ACCURACY. Buckets only depend
+# on the value, which makes two sketches mergeable by adding their counts.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Magnitudes below MIN_MAGNITUDE count as 0
+MIN_MAGNITUDE = 1e-9
+# Keys are signed (0 for zero, +/-(bucket + BUCKET_SHIFT) for positive/negative values), so that
+# sorting the keys sorts the values; keys beyond MAX_KEY (|x| > 1e16) are clipped
+BUCKET_SHIFT = int(np.ceil(-np.log(MIN_MAGNITUDE) / np.log(GAMMA))) + 1
+MAX_KEY = 3000
+# Proportion floor of the PSI, so that an empty bin does not make it infinite
+PSI_EPSILON = 1e-4
+PSI_BINS = 10
+
+
+def finite_metadata(value):
+    """
+    This function returns a summary with its NaN and infinite numbers replaced by None, which ZenML metadata cannot hold.
+    """
+    if isinstance(value, dict):
+        return {key: finite_metadata(item) for key, item in value.items()}
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    return value
+
+
+def _bucket_keys(values: np.ndarray) -> np.ndarray:
+    """
+    This function returns the sketch key of every value (NaN excluded by the caller).
+    """
+    magnitudes = np.abs(values)
+    # Without masking: magnitudes below MIN_MAGNITUDE get a key, set to 0 by the multiplication
+    keys = np.ceil(np.log(np.maximum(magnitudes, MIN_MAGNITUDE)) * (1 / np.log(GAMMA))).astype(np.int64)
+    keys += BUCKET_SHIFT
+    keys *= magnitudes > MIN_MAGNITUDE
+    np.minimum(keys, MAX_KEY, out=keys)
+    return np.where(values < 0, -keys, keys)
+
+
+def _key_values(keys: np.ndarray) -> np.ndarray:
+    """
+    This function returns the representative value of sketch keys (within RELATIVE_ACCURACY of every value of the bucket).
+    """
+    magnitudes = 2 * GAMMA ** (np.abs(keys) - BUCKET_SHIFT) / (GAMMA + 1)
+    return np.where(keys == 0, 0.0, np.sign(keys) * magnitudes)
+
+
+class Numeric_Sketch:
+    """
+    Class for a mergeable summary of a numeric column: row and null counts, min, max, sum and sum of
+    squares, and the bucket counts of a relative-accuracy quantile sketch (dense over the MAX_KEY range).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.null_count = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.counts = np.zeros(2 * MAX_KEY + 1, dtype=np.int64)
+
+    def update(self, column: pd.Series) -> None:
+        """
+        This function adds the values of a column (one vectorized pass: a bincount of the bucket keys).
+        """
+        if pd.api.types.is_integer_dtype(column.dtype) and len(column) and not column.hasnans:
+            # Small integers (hours, passenger counts): the values are counted, then only the distinct values are keyed
+            values = column.to_numpy().astype(np.int64)
+            minimum = int(values.min())
+            value_counts = np.bincount(values - minimum)
+            distinct = np.flatnonzero(value_counts)
+            distinct_values, distinct_counts = (distinct + minimum).astype(np.float64), value_counts[distinct]
+            self._add(len(values), 0, float(minimum), float(distinct_values[-1]),
+                      float(distinct_values @ distinct_counts), float(distinct_values ** 2 @ distinct_counts))
+            np.add.at(self.counts, _bucket_keys(distinct_values) + MAX_KEY, distinct_counts)
+            return
+
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(values)
+        n_missing = int(missing.sum())
+        if n_missing:
+            values = values[~missing]
+        if not len(values):
+            self.null_count += n_missing
+            return
+
+        self._add(len(values), n_missing, float(values.min()), float(values.max()),
+                  float(values.sum()), float(values @ values))
+        self.counts += np.bincount(_bucket_keys(values) + MAX_KEY, minlength=len(self.counts))
+
+    def _add(self, count: int, null_count: int, minimum: float, maximum: float, total: float, total_squares: float) -> None:
+        self.count += count
+        self.null_count += null_count
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+        self.total += total
+        self.total_squares += total_squares
+
+    def merge(self, other: "Numeric_Sketch") -> None:
+        """
+        This function adds the counts of another sketch (e.g. of another chunk or partition).
+        """
+        self._add(other.count, other.null_count, other.minimum, other.maximum, other.total, other.total_squares)
+        self.counts += other.counts
+
+    def quantiles(self, quantiles: Iterable[float]) -> List[float]:
+        """
+        This function returns the estimated quantiles (within RELATIVE_ACCURACY, clipped to min and max).
+        """
+        if self.count == 0:
+            return [float("nan") for _ in quantiles]
+        cumulative = np.cumsum(self.counts)
+        ranks = np.asarray(list(quantiles)) * (self.count - 1)
+        keys = np.searchsorted(cumulative, ranks, side="right") - MAX_KEY
+        return np.clip(_key_values(keys), self.minimum, self.maximum).tolist()
+
+    def summary(self) -> dict:
+        n_rows = self.count + self.null_count
+        mean = self.total / self.count if self.count else float("nan")
+        variance = self.total_squares / self.count - mean * mean if self.count else float("nan")
+        q01, q25, q50, q75, q99 = self.quantiles((0.01, 0.25, 0.5, 0.75, 0.99))
+        return {
+            "null_fraction": self.null_count / n_rows if n_rows else 0.0,
+            "min": self.minimum if self.count else float("nan"),
+            "max": self.maximum if self.count else float("nan"),
+            "mean": mean,
+            "std": float(np.sqrt(max(variance, 0.0))),
+            "q01": q01, "q25": q25, "q50": q50, "q75": q75, "q99": q99,
+        }
+
+    def to_dict(self) -> dict:
+        keys = np.flatnonzero(self.counts)
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "sum": self.total,
+            "sum_squares": self.total_squares,
+            # Sparse: only the buckets holding values
+            "buckets": {str(key - MAX_KEY): int(self.counts[key]) for key in keys},
+        }
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "Numeric_Sketch":
+        sketch = cls()
+        sketch.count = config["count"]
+        sketch.null_count = config["null_count"]
+        sketch.minimum = config["min"] if config["min"] is not None else np.inf
+        sketch.maximum = config["max"] if config["max"] is not None else -np.inf
+        sketch.total = config["sum"]
+        sketch.total_squares = config["sum_squares"]
+        for key, count in config["buckets"].items():
+            sketch.counts[int(key) + MAX_KEY] = count
+        return sketch
+
+
+class Category_Sketch:
+    """
+    Class for a mergeable summary of a categorical column: the count of every category and the null count.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.null_count = 0
+
+    def update(self, column: pd.Series) -> None:
+        # Counted on the category codes of categorical columns, without materializing the values
+        counts = column.value_counts(dropna=False, sort=False)
+        for value, count in counts.items():
+            if pd.isna(value):
+                self.null_count += int(count)
+            elif count:
+                self.counts[str(value)] = self.counts.get(str(value), 0) + int(count)
+
+    def merge(self, other: "Category_Sketch") -> None:
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self.null_count += other.null_count
+
+    def summary(self, top: int = 5) -> dict:
+        n_rows = sum(self.counts.values()) + self.null_count
+        frequencies = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            "null_fraction": self.null_count / n_rows if n_rows else 0.0,
+            "n_categories": len(self.counts),
+            "top": {value: count / n_rows for value, count in frequencies},
+        }
+
+    def to_dict(self) -> dict:
+        return {"counts": dict(self.counts), "null_count": self.null_count}
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "Category_Sketch":
+        sketch = cls()
+        sketch.counts = dict(config["counts"])
+        sketch.null_count = config["null_count"]
+        return sketch
+
+
+class Data_Profile:
+    """
+    Class for the profile of a dataset: one mergeable sketch per column of PROFILE_COLS.
+
+    The profile is built chunk by chunk as the dataset is loaded (update), so the rows are read once,
+    and profiles of chunks or partitions are combined with merge. It is small (a few kB of counts)
+    and stored as JSON, so the profile of the data a model version was trained on can be compared
+    with a new dataset without reading either dataset again (drift_scores).
+    """
+
+    def __init__(self, numeric_cols: list = NUMERIC_COLS, categorical_cols: list = CATEGORICAL_COLS):
+        self.n_rows = 0
+        self.numeric = {col: Numeric_Sketch() for col in numeric_cols}
+        self.categorical = {col: Category_Sketch() for col in categorical_cols}
+
+    def update(self, chunk: pd.DataFrame) -> "Data_Profile":
+        """
+        This function adds the rows of a chunk (columns missing from the chunk are skipped).
+        """
+        self.n_rows += len(chunk)
+        for col, sketch in self.numeric.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col])
+        for col, sketch in self.categorical.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col])
+        return self
+
+    def merge(self, other: "Data_Profile") -> "Data_Profile":
+        """
+        This function adds the sketches of another profile of the same columns.
+        """
+        self.n_rows += other.n_rows
+        for col, sketch in other.numeric.items():
+            self.numeric.setdefault(col, Numeric_Sketch()).merge(sketch)
+        for col, sketch in other.categorical.items():
+            self.categorical.setdefault(col, Category_Sketch()).merge(sketch)
+        return self
+
+    def summary(self) -> dict:
+        """
+        This function returns the statistics of every column (null fraction, moments, quantiles, top categories),
+        None for those of a column without values.
+        """
+        return finite_metadata({"n_rows": self.n_rows,
+                                **{col: sketch.summary() for col, sketch in self.numeric.items()},
+                                **{col: sketch.summary() for col, sketch in self.categorical.items()}})
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PROFILE_VERSION,
+            "n_rows": self.n_rows,
+            "numeric": {col: sketch.to_dict() for col, sketch in self.numeric.items()},
+            "categorical": {col: sketch.to_dict() for col, sketch in self.categorical.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "Data_Profile":
+        if config["version"] != PROFILE_VERSION:
+            raise ValueError(f"Profile version {config['version']} is not supported (expected {PROFILE_VERSION})")
+        profile = cls(numeric_cols=[], categorical_cols=[])
+        profile.n_rows = config["n_rows"]
+        profile.numeric = {col: Numeric_Sketch.from_dict(sketch) for col, sketch in config["numeric"].items()}
+        profile.categorical = {col: Category_Sketch.from_dict(sketch) for col, sketch in config["categorical"].items()}
+        return profile
+
+
+def _psi(reference: np.ndarray, current: np.ndarray) -> float:
+    """
+    This function returns the population stability index of two count vectors over the same bins.
+    """
+    reference = np.maximum(reference / max(reference.sum(), 1), PSI_EPSILON)
+    current = np.maximum(current / max(current.sum(), 1), PSI_EPSILON)
+    return float(np.sum((current - reference) * np.log(current / reference)))
+
+
+def numeric_drift(reference: Numeric_Sketch, current: Numeric_Sketch, n_bins: int = PSI_BINS) -> dict:
+    """
+    This function returns the drift of a numeric column between two sketches:
+        psi: population stability index over the n_bins quantile bins of the reference.
+        ks: Kolmogorov-Smirnov statistic, the largest difference of the two CDFs (on the bucket grid).
+    """
+    if reference.count == 0 or current.count == 0:
+        return {"psi": 0.0, "ks": 0.0}
+
+    reference_cdf = np.cumsum(reference.counts) / reference.count
+    current_cdf = np.cumsum(current.counts) / current.count
+    ks = float(np.max(np.abs(reference_cdf - current_cdf)))
+
+    # Bins end at the buckets where the reference CDF crosses 1/n_bins, 2/n_bins, ...; repeated values
+    # (e.g. hours, passenger counts) fall in one bucket, so fewer bins remain
+    edges = np.unique(np.searchsorted(reference_cdf, np.arange(1, n_bins) / n_bins, side="left"))
+    bounds = np.r_[0, edges + 1, len(reference.counts)]
+    bounds = np.unique(np.clip(bounds, 0, len(reference.counts)))
+    reference_bins = np.add.reduceat(reference.counts, bounds[:-1])
+    current_bins = np.add.reduceat(current.counts, bounds[:-1])
+
+    return {"psi": _psi(reference_bins, current_bins), "ks": ks}
+
+
+def category_drift(reference: Category_Sketch, current: Category_Sketch) -> dict:
+    """
+    This function returns the drift of a categorical column between two sketches:
+        psi: population stability index over the categories of both (nulls included as a category).
+        ks: largest difference of the frequency of a category (total variation on one category).
+    """
+    values = sorted(set(reference.counts) | set(current.counts))
+    reference_counts = np.array([reference.counts.get(value, 0) for value in values] + [reference.null_count], dtype=np.float64)
+    current_counts = np.array([current.counts.get(value, 0) for value in values] + [current.null_count], dtype=np.float64)
+    if reference_counts.sum() == 0 or current_counts.sum() == 0:
+        return {"psi": 0.0, "ks": 0.0}
+
+    ks = float(np.max(np.abs(reference_counts / reference_counts.sum() - current_counts / current_counts.sum())))
+    return {"psi": _psi(reference_counts, current_counts), "ks": ks}
+
+
+def drift_scores(reference: Data_Profile, current: Data_Profile) -> Dict[str, dict]:
+    """
+    This function returns {column: {"psi": ..., "ks": ...}} for the columns profiled in both profiles.
+    """
+    scores = {}
+    for col, sketch in current.numeric.items():
+        if col in reference.numeric:
+            scores[col] = numeric_drift(reference.numeric[col], sketch)
+    for col, sketch in current.categorical.items():
+        if col in reference.categorical:
+            scores[col] = category_drift(reference.categorical[col], sketch)
+    return scores
+
+
+class Drift_Gate:
+    """
+    Class that decides whether drift scores are acceptable: every gated column must stay at or below
+    max_psi (0.25 is the usual "significant shift" level of the PSI) and max_ks.
+    """
+
+    def __init__(self, max_psi: float = 0.25, max_ks: float = 0.2, columns: Optional[list] = None):
+        """
+        Args:
+            max_psi: Largest population stability index of a column.
+            max_ks: Largest Kolmogorov-Smirnov statistic of a column.
+            columns: Columns gated. All scored columns when None.
+        """
+        self.max_psi = max_psi
+        self.max_ks = max_ks
+        self.columns = columns
+
+    def check(self, scores: Dict[str, dict]) -> Tuple[bool, List[str]]:
+        """
+        This function returns (passed, reasons), with one reason per column over a limit.
+        """
+        reasons = []
+        for col, score in scores.items():
+            if self.columns is not None and col not in self.columns:
+                continue
+            if score["psi"] > self.max_psi:
+                reasons.append(f"{col}: psi {score['psi']:.3f} above {self.max_psi}")
+            if score["ks"] > self.max_ks:
+                reasons.append(f"{col}: ks {score['ks']:.3f} above {self.max_ks}")
+        return not reasons, reasons
@@ -0,0 +1,269 @@
+import contextlib
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from zenml.logger import get_logger
+
+from utils.arrow_io import read_dataframe_ipc, write_dataframe_ipc
+from utils.data_handling import Category_Encoder, Data_Preprocessing
+from utils.file_lock import file_lock, write_json_atomic
+from utils.schema import DROPOFF_COL, DUMMY_DTYPE, concat_frames
+
+logger = get_logger(__name__)
+
+# Version of the preprocessing output; increase it when Data_Preprocessing encodes differently,
+# so that the matrices stored by the previous code are not reused
+FEATURE_SPEC_VERSION = 1
+
+
+def partition_days(dataset: pd.DataFrame, time_col: str = DROPOFF_COL) -> Tuple[np.ndarray, List[Tuple[str, int, int]]]:
+    """
+    This function groups the rows of a dataset by dropoff day.
+    Returns:
+        (order, days): the row positions sorted by day (stable, so the rows of a day keep the dataset order),
+        and (day, start, end) of every day, in day order, with the positions of the day at order[start:end].
+    """
+    if time_col not in dataset.columns:
+        raise ValueError(f"The feature store needs the {time_col} column (load the dataset with with_dropoff=True)")
+
+    day_values = dataset[time_col].to_numpy().astype("datetime64[D]")
+    if len(day_values) and (day_values[1:] >= day_values[:-1]).all():
+        # The partitioned and cached loaders return the days in order already
+        order = np.arange(len(day_values))
+    else:
+        # Days since the first day as int16 (89 years), which numpy sorts stably with a radix sort
+        order = np.argsort((day_values - day_values.min()).astype(np.int16), kind="stable")
+    sorted_days = day_values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_days[1:] != sorted_days[:-1]]) if len(order) else np.array([], dtype=np.int64)
+    bounds = np.r_[starts, len(order)]
+
+    return order, [(str(sorted_days[start]), int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _row_values(column: pd.Series) -> np.ndarray:
+    """
+    This function returns one fixed-size value per row of a raw column, which depends on the value of the row
+    only (not on the dtype the loader chose, nor on the categories of the other rows).
+    """
+    if column.name == DROPOFF_COL:
+        # In a fixed unit, so that the fingerprint does not depend on the timestamp resolution of the load
+        return column.to_numpy().astype("datetime64[us]").view(np.int64)
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # The hash of every category once, gathered by code (a missing value has code -1 and hash 0)
+        category_hashes = np.r_[pd.util.hash_array(column.cat.categories.to_numpy(dtype=object)), np.uint64(0)]
+        return category_hashes[column.cat.codes.to_numpy()]
+    if column.dtype.kind in "biuf":
+        # int8 and float32 columns holding the same values give the same fingerprint
+        return column.to_numpy(dtype=np.float64)
+    # Strings: one vectorized 64-bit hash per value, like the categories
+    return pd.util.hash_array(column.to_numpy(dtype=object))
+
+
+def source_fingerprints(dataset: pd.DataFrame, order: np.ndarray, days: list) -> dict:
+    """
+    This function returns {day: fingerprint of its raw rows} from the row count and the values of every
+    column of the day, in row order. A stored matrix is reused only when its source has the same
+    fingerprint, so days with late or corrected trips, or rows returned in another order, are
+    preprocessed again. Every column is turned into one fixed-size value per row (_row_values), gathered
+    once in day order and hashed per day as a buffer, without copying the rows of a day.
+    """
+    arrays = []
+    for col in sorted(dataset.columns):
+        arrays.append(col.encode("utf-8"))
+        arrays.append(np.ascontiguousarray(_row_values(dataset[col])[order]))
+
+    fingerprints = {}
+    for day, start, end in days:
+        digest = hashlib.sha256(str(end - start).encode())
+        for array in arrays:
+            digest.update(array if isinstance(array, bytes) else array[start:end])
+        fingerprints[day] = digest.hexdigest()[:32]
+    return fingerprints
+
+
+class Feature_Store:
+    """
+    Class for a local store of encoded feature matrices, one per dropoff day and feature spec.
+
+    The matrices (output of Data_Preprocessing with a fitted Category_Encoder) are stored as
+    uncompressed Arrow IPC files, read back memory-mapped, and laid out as
+    <store_dir>/<spec key>/date=<day>.arrow. <store_dir>/index.json records every partition
+    with its rows, size, source fingerprint and last access time; the least recently used
+    partitions are evicted above max_size_mb. A window of days is assembled by concatenating its
+    partitions, so only the days that are new or changed are preprocessed again.
+    Runs sharing the store (e.g. concurrent pipeline runs) work on it within locked(), which reloads the
+    index under a file lock and saves it before releasing the lock, so that no entry is lost and no
+    partition is evicted while another run reads it.
+    """
+
+    def __init__(self, store_dir: Optional[str] = None, max_size_mb: float = 4096):
+        """
+        Args:
+            store_dir: Store directory. Defaults to the FEATURE_STORE_DIR environment variable or .feature_store.
+            max_size_mb: Size of the stored matrices above which the least recently used partitions are evicted.
+        """
+        self.store_dir = Path(store_dir or os.getenv("FEATURE_STORE_DIR", ".feature_store"))
+        self.max_size_mb = max_size_mb
+        self.index_path = self.store_dir / "index.json"
+        self.index = self._load_index()
+
+    @staticmethod
+    def spec_key(encoder: Category_Encoder) -> str:
+        """
+        This function returns the key of the feature spec: the preprocessing version, the encoder
+        vocabularies and the indicator dtype. Matrices are only shared between identical specs.
+        """
+        spec = {"version": FEATURE_SPEC_VERSION, "encoder": encoder.to_dict(), "dummy_dtype": np.dtype(DUMMY_DTYPE).name}
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    @contextlib.contextmanager
+    def locked(self):
+        with file_lock(self.index_path):
+            self.index = self._load_index()
+            yield self
+            self.save()
+
+    def _load_index(self) -> dict:
+        if self.index_path.exists():
+            with open(self.index_path) as index_file:
+                return json.load(index_file)
+        return {"specs": {}}
+
+    def _entries(self, spec: str) -> dict:
+        return self.index["specs"].setdefault(spec, {"partitions": {}})["partitions"]
+
+    def entry(self, spec: str, partition: str) -> Optional[dict]:
+        """
+        This function returns the index entry of a stored partition, or None when it is not stored.
+        """
+        entry = self._entries(spec).get(partition)
+        if entry is None or not (self.store_dir / entry["file"]).exists():
+            return None
+        return entry
+
+    def read(self, spec: str, partition: str) -> pd.DataFrame:
+        """
+        This function returns a stored feature matrix (memory-mapped).
+        """
+        entry = self._entries(spec)[partition]
+        entry["last_access"] = time.time()
+        return read_dataframe_ipc(str(self.store_dir / entry["file"]))
+
+    def write(self, spec: str, partition: str, features: pd.DataFrame, fingerprint: str) -> None:
+        """
+        This function stores the feature matrix of a partition.
+        Args:
+            spec: Feature spec key.
+            partition: Dropoff day (ISO format).
+            features: The encoded rows of the day.
+            fingerprint: Fingerprint of the raw rows the matrix was computed from (source_fingerprints).
+        """
+        file = f"{spec}/date={partition}.arrow"
+        path = self.store_dir / file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = write_dataframe_ipc(features.reset_index(drop=True), str(path))
+
+        self._entries(spec)[partition] = {
+            "file": file,
+            "bytes": size,
+            "rows": len(features),
+            "fingerprint": fingerprint,
+            "last_access": time.time(),
+        }
+
+    def window(self, spec: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        This function returns the stored feature matrices of the dropoff days from start_date to end_date
+        (inclusive), concatenated in day order. Days without trips have no partition and are skipped.
+        """
+        days = [str(day) for day in np.arange(np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1)]
+        frames = [self.read(spec, day) for day in days if self.entry(spec, day) is not None]
+        if not frames:
+            raise KeyError(f"No feature partitions stored for spec {spec} between {start_date} and {end_date}")
+        return concat_frames(frames)
+
+    def evict(self, keep: tuple = ()) -> None:
+        """
+        This function removes the least recently used partitions until the store fits in max_size_mb.
+        Args:
+            keep: (spec, partition) pairs evicted only after every other partition.
+        """
+        entries = [
+            (spec, partition, entry)
+            for spec, stored in self.index["specs"].items()
+            for partition, entry in stored["partitions"].items()
+        ]
+        total_bytes = sum(entry["bytes"] for _, _, entry in entries)
+        max_bytes = self.max_size_mb * 1024 * 1024
+
+        entries.sort(key=lambda item: ((item[0], item[1]) in keep, item[2]["last_access"]))
+
+        for spec, partition, entry in entries:
+            if total_bytes <= max_bytes:
+                break
+            (self.store_dir / entry["file"]).unlink(missing_ok=True)
+            total_bytes -= entry["bytes"]
+            del self.index["specs"][spec]["partitions"][partition]
+            logger.info(f"Evicted feature partition {partition} of spec {spec}")
+
+        # Specs left without partitions are dropped from the index
+        for spec in [spec for spec, stored in self.index["specs"].items() if not stored["partitions"]]:
+            del self.index["specs"][spec]
+
+    def save(self) -> None:
+        """
+        This function persists the index.
+        """
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # Written then renamed, so that an interrupted run never leaves a truncated index
+        write_json_atomic(self.index_path, self.index, indent=2)
+
+    def features(self, dataset: pd.DataFrame, encoder: Category_Encoder) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        This function returns the encoded feature matrix of a dataset, preprocessing only the dropoff
+        days that are not stored (or whose raw rows changed) and reading the other days from the store.
+        Args:
+            dataset: Dataset loaded with the dropoff timestamps.
+            encoder: Encoder fitted on the training dataset.
+        Returns:
+            (features, positions): the features concatenated in day order, and positions such that
+            row positions[i] of the features is row i of the dataset.
+        """
+        spec = self.spec_key(encoder)
+        order, days = partition_days(dataset)
+        fingerprints = source_fingerprints(dataset, order, days)
+
+        frames, computed = [], []
+        # Held until the index is saved, so that no other run evicts the partitions read here
+        with self.locked():
+            for day, start, end in days:
+                entry = self.entry(spec, day)
+                if entry is not None and entry["fingerprint"] == fingerprints[day]:
+                    frames.append(self.read(spec, day))
+                    continue
+
+                # Only the rows of new or changed days are taken out of the dataset and preprocessed
+                features = Data_Preprocessing().data_handling(dataset.take(order[start:end]), encoder=encoder)
+                self.write(spec, day, features, fingerprints[day])
+                frames.append(features)
+                computed.append(day)
+
+            logger.info(f"Feature store {spec}: {len(days) - len(computed)} partitions stored, "
+                        f"{len(computed)} preprocessed ({', '.join(computed) or 'none'})")
+
+            self.evict(keep=tuple((spec, day) for day, _, _ in days))
+
+        features = concat_frames(frames)
+        del frames
+
+        # Inverse of the day ordering: the dataset row i is the feature row positions[i]
+        positions = np.empty(len(order), dtype=np.int64)
+        positions[order] = np.arange(len(order))
+
+        return features, positions
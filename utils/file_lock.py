@@ -0,0 +1,38 @@
+import contextlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # fcntl is not available on Windows
+    fcntl = None
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """
+    Context manager holding an exclusive lock on <path>.lock, so that the processes updating a shared file
+    (e.g. the steps of a parallel run) do it one at a time. Without fcntl (Windows) it does not lock.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_json_atomic(path: Path, data, **dump_kwargs) -> None:
+    """
+    This function writes a JSON file through a temporary file renamed over it, so that readers never see it half written.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as json_file:
+        json.dump(data, json_file, **dump_kwargs)
+    os.replace(tmp_path, path)
@@ -0,0 +1,345 @@
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from zenml.logger import get_logger
+from utils.file_lock import file_lock, write_json_atomic
+
+logger = get_logger(__name__)
+
+# Memoization is on unless STEP_MEMOIZATION is 0/false/no; the index of the results is kept in STEP_MEMO_DIR (.memo_cache)
+MEMOIZATION_ENV = "STEP_MEMOIZATION"
+MEMO_DIR_ENV = "STEP_MEMO_DIR"
+# Increase to invalidate every memoized result (e.g. after a change of the fingerprint itself)
+MEMO_VERSION = 2
+
+
+def memoization_enabled() -> bool:
+    return os.getenv(MEMOIZATION_ENV, "1").lower() not in ("0", "false", "no")
+
+
+def _update_column(digest, column: pd.Series) -> None:
+    dtype = column.dtype
+    digest.update(str(dtype).encode())
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        _update_column(digest, pd.Series(dtype.categories))
+        digest.update(np.ascontiguousarray(column.cat.codes.to_numpy()).view(np.uint8))
+    elif isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        # The column buffer itself, without a per-value hash
+        digest.update(np.ascontiguousarray(column.to_numpy()).view(np.uint8))
+    else:
+        # Strings and other objects: one vectorized 64-bit hash per value
+        digest.update(pd.util.hash_pandas_object(column, index=False).to_numpy())
+
+
+def _update(digest, value) -> None:
+    """
+    This function adds a value to a fingerprint: DataFrames, Series and arrays by their buffers,
+    plain values by their repr, containers element by element, and other objects by joblib.hash.
+    """
+    if isinstance(value, pd.DataFrame):
+        digest.update(f"DataFrame{value.shape}".encode())
+        if not isinstance(value.index, pd.RangeIndex):
+            digest.update(pd.util.hash_pandas_object(value.index).to_numpy())
+        elif value.index.start != 0 or value.index.step != 1:
+            # e.g. the rows of a slice, which keep their labels
+            digest.update(repr(value.index).encode())
+        for name in value.columns:
+            digest.update(repr(name).encode())
+            _update_column(digest, value[name])
+    elif isinstance(value, pd.Series):
+        digest.update(f"Series{len(value)}{value.name!r}".encode())
+        _update_column(digest, value)
+    elif isinstance(value, np.ndarray):
+        digest.update(f"ndarray{value.dtype}{value.shape}".encode())
+        if value.dtype.kind == "O":
+            digest.update(pd.util.hash_array(value.ravel()))
+        else:
+            digest.update(np.ascontiguousarray(value).view(np.uint8))
+    elif value is None or isinstance(value, (bool, int, float, str, bytes)):
+        digest.update(f"{type(value).__name__}:{value!r}".encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update(digest, value[key])
+    else:
+        # Models, encoders, configs: the hash of their pickle, with numpy arrays hashed by buffer
+        import joblib
+
+        digest.update(f"{type(value).__module__}.{type(value).__qualname__}:{joblib.hash(value)}".encode())
+
+
+def fingerprint(value) -> str:
+    """
+    This function returns the content fingerprint of a value (see _update).
+    Two DataFrames with the same columns, dtypes and values have the same fingerprint, whatever their origin.
+    """
+    digest = hashlib.sha256()
+    _update(digest, value)
+    return digest.hexdigest()
+
+
+def _function_identity(func: Callable) -> str:
+    """
+    This function returns the name and source hash of a function, so that a change of its code invalidates its results.
+    """
+    func = inspect.unwrap(func)
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = ""
+    source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return f"{func.__module__}.{func.__qualname__}:{source_hash}"
+
+
+def memo_key(func: Callable, arguments: dict, extra=None) -> str:
+    """
+    This function returns the memoization key of a call: the function (name and source), every argument
+    value and the extra key (e.g. the state of the source a step reads).
+    """
+    digest = hashlib.sha256(f"memo-v{MEMO_VERSION}:{_function_identity(func)}".encode())
+    # A bound method also depends on the state of its object
+    if inspect.ismethod(func):
+        _update(digest, func.__self__)
+    _update(digest, arguments)
+    _update(digest, extra)
+    return digest.hexdigest()[:32]
+
+
+class Memo_Store:
+    """
+    Class for the local index of memoized results.
+
+    The results themselves are not stored again: <memo_dir>/index.json maps every key to the ZenML step run
+    that computed it, with the output artifact holding each part of the result (loaded back through its
+    materializer, e.g. memory-mapped Arrow for DataFrames) or, for small values such as metrics, the value
+    itself. Entries also keep the function name, compute time and last access time; the least recently used
+    entries are dropped above max_entries (the artifacts stay in the artifact store).
+    Steps running at the same time (e.g. with utils.parallel_runner) change the index within locked(), which
+    reloads it under a file lock and saves it before releasing the lock, so that no entry is lost.
+    """
+
+    def __init__(self, memo_dir: Optional[str] = None, max_entries: int = 1024):
+        """
+        Args:
+            memo_dir: Index directory. Defaults to the STEP_MEMO_DIR environment variable or .memo_cache.
+            max_entries: Number of entries above which the least recently used entries are dropped.
+        """
+        self.memo_dir = Path(memo_dir or os.getenv(MEMO_DIR_ENV, ".memo_cache"))
+        self.max_entries = max_entries
+        self.index_path = self.memo_dir / "index.json"
+        self.index = self._load_index()
+
+    @contextlib.contextmanager
+    def locked(self):
+        with file_lock(self.index_path):
+            self.index = self._load_index()
+            yield self
+            self.save()
+
+    def _load_index(self) -> dict:
+        if self.index_path.exists():
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+            if index.get("version") == MEMO_VERSION:
+                return index
+        return {"version": MEMO_VERSION, "entries": {}}
+
+    def entry(self, key: str) -> Optional[dict]:
+        """
+        This function returns the index entry of a memoized result, or None when it is not indexed.
+        """
+        return self.index["entries"].get(key)
+
+    def touch(self, key: str) -> None:
+        if key in self.index["entries"]:
+            self.index["entries"][key]["last_access"] = time.time()
+
+    @staticmethod
+    def read(entry: dict):
+        """
+        This function returns (True, memoized result of an entry), with its artifacts loaded from the step run that
+        produced it, or (False, None) when that run has no such outputs (e.g. it failed after the entry was written).
+        """
+        artifacts = {}
+        if any("artifact" in part for part in entry["parts"]):
+            from zenml.client import Client
+
+            try:
+                outputs = Client().get_run_step(entry["step_run"]).outputs
+            except KeyError:
+                return False, None
+            # Found by artifact name, which is also the output name of the steps memoizing results
+            artifacts = {output.name: output for output in outputs.values()}
+            artifacts.update(outputs)
+
+        parts = []
+        for part in entry["parts"]:
+            if "artifact" not in part:
+                parts.append(part["value"])
+            elif part["artifact"] in artifacts:
+                parts.append(artifacts[part["artifact"]].load())
+            else:
+                return False, None
+
+        return True, (tuple(parts) if entry["is_tuple"] else parts[0])
+
+    def write(self, key: str, name: str, result, artifacts, step_run: str, seconds: float) -> None:
+        """
+        This function indexes the result of a call.
+        Args:
+            key: Memoization key (memo_key).
+            name: Name of the memoized function.
+            result: The result.
+            artifacts: Name of the step output artifact holding each part of the result (one name, or one per
+                element of a tuple result); None for a part kept in the index, which must be JSON serializable.
+            step_run: Id of the step run returning the artifacts.
+            seconds: Time the result took to compute.
+        """
+        is_tuple = isinstance(result, tuple)
+        values = result if is_tuple else (result,)
+        names = artifacts if isinstance(artifacts, (tuple, list)) else (artifacts,) * len(values)
+        if len(names) != len(values):
+            raise ValueError(f"{name} returned {len(values)} values for the artifacts {artifacts}")
+
+        parts = []
+        for artifact, value in zip(names, values):
+            if artifact is None:
+                # Checked now, so that a value the index cannot hold fails the call rather than the next lookup
+                json.dumps(value)
+                parts.append({"value": value})
+            else:
+                parts.append({"artifact": artifact})
+
+        self.index["entries"][key] = {
+            "name": name,
+            "step_run": step_run,
+            "parts": parts,
+            "is_tuple": is_tuple,
+            "seconds": seconds,
+            "created": time.time(),
+            "last_access": time.time(),
+        }
+
+    def remove(self, key: str) -> None:
+        self.index["entries"].pop(key, None)
+
+    def evict(self) -> None:
+        """
+        This function drops the least recently used entries until the index holds max_entries.
+        """
+        entries = sorted(self.index["entries"].items(), key=lambda item: item[1]["last_access"])
+        for key, entry in entries[:max(len(entries) - self.max_entries, 0)]:
+            del self.index["entries"][key]
+            logger.info(f"Evicted memoized result {key} of {entry['name']}")
+
+    def save(self) -> None:
+        """
+        This function persists the index.
+        """
+        self.memo_dir.mkdir(parents=True, exist_ok=True)
+        # Written then renamed, so that an interrupted run never leaves a truncated index
+        write_json_atomic(self.index_path, self.index, indent=2)
+
+
+def _current_step_run() -> Optional[str]:
+    """
+    This function returns the id of the running step, or None outside a ZenML step run.
+    """
+    from zenml import get_step_context
+
+    try:
+        return str(get_step_context().step_run.id)
+    except RuntimeError:
+        return None
+
+
+class Step_Memo:
+    """
+    Class memoizing a call inside a step by the content of its arguments.
+
+    On a hit the result is loaded from the output artifacts of the step run that computed it (see Memo_Store),
+    and hit is set, so that the step can redo the side effects the call would have had (e.g. the MLflow
+    autologging of a fit). Outside a ZenML step run the call is simply made.
+    """
+
+    def __init__(self, func: Callable, *args, artifacts: Union[str, Tuple[Optional[str], ...], None] = None,
+                 key_extra=None, enabled: bool = None, **kwargs):
+        """
+        Args:
+            func: The function (or bound method) to call.
+            artifacts: Name of the step output artifact holding the result, or each element of a tuple result
+                (see Memo_Store.write). None when the result is kept in the index.
+            key_extra: Extra value of the key, for what the arguments do not show.
+            enabled: Whether to memoize. Defaults to the STEP_MEMOIZATION environment variable (on).
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.artifacts = artifacts
+        self.key_extra = key_extra
+        self.enabled = enabled if enabled is not None else memoization_enabled()
+        self.hit = False
+
+    def call(self):
+        """
+        This function returns func(*args, **kwargs), from the index when it was called before with arguments
+        of the same content.
+        """
+        step_run = _current_step_run() if self.enabled else None
+        if step_run is None:
+            return self.func(*self.args, **self.kwargs)
+
+        bound = inspect.signature(self.func).bind(*self.args, **self.kwargs)
+        bound.apply_defaults()
+
+        started = time.perf_counter()
+        key = memo_key(self.func, dict(bound.arguments), extra=self.key_extra)
+        name = getattr(self.func, "__qualname__", repr(self.func))
+        store = Memo_Store()
+
+        entry = store.entry(key)
+        if entry is not None:
+            # The artifacts are loaded outside the lock, which is only held to update the index
+            found, result = store.read(entry)
+            with store.locked():
+                if found:
+                    store.touch(key)
+                else:
+                    store.remove(key)
+            if found:
+                self.hit = True
+                logger.info(f"Memoized {name}: result {key} of step run {entry['step_run']} reused in "
+                            f"{time.perf_counter() - started:.2f}s (computed in {entry['seconds']:.2f}s)")
+                return result
+
+        computed = time.perf_counter()
+        result = self.func(*self.args, **self.kwargs)
+        seconds = time.perf_counter() - computed
+
+        with store.locked():
+            store.write(key, name, result, self.artifacts, step_run, seconds)
+            store.evict()
+        logger.info(f"Memoized {name}: result {key} indexed (key in {computed - started:.2f}s, computed in {seconds:.2f}s)")
+
+        return result
+
+
+def memoized_call(func: Callable, *args, artifacts=None, key_extra=None, enabled: bool = None, **kwargs):
+    """
+    This function returns func(*args, **kwargs), memoized with Step_Memo.
+    """
+    return Step_Memo(func, *args, artifacts=artifacts, key_extra=key_extra, enabled=enabled, **kwargs).call()
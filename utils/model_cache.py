@@ -0,0 +1,133 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from sklearn.base import RegressorMixin
+from zenml.client import Client
+from zenml.logger import get_logger
+
+from utils.data_handling import Category_Encoder
+
+if TYPE_CHECKING:
+    from utils.data_profile import Data_Profile
+
+logger = get_logger(__name__)
+
+# Artifacts of the training pipeline
+MODEL_ARTIFACT = "reg_model"
+ENCODER_ARTIFACT = "category_encoder"
+# Written by the ml_model_compile step (utils.compiled_tree)
+COMPILED_MODEL_ARTIFACT = "compiled_model"
+# Written by the load_data step (utils.data_profile)
+PROFILE_ARTIFACT = "data_profile"
+
+# Number of deserialized model versions kept per process
+MODEL_CACHE_SIZE = 4
+
+
+class Loaded_Model(NamedTuple):
+    """
+    A deserialized model version with the encoder preparing its features.
+    """
+    version_id: str
+    version_number: Optional[int]
+    model: RegressorMixin
+    encoder: Category_Encoder
+
+
+def _linked_artifact(model_version, name: str, model_artifact: bool = False):
+    """
+    This function returns an artifact linked to a model version, None when the version has no artifact of that name.
+    """
+    try:
+        if model_artifact:
+            return model_version.get_model_artifact(name)
+        return model_version.get_data_artifact(name)
+    except KeyError:
+        return None
+
+
+def resolve_model_version(model_name: str = "reg_model", stage: str = "production") -> str:
+    """
+    This function returns the id of the model version currently at a stage.
+    Only version metadata is read, so it is cheap to call before every batch.
+    Args:
+        model_name: Name of the model in the ZenML model control plane.
+        stage: Stage set by model_promotion_flag.
+    Returns:
+        The id of the model version.
+    """
+    return str(Client().get_model_version(model_name, stage).id)
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def load_model_version(model_name: str, version_id: str, compiled: bool = False) -> Loaded_Model:
+    """
+    This function returns a model version with its encoder, deserialized once per process.
+    Versions are immutable, so the cache is keyed by version id and never goes stale: a new
+    production version has a new id and is loaded on its first use.
+    Args:
+        model_name: Name of the model in the ZenML model control plane.
+        version_id: Id of the model version (from resolve_model_version).
+        compiled: Load the compiled model of the version (memory-mapped arrays, no sklearn) when it has one.
+    Returns:
+        The loaded model version.
+    """
+    try:
+        model_version = Client().get_model_version(model_name, version_id)
+
+        compiled_artifact = _linked_artifact(model_version, COMPILED_MODEL_ARTIFACT, model_artifact=True) if compiled else None
+        if compiled_artifact is not None:
+            model = compiled_artifact.load()
+        else:
+            if compiled:
+                logger.info(f"No {COMPILED_MODEL_ARTIFACT} artifact linked to the model version, loading {MODEL_ARTIFACT}")
+            model_artifact = _linked_artifact(model_version, MODEL_ARTIFACT, model_artifact=True)
+            if model_artifact is None:
+                raise ValueError(f"Version {model_version.number} of {model_name} has no {MODEL_ARTIFACT} artifact linked "
+                                 f"to it (the training pipeline links its artifacts to a new version of {model_name})")
+            model = model_artifact.load()
+
+        encoder_artifact = _linked_artifact(model_version, ENCODER_ARTIFACT)
+        if encoder_artifact is not None:
+            encoder = encoder_artifact.load()
+        else:
+            # Versions trained before the encoder was persisted: the vocabularies are in the feature names
+            logger.info(f"No {ENCODER_ARTIFACT} artifact linked to the model version, using the model feature names")
+            encoder = Category_Encoder.from_feature_names(list(model.feature_names_in_))
+
+        logger.info(f"Loaded {model_name} version {model_version.number} ({version_id})")
+
+        return Loaded_Model(version_id, model_version.number, model, encoder)
+
+    except Exception as error:
+        logger.error(f"Error found in loading model version {version_id}: {error}")
+        raise error
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def load_version_profile(model_name: str, version_id: str) -> Optional["Data_Profile"]:
+    """
+    This function returns the profile of the data a model version was trained on, None when the version has none.
+    Like the model, the profile of a version never changes, so it is read once per process.
+    Args:
+        model_name: Name of the model in the ZenML model control plane.
+        version_id: Id of the model version (from resolve_model_version).
+    """
+    try:
+        profile_artifact = _linked_artifact(Client().get_model_version(model_name, version_id), PROFILE_ARTIFACT)
+        if profile_artifact is None:
+            logger.info(f"No {PROFILE_ARTIFACT} artifact linked to the model version {version_id}")
+            return None
+        return profile_artifact.load()
+
+    except Exception as error:
+        logger.error(f"Error found in loading the data profile of model version {version_id}: {error}")
+        raise error
+
+
+def load_production_model(model_name: str = "reg_model", stage: str = "production",
+                          compiled: bool = False) -> Loaded_Model:
+    """
+    This function returns the model version at a stage, reloading it only when the stage has moved to another version.
+    """
+    return load_model_version(model_name, resolve_model_version(model_name, stage), compiled=compiled)
@@ -1,5 +1,10 @@
 from typing_extensions import Annotated
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Tuple
 import numpy as np
+import pandas as pd
 from zenml.logger import get_logger
 from abc import ABC, abstractmethod
 from sklearn.metrics import mean_squared_error, r2_score
@@ -63,4 +68,176 @@ class R2_Score(ML_Evaluation):
             return r2
         except Exception as error:
             logger.error(f"Error found in process of computing R2 score {error}")
-            raise error
\ No newline at end of file
+            raise error
+class Regression_Metrics_Accumulator:
+    """
+    Class accumulates the regression metrics of ml model over chunks of predictions.
+    Every chunk is reduced to its count, mean and sum of squared deviations of y_true
+    (merged with Chan's formula) and to its squared and absolute residual sums, so that
+    memory does not grow with the number of rows. Residual quantiles come from a uniform
+    sample of at most max_sample residuals.
+    """
+    quantiles = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+    def __init__(self, max_sample: int = 100000, random_state: int = 12):
+        self.n = 0
+        self.mean_true = 0.0
+        self.m2_true = 0.0
+        self.sse = 0.0
+        self.sae = 0.0
+        self.max_sample = max_sample
+        self.rng = np.random.default_rng(random_state)
+        self.sample = np.empty(0)
+        self.sample_keys = np.empty(0)
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        """
+        This function adds a chunk of true and predicted values.
+        """
+        y_true = np.asarray(y_true, dtype=np.float64)
+        residuals = np.asarray(y_pred, dtype=np.float64) - y_true
+
+        n_chunk = len(y_true)
+        if n_chunk == 0:
+            return
+
+        mean_chunk = y_true.mean()
+        deviations = y_true - mean_chunk
+        m2_chunk = deviations @ deviations
+
+        delta = mean_chunk - self.mean_true
+        n_total = self.n + n_chunk
+        self.mean_true += delta * n_chunk / n_total
+        self.m2_true += m2_chunk + delta * delta * self.n * n_chunk / n_total
+        self.n = n_total
+
+        self.sse += residuals @ residuals
+        self.sae += np.abs(residuals).sum()
+
+        # Bottom-k sampling: keeping the residuals with the smallest random keys is a uniform sample
+        keys = self.rng.random(n_chunk)
+        self.sample = np.concatenate([self.sample, residuals])
+        self.sample_keys = np.concatenate([self.sample_keys, keys])
+        if len(self.sample) > self.max_sample:
+            keep = np.argpartition(self.sample_keys, self.max_sample)[:self.max_sample]
+            self.sample = self.sample[keep]
+            self.sample_keys = self.sample_keys[keep]
+
+    def result(self) -> dict:
+        """
+        This function returns mse, rmse, r2, mae and the residual quantiles.
+        """
+        if self.n == 0:
+            raise ValueError("No predictions were added to the metrics accumulator")
+
+        mse = self.sse / self.n
+        metrics = {
+            "mse": mse,
+            "rmse": np.sqrt(mse),
+            "r2": 1.0 - self.sse / self.m2_true if self.m2_true > 0 else 0.0,
+            "mae": self.sae / self.n,
+        }
+        for quantile, value in zip(self.quantiles, np.quantile(self.sample, self.quantiles)):
+            metrics[f"residual_q{int(quantile * 100):02d}"] = value
+
+        return {name: float(value) for name, value in metrics.items()}
+
+class Regression_Metrics(ML_Evaluation):
+    """
+    Class defines the regression metrics (mse, rmse, r2, mae, residual quantiles) of ml model,
+    computed together from one residual array instead of one sklearn call per metric.
+    """
+    def metric_score(self, y_true: np.ndarray, y_pred: np.ndarray) -> dict:
+        try:
+            logger.info("Computing the regression metrics")
+            accumulator = Regression_Metrics_Accumulator(max_sample=len(y_true))
+            accumulator.update(y_true, y_pred)
+            metrics = accumulator.result()
+            logger.info(f"Regression metrics of model are {metrics}")
+            return metrics
+        except Exception as error:
+            logger.error(f"Error found in process of computing regression metrics {error}")
+            raise error
+
+
+class Chunked_Model_Evaluation:
+    """
+    Class evaluates an ml model over row blocks of the dataset.
+    Every block is converted to a float32 feature array (no copy of the full feature matrix is made),
+    predicted, and reduced into a Regression_Metrics_Accumulator, so memory stays bounded by the
+    block size whatever the size of the dataset.
+    """
+
+    def __init__(self, chunk_size: int = 100000, n_jobs: int = 1, dtype: type = np.float32):
+        """
+        Args:
+            chunk_size: Number of rows per block.
+            n_jobs: Number of threads predicting blocks concurrently.
+            dtype: dtype of the feature arrays passed to predict (trees predict in float32).
+        """
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+        self.dtype = dtype
+
+    def iter_blocks(self, model, dataset: pd.DataFrame, target: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        This function yields (features, target) arrays for consecutive row blocks of a dataset.
+        The features follow the column order the model was fitted with.
+        """
+        if hasattr(model, "feature_names_in_"):
+            feature_positions = dataset.columns.get_indexer(model.feature_names_in_)
+            if (feature_positions < 0).any():
+                missing = list(np.asarray(model.feature_names_in_)[feature_positions < 0])
+                raise ValueError(f"Features missing from the dataset: {missing}")
+        else:
+            feature_positions = np.flatnonzero(dataset.columns != target)
+        target_position = dataset.columns.get_loc(target)
+
+        for start in range(0, len(dataset), self.chunk_size):
+            block = dataset.iloc[start:start + self.chunk_size]
+            yield block.iloc[:, feature_positions].to_numpy(dtype=self.dtype), block.iloc[:, target_position].to_numpy()
+
+    def evaluate_chunks(self, model, blocks: Iterable[Tuple[np.ndarray, np.ndarray]]) -> dict:
+        """
+        This function returns the regression metrics of a model over (features, target) blocks.
+        Args:
+            model: The trained model, or its Compiled_Tree_Regressor (same predictions, see ml_model_compile).
+            blocks: Iterable of (features, target) arrays, e.g. from iter_blocks.
+        Returns:
+            mse, rmse, r2, mae and residual quantiles.
+        """
+        accumulator = Regression_Metrics_Accumulator()
+
+        # Feature arrays carry no column names; the column order is checked by iter_blocks
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+            if self.n_jobs <= 1:
+                for X, y in blocks:
+                    accumulator.update(y, model.predict(X))
+                return accumulator.result()
+
+            # At most 2 blocks per thread are in flight, so that blocks are not all materialized at once
+            with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+                pending = deque()
+                for X, y in blocks:
+                    pending.append((executor.submit(model.predict, X), y))
+                    if len(pending) >= 2 * self.n_jobs:
+                        future, y_block = pending.popleft()
+                        accumulator.update(y_block, future.result())
+                while pending:
+                    future, y_block = pending.popleft()
+                    accumulator.update(y_block, future.result())
+
+        return accumulator.result()
+
+    def evaluate(self, model, dataset: pd.DataFrame, target: str = "fare_amount") -> dict:
+        """
+        This function returns the regression metrics of a model on a dataset, block by block.
+        """
+        try:
+            logger.info(f"Evaluating model in blocks of {self.chunk_size} rows with {self.n_jobs} threads")
+            return self.evaluate_chunks(model, self.iter_blocks(model, dataset, target))
+        except Exception as error:
+            logger.error(f"Error found in process of chunked evaluation {error}")
+            raise error
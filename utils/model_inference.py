@@ -0,0 +1,140 @@
+import io
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import RegressorMixin
+from zenml.logger import get_logger
+
+from utils.data_handling import Category_Encoder
+from utils.schema import DROPOFF_COL
+from utils.sql import build_copy_predictions_sql, prediction_columns
+
+logger = get_logger(__name__)
+
+
+class Batch_Scorer:
+    """
+    Class that scores dataset chunks with a trained model and the encoder it was trained with.
+
+    The feature matrix of a chunk is built directly as a column-major float32 array in the column
+    order of the model (numeric columns copied, indicator columns compared against the category
+    codes), without building the one-hot encoded DataFrame first.
+    """
+
+    def __init__(self, model: RegressorMixin, encoder: Category_Encoder, dtype: type = np.float32):
+        """
+        Args:
+            model: The trained model (with feature_names_in_).
+            encoder: Encoder fitted on the training dataset of the model.
+            dtype: dtype of the feature arrays passed to predict (trees predict in float32).
+        """
+        self.model = model
+        self.encoder = encoder
+        self.dtype = dtype
+
+        feature_names = list(model.feature_names_in_)
+        indicator_positions = {name: position for position, name in enumerate(feature_names)}
+
+        # For every encoded column: positions in the feature matrix of its categories (-1 when unused by the model)
+        self._indicators = {
+            col: np.array([indicator_positions.get(f"{col}_{category}", -1)
+                           for category in encoder.vocabularies[col]], dtype=np.int64)
+            for col in encoder.cols
+        }
+        encoded = {f"{col}_{category}" for col in encoder.cols for category in encoder.vocabularies[col]}
+        self._numeric = [(position, name) for position, name in enumerate(feature_names) if name not in encoded]
+        self.n_features = len(feature_names)
+
+    def feature_matrix(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        This function returns the features of a chunk in the column order of the model.
+        """
+        # Column-major, so that every feature column is written contiguously (trees read any layout)
+        X = np.empty((len(chunk), self.n_features), dtype=self.dtype, order="F")
+
+        for position, name in self._numeric:
+            if name not in chunk.columns:
+                raise ValueError(f"Feature missing from the dataset: {name}")
+            X[:, position] = chunk[name].to_numpy(dtype=self.dtype)
+
+        for col, positions in self._indicators.items():
+            # Unknown or null values (code -1) match no category, so all their indicators are 0
+            codes = self.encoder.codes(chunk, col)
+            for code, position in enumerate(positions):
+                if position >= 0:
+                    X[:, position] = codes == code
+
+        return X
+
+    def predict(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        This function returns the predictions of a chunk.
+        """
+        # Feature arrays carry no column names; the column order is set by feature_matrix
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self.model.predict(self.feature_matrix(chunk))
+
+    def score_chunks(self, chunks: Iterable[pd.DataFrame], n_jobs: int = 1) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+        """
+        This function yields (chunk, predictions) for every chunk, in order.
+        Args:
+            chunks: Iterable of dataset chunks (e.g. Data_Load_from_DB_Stream.iter_chunks()).
+            n_jobs: Number of threads predicting chunks concurrently.
+        """
+        if n_jobs <= 1:
+            for chunk in chunks:
+                yield chunk, self.predict(chunk)
+            return
+
+        # At most 2 chunks per thread are in flight, so that memory stays bounded
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, executor.submit(self.predict, chunk)))
+                if len(pending) >= 2 * n_jobs:
+                    chunk_done, future = pending.popleft()
+                    yield chunk_done, future.result()
+            while pending:
+                chunk_done, future = pending.popleft()
+                yield chunk_done, future.result()
+
+
+def predictions_csv(chunk: pd.DataFrame, predictions: np.ndarray, model_version: str) -> io.IOBase:
+    """
+    This function returns the predictions of a chunk as a CSV buffer (without header) in the column order of
+    prediction_columns. The CSV is written by pyarrow when installed, else by pandas (about 10x slower).
+    """
+    columns = {
+        "lpep_dropoff_datetime": chunk[DROPOFF_COL].to_numpy().astype("datetime64[s]"),
+        "trip_distance": chunk["trip_distance"].to_numpy(dtype=np.float32),
+        "predicted_fare_amount": np.asarray(predictions, dtype=np.float32),
+        "model_version": np.full(len(chunk), model_version),
+    }
+
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        buffer = io.StringIO()
+        pd.DataFrame(columns, columns=prediction_columns).to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        return buffer
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.table(columns), buffer, pa_csv.WriteOptions(include_header=False))
+    buffer.seek(0)
+
+    return buffer
+
+
+def copy_predictions(conn, buffer: io.IOBase, table: str = "greentaxi_predictions") -> None:
+    """
+    This function bulk-loads a CSV buffer of predictions with COPY ... FROM STDIN.
+    """
+    with conn.cursor() as cursor:
+        cursor.copy_expert(build_copy_predictions_sql(table), buffer)
@@ -0,0 +1,225 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Version_Info(NamedTuple):
+    """
+    A model version with the metric it is compared on (None when it was not logged).
+    """
+    version: str
+    number: Optional[int]
+    metric: Optional[float]
+
+
+class Model_Registry_Template(ABC):
+    """
+    Abstract class that defines the model registry operations used by the promotion
+    """
+
+    @abstractmethod
+    def get_stage_version(self, model_name: str, stage: str, metric: str) -> Optional[Version_Info]:
+        """
+        This function returns the version at a stage, None when no version is at the stage.
+        """
+
+    @abstractmethod
+    def get_versions(self, model_name: str, versions: List[str], metric: str) -> List[Version_Info]:
+        """
+        This function returns the given versions (ids or numbers); the latest version when versions is empty.
+        """
+
+    @abstractmethod
+    def set_stages(self, model_name: str, stages: Dict[str, str]) -> None:
+        """
+        This function moves versions to stages ({version: stage}). A version moved to a stage replaces
+        the version that was at it.
+        """
+
+
+class ZenML_Model_Registry(Model_Registry_Template):
+    """
+    Class for the model versions of the ZenML model control plane.
+    ZenML has no batch update of model versions: set_stages makes one update_model_version call per
+    transition. With force=True the server also archives the version previously at the stage, so
+    no separate demotion call is needed.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            from zenml.client import Client
+
+            client = Client()
+        self.client = client
+
+    @staticmethod
+    def _info(model_version, metric: str) -> Version_Info:
+        value = model_version.run_metadata.get(metric)
+        return Version_Info(str(model_version.id), model_version.number,
+                            float(value.value) if value is not None else None)
+
+    def get_stage_version(self, model_name: str, stage: str, metric: str) -> Optional[Version_Info]:
+        try:
+            return self._info(self.client.get_model_version(model_name, stage), metric)
+        except KeyError:
+            return None
+
+    def get_versions(self, model_name: str, versions: List[str], metric: str) -> List[Version_Info]:
+        if not versions:
+            return [self._info(self.client.get_model_version(model_name), metric)]
+        return [self._info(self.client.get_model_version(model_name, version), metric) for version in versions]
+
+    def set_stages(self, model_name: str, stages: Dict[str, str]) -> None:
+        for version, stage in stages.items():
+            self.client.update_model_version(model_name_or_id=model_name, version_name_or_id=version,
+                                             stage=stage, force=True)
+
+
+class In_Memory_Model_Registry(Model_Registry_Template):
+    """
+    Class for an in-process model registry, a stand-in for the ZenML model control plane
+    that counts its calls (round_trips) so that the cost of a promotion can be checked locally.
+    Like ZenML_Model_Registry, set_stages costs one call per transition.
+    """
+
+    def __init__(self):
+        self.versions = {}
+        self.stages = {}
+        self.round_trips = 0
+
+    def add_version(self, model_name: str, version: str, metrics: dict) -> None:
+        """
+        This function registers a version with its run metadata (not counted as a round trip).
+        """
+        self.versions.setdefault(model_name, {})[version] = {"number": len(self.versions.get(model_name, {})) + 1,
+                                                             "metrics": dict(metrics)}
+
+    def _info(self, model_name: str, version: str, metric: str) -> Version_Info:
+        entry = self.versions[model_name][version]
+        return Version_Info(version, entry["number"], entry["metrics"].get(metric))
+
+    def get_stage_version(self, model_name: str, stage: str, metric: str) -> Optional[Version_Info]:
+        self.round_trips += 1
+        version = self.stages.get(model_name, {}).get(stage)
+        return self._info(model_name, version, metric) if version is not None else None
+
+    def get_versions(self, model_name: str, versions: List[str], metric: str) -> List[Version_Info]:
+        self.round_trips += 1
+        versions = versions or [list(self.versions[model_name])[-1]]
+        return [self._info(model_name, version, metric) for version in versions]
+
+    def set_stages(self, model_name: str, stages: Dict[str, str]) -> None:
+        self.round_trips += len(stages)
+        model_stages = self.stages.setdefault(model_name, {})
+        for version, stage in stages.items():
+            # A version is at one stage at a time
+            for current_stage, current_version in list(model_stages.items()):
+                if current_version == version:
+                    del model_stages[current_stage]
+            model_stages[stage] = version
+
+
+class Promotion_Result(NamedTuple):
+    promoted: bool
+    version: Optional[str]
+    metric: Optional[float]
+    stages: Dict[str, str]
+
+
+class Model_Promotion_Service:
+    """
+    Class that promotes the best of one or more candidate versions to a stage.
+
+    The version at the stage and its metric are fetched once and cached for ttl_seconds, so that
+    repeated promotions in a process do not read it every time. The cache only sees the writes of this
+    service, which drops the snapshot of every stage it writes to; a promotion made by another process
+    is seen once the snapshot expires (ttl_seconds=0 reads the stage every time). The winner goes straight
+    to the stage (replacing the current version) and the other candidates above the threshold go to
+    staging, with one registry call per transition and no separate demotion.
+    """
+
+    def __init__(self, registry: Model_Registry_Template, model_name: str = "reg_model",
+                 metric: str = "test_r2_score", threshold: float = 0.5, ttl_seconds: float = 60.0):
+        """
+        Args:
+            registry: The model registry.
+            model_name: Name of the model.
+            metric: Run metadata key compared between versions (higher is better).
+            threshold: Minimum metric of a version to be staged or promoted.
+            ttl_seconds: Time the version at the stage is cached (0: not cached).
+        """
+        self.registry = registry
+        self.model_name = model_name
+        self.metric = metric
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._snapshots = {}
+
+    def stage_version(self, stage: str = "production", refresh: bool = False) -> Optional[Version_Info]:
+        """
+        This function returns the version at a stage, from the cache when it is younger than ttl_seconds.
+        """
+        cached = self._snapshots.get(stage)
+        if not refresh and cached is not None and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+
+        snapshot = self.registry.get_stage_version(self.model_name, stage, self.metric)
+        self._snapshots[stage] = (time.monotonic(), snapshot)
+        return snapshot
+
+    def promote(self, candidates: Optional[Dict[str, Optional[float]]] = None, stage: str = "production") -> Promotion_Result:
+        """
+        This function compares candidate versions with the version at the stage and applies the stage transitions.
+        Args:
+            candidates: {version: metric}. Missing metrics (None) are read from the registry with one call,
+                and the latest version is the only candidate when candidates is empty.
+            stage: The stage to promote to.
+        Returns:
+            Whether a candidate was promoted, which one and its metric, and the transitions made.
+        """
+        candidates = dict(candidates or {})
+        if not candidates:
+            latest = self.registry.get_versions(self.model_name, [], self.metric)[0]
+            candidates[latest.version] = latest.metric
+
+        unknown = [version for version, value in candidates.items() if value is None]
+        if unknown:
+            for version, info in zip(unknown, self.registry.get_versions(self.model_name, unknown, self.metric)):
+                candidates[version] = info.metric
+
+        eligible = {version: value for version, value in candidates.items()
+                    if value is not None and value >= self.threshold}
+        if not eligible:
+            logger.info(f"No candidate reaches the {self.metric} threshold {self.threshold}, nothing is promoted")
+            return Promotion_Result(False, None, None, {})
+
+        best = max(eligible, key=eligible.get)
+        current = self.stage_version(stage)
+
+        stages = {version: "staging" for version in eligible if version != best}
+        if current is not None and current.version == best:
+            promoted = False
+        else:
+            promoted = current is None or current.metric is None or eligible[best] > current.metric
+            stages[best] = stage if promoted else "staging"
+
+        if stages:
+            try:
+                self.registry.set_stages(self.model_name, stages)
+            finally:
+                # Read again on next use, also when only some of the transitions were applied
+                for written_stage in set(stages.values()):
+                    self._snapshots.pop(written_stage, None)
+
+        if promoted:
+            logger.info(f"Version {best} ({self.metric}: {eligible[best]}) is promoted to {stage}"
+                        + (f", replacing version {current.version} ({current.metric})" if current else ""))
+        else:
+            logger.info(f"Version {best} ({self.metric}: {eligible[best]}) does not improve on "
+                        f"version {current.version} ({current.metric}) at {stage}")
+
+        return Promotion_Result(promoted, best, eligible[best], stages)
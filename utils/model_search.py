@@ -0,0 +1,147 @@
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import RegressorMixin
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from sklearn.tree import DecisionTreeRegressor
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Search space of DecisionTree_Regressor_Model
+default_param_grid = {
+    "max_depth": [6, 8, 10, 12, 16],
+    "max_features": ["sqrt", 0.5, None],
+    "min_samples_leaf": [1, 5, 20],
+    "criterion": ["squared_error"],
+}
+
+# Arrays opened by every worker process from the memory-mapped files
+_worker_arrays = {}
+
+
+def _init_worker(features_path: str, target_path: str, order_path: str) -> None:
+    _worker_arrays["X"] = np.load(features_path, mmap_mode="r")
+    _worker_arrays["y"] = np.load(target_path, mmap_mode="r")
+    _worker_arrays["order"] = np.load(order_path, mmap_mode="r")
+
+
+def _fit_candidate(params: dict, n_validation: int, n_resources: int, random_state: int) -> Tuple[float, float]:
+    """
+    This function fits one candidate on the first n_resources training rows and returns (validation r2, fit seconds).
+    """
+    X, y, order = _worker_arrays["X"], _worker_arrays["y"], _worker_arrays["order"]
+    validation_rows = order[:n_validation]
+    train_rows = order[n_validation:n_validation + n_resources]
+
+    started = time.perf_counter()
+    model = DecisionTreeRegressor(random_state=random_state, **params)
+    model.fit(X[train_rows], y[train_rows])
+    fit_seconds = time.perf_counter() - started
+
+    return r2_score(y[validation_rows], model.predict(X[validation_rows])), fit_seconds
+
+
+class Successive_Halving_Search:
+    """
+    Class that defines a parallel successive halving search over DecisionTreeRegressor parameters.
+
+    All candidates are first fitted on a small subsample of the training rows; only the best 1/eta
+    go on to the next rung, which uses eta times more rows, until the survivors are fitted on all
+    training rows. Candidates are fitted in a process pool; the training matrix is written once to
+    .npy files that every worker memory-maps, so it is never pickled to the workers.
+    """
+
+    def __init__(self, param_grid: dict = None, n_candidates: int = None, eta: int = 3,
+                 min_resources: int = 5000, validation_size: float = 0.2,
+                 n_jobs: int = -1, random_state: int = 12):
+        """
+        Args:
+            param_grid: Parameter grid (lists of values per parameter). Defaults to default_param_grid.
+            n_candidates: Number of candidates sampled at random from the grid. The whole grid when None.
+            eta: Fraction of candidates kept at every rung is 1/eta, and rows grow by eta.
+            min_resources: Minimum number of training rows at the first rung.
+            validation_size: Fraction of the rows held out to score the candidates.
+            n_jobs: Number of worker processes (-1 for all cores).
+            random_state: Seed of the sampling and of the trees.
+        """
+        self.param_grid = param_grid or default_param_grid
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.min_resources = min_resources
+        self.validation_size = validation_size
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self.random_state = random_state
+
+    def _candidates(self) -> list:
+        if self.n_candidates is None:
+            return list(ParameterGrid(self.param_grid))
+        return list(ParameterSampler(self.param_grid, n_iter=self.n_candidates, random_state=self.random_state))
+
+    def search(self, dataset: pd.DataFrame, target: str = "fare_amount") -> Tuple[RegressorMixin, pd.DataFrame]:
+        """
+        This function returns the best model, refitted on the whole dataset, and the leaderboard of the search.
+        Args:
+            dataset: The train dataset.
+            target: Name of target column in dataset.
+        Returns:
+            The best model and one leaderboard row per candidate and rung.
+        """
+        candidates = self._candidates()
+        features = dataset.drop(columns=[target])
+
+        n_rows = len(dataset)
+        n_validation = int(n_rows * self.validation_size)
+        n_train = n_rows - n_validation
+
+        n_rungs = max(1, math.ceil(math.log(len(candidates), self.eta)))
+        first_resources = max(min(self.min_resources, n_train), n_train // self.eta ** (n_rungs - 1))
+
+        logger.info(f"Successive halving over {len(candidates)} candidates, {n_rungs} rungs, "
+                    f"{first_resources} to {n_train} rows, {self.n_jobs} workers")
+
+        leaderboard = []
+        survivors = list(range(len(candidates)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{name}.npy") for name in ("X", "y", "order")]
+            np.save(paths[0], features.to_numpy(dtype=np.float32))
+            np.save(paths[1], dataset[target].to_numpy(dtype=np.float64))
+            np.save(paths[2], np.random.default_rng(self.random_state).permutation(n_rows))
+
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker, initargs=paths) as executor:
+                for rung in range(n_rungs):
+                    n_resources = n_train if rung == n_rungs - 1 else min(n_train, first_resources * self.eta ** rung)
+
+                    futures = [
+                        executor.submit(_fit_candidate, candidates[candidate], n_validation, n_resources, self.random_state)
+                        for candidate in survivors
+                    ]
+                    scores = {}
+                    for candidate, future in zip(survivors, futures):
+                        score, fit_seconds = future.result()
+                        scores[candidate] = score
+                        leaderboard.append({"candidate": candidate, "rung": rung, "n_samples": n_resources,
+                                            "val_r2": score, "fit_seconds": fit_seconds,
+                                            **{name: str(value) for name, value in candidates[candidate].items()}})
+
+                    ranked = sorted(survivors, key=lambda candidate: scores[candidate], reverse=True)
+                    logger.info(f"Rung {rung} ({n_resources} rows): best val r2 {scores[ranked[0]]:.4f}")
+                    survivors = ranked[:max(1, math.ceil(len(ranked) / self.eta))]
+
+        best_params = candidates[survivors[0]]
+        logger.info(f"Best parameters: {best_params}")
+
+        best_model = DecisionTreeRegressor(random_state=self.random_state, **best_params)
+        best_model.fit(features, dataset[target])
+
+        leaderboard = pd.DataFrame(leaderboard).sort_values(["rung", "val_r2"], ascending=[False, False])
+
+        return best_model, leaderboard.reset_index(drop=True)
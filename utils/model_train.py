@@ -1,10 +1,18 @@
 from typing_extensions import Annotated
+import copy
+import numpy as np
 import pandas as pd
-from sklearn.base import RegressorMixin
+from sklearn.base import BaseEstimator, RegressorMixin, TransformerMixin
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import StandardScaler
 from sklearn.tree import DecisionTreeRegressor
+from threadpoolctl import threadpool_limits
 from abc import ABC, abstractmethod
 from zenml.logger import get_logger
 from zenml import ArtifactConfig
+from typing import Callable, Optional, Tuple
 
 logger = get_logger(__name__)
 
@@ -20,11 +28,107 @@ class ML_Model_Template(ABC):
                        model_name: str) -> Annotated[RegressorMixin, ArtifactConfig(name="model", is_model_artifact=True)]:
         pass
 
+    def can_update(self, model: RegressorMixin) -> bool:
+        """
+        This function returns whether ml_model_update can continue training the given fitted model.
+        """
+        return False
+
+    def ml_model_update(self,
+                        model: RegressorMixin,
+                        dataset: pd.DataFrame,
+                        target: str = "fare_amount") -> RegressorMixin:
+        """
+        This function returns a copy of a fitted model trained further on new rows only.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental training")
+
+class Feature_Binner(TransformerMixin, BaseEstimator):
+    """
+    Class that maps every feature to at most max_bins quantile bins stored as uint8.
+    A fitted binner can be passed to several models trained on the same dataset, so that the
+    bin edges are computed once.
+    """
+
+    def __init__(self, max_bins: int = 255, subsample: int = 200000, random_state: int = 12):
+        """
+        Args:
+            max_bins: Number of bins per feature (at most 255, the last uint8 value is kept for missing values).
+            subsample: Number of rows used to compute the bin edges.
+            random_state: Seed of the subsample.
+        """
+        self.max_bins = max_bins
+        self.subsample = subsample
+        self.random_state = random_state
+
+    def fit(self, X, y=None) -> "Feature_Binner":
+        # Subsample before converting, so that only the sampled rows are copied to float64
+        if len(X) > self.subsample:
+            rows = np.sort(np.random.default_rng(self.random_state).choice(len(X), self.subsample, replace=False))
+            X = X.iloc[rows] if isinstance(X, pd.DataFrame) else X[rows]
+        X = np.asarray(X, dtype=np.float64)
+
+        quantiles = np.linspace(0, 1, self.max_bins + 1)[1:-1]
+        self.bin_edges_ = [np.unique(np.nanquantile(X[:, col], quantiles)) for col in range(X.shape[1])]
+
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        """
+        This function returns the bins of X.
+        """
+        # Columns are converted to float64 one at a time; the compact input frame is never copied whole
+        columns = X.items() if isinstance(X, pd.DataFrame) else enumerate(np.asarray(X).T)
+        binned = np.empty((len(X), len(self.bin_edges_)), dtype=np.uint8)
+        for col, (edges, (_, column)) in enumerate(zip(self.bin_edges_, columns)):
+            values = np.asarray(column, dtype=np.float64)
+            binned[:, col] = np.searchsorted(edges, values, side="right")
+            binned[np.isnan(values), col] = 255
+
+        return binned
+
+class Binned_Regressor(RegressorMixin, BaseEstimator):
+    """
+    Class that fits a regressor on the features binned by a Feature_Binner.
+    A binner that is already fitted is reused as is.
+    """
+
+    def __init__(self, estimator: RegressorMixin, binner: Feature_Binner = None):
+        self.estimator = estimator
+        self.binner = binner
+
+    def fit(self, X, y) -> "Binned_Regressor":
+        if isinstance(X, pd.DataFrame):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        if self.binner is None:
+            self.binner = Feature_Binner()
+        if not hasattr(self.binner, "bin_edges_"):
+            self.binner.fit(X)
+
+        self.estimator.fit(self.binner.transform(X), y)
+
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and hasattr(self, "feature_names_in_"):
+            X = X[self.feature_names_in_]
+        return self.estimator.predict(self.binner.transform(X))
+
 class DecisionTree_Regressor_Model(ML_Model_Template):
     """
     Class that defines the training process of linear regression model
     """
 
+    def __init__(self, n_threads: int = None):
+        """
+        Args:
+            n_threads: Kept for the common interface of ml_models; an exact-split tree trains on one core,
+                other values than 1 are ignored with a warning.
+        """
+        if n_threads not in (None, 1):
+            logger.warning(f"DecisionTreeRegressor trains on one core, n_threads={n_threads} is ignored")
+        self.n_threads = 1
+
     def ml_model_train(
         self,
         dataset: pd.DataFrame,
@@ -33,6 +137,7 @@ class DecisionTree_Regressor_Model(ML_Model_Template):
         max_features = "sqrt",
         max_depth = 10,
         criterion = "squared_error",
+        binner: Feature_Binner = None,
         random_state = 12,
     ) -> Annotated[
         RegressorMixin, ArtifactConfig(name="model", is_model_artifact=True)
@@ -44,6 +149,8 @@ class DecisionTree_Regressor_Model(ML_Model_Template):
             dataset_train: The train dataset.
             target: Name of target columns in dataset.
             name: The name of the model.
+            binner: Fitted Feature_Binner shared by the models trained on the dataset, to train on the binned
+                features (Binned_Regressor). The tree is trained on the raw features when None.
 
         Returns:
             The trained model artifact.
@@ -54,6 +161,8 @@ class DecisionTree_Regressor_Model(ML_Model_Template):
                                           max_depth = max_depth,
                                           criterion = criterion,
                                           random_state = random_state)
+            if binner is not None:
+                model = Binned_Regressor(estimator=model, binner=binner)
             model.fit(
                 dataset.drop(columns=[target]),
                 dataset[target],
@@ -61,4 +170,427 @@ class DecisionTree_Regressor_Model(ML_Model_Template):
             return model, model_name
         except Exception as error:
             logger.error(f"Error found in training process: {error}")
-            raise error
\ No newline at end of file
+            raise error
+
+class HistGradientBoosting_Regressor_Model(ML_Model_Template):
+    """
+    Class that defines the training process of histogram-based gradient boosting model.
+    The model bins the features itself (at most 255 bins), so it is trained on the raw features.
+    Training uses OpenMP threads, limited to n_threads when given.
+    """
+
+    def __init__(self, n_threads: int = None):
+        """
+        Args:
+            n_threads: Number of OpenMP threads used by training. All cores when None.
+        """
+        self.n_threads = n_threads
+
+    def ml_model_train(
+        self,
+        dataset: pd.DataFrame,
+        target: str = "fare_amount",
+        model_name: str = "hist_gradient_boosting_reg",
+        max_iter = 200,
+        learning_rate = 0.1,
+        max_leaf_nodes = 31,
+        min_samples_leaf = 20,
+        random_state = 12,
+    ) -> Annotated[
+        RegressorMixin, ArtifactConfig(name="model", is_model_artifact=True)
+    ]:
+        """
+        This process trains data and return the ML model
+
+        Args:
+            dataset_train: The train dataset.
+            target: Name of target columns in dataset.
+            name: The name of the model.
+
+        Returns:
+            The trained model artifact.
+        """
+
+        try:
+            model = HistGradientBoostingRegressor(max_iter = max_iter,
+                                                  learning_rate = learning_rate,
+                                                  max_leaf_nodes = max_leaf_nodes,
+                                                  min_samples_leaf = min_samples_leaf,
+                                                  random_state = random_state)
+            with threadpool_limits(limits=self.n_threads, user_api="openmp"):
+                model.fit(
+                    dataset.drop(columns=[target]),
+                    dataset[target],
+                )
+            return model, model_name
+        except Exception as error:
+            logger.error(f"Error found in training process: {error}")
+            raise error
+
+    def can_update(self, model: RegressorMixin) -> bool:
+        return isinstance(model, HistGradientBoostingRegressor)
+
+    def ml_model_update(self,
+                        model: RegressorMixin,
+                        dataset: pd.DataFrame,
+                        target: str = "fare_amount",
+                        max_iter = 50) -> RegressorMixin:
+        """
+        This process continues the boosting of a fitted model on new rows: max_iter more trees are fitted
+        on the residuals of the current trees on the new rows (warm_start), with the bins of the first fit.
+
+        Args:
+            model: The fitted model (not modified).
+            dataset: The new rows.
+            target: Name of target columns in dataset.
+            max_iter: Number of boosting iterations added.
+
+        Returns:
+            The updated copy of the model.
+        """
+        try:
+            model = copy.deepcopy(model)
+            model.set_params(warm_start=True, max_iter=model.n_iter_ + max_iter)
+            with threadpool_limits(limits=self.n_threads, user_api="openmp"):
+                model.fit(
+                    dataset.drop(columns=[target]),
+                    dataset[target],
+                )
+            model.set_params(warm_start=False)
+            return model
+        except Exception as error:
+            logger.error(f"Error found in updating the model: {error}")
+            raise error
+
+class RandomForest_Regressor_Model(ML_Model_Template):
+    """
+    Class that defines the training process of random forest model.
+    The trees are fitted in parallel on n_threads cores, on the raw features or, when a fitted
+    Feature_Binner is given, on the binned features (see benchmarks.bench_models for the r2 difference).
+    """
+
+    def __init__(self, n_threads: int = -1):
+        """
+        Args:
+            n_threads: Number of cores used to fit the trees (-1 for all cores).
+        """
+        self.n_threads = n_threads
+
+    def ml_model_train(
+        self,
+        dataset: pd.DataFrame,
+        target: str = "fare_amount",
+        model_name: str = "random_forest_reg",
+        n_estimators = 100,
+        max_features = "sqrt",
+        max_depth = 16,
+        min_samples_leaf = 5,
+        binner: Feature_Binner = None,
+        random_state = 12,
+    ) -> Annotated[
+        RegressorMixin, ArtifactConfig(name="model", is_model_artifact=True)
+    ]:
+        """
+        This process trains data and return the ML model
+
+        Args:
+            dataset_train: The train dataset.
+            target: Name of target columns in dataset.
+            name: The name of the model.
+            binner: Fitted Feature_Binner shared by the models trained on the dataset, to train on the binned
+                features (Binned_Regressor). The forest is trained on the raw features when None.
+
+        Returns:
+            The trained model artifact.
+        """
+
+        try:
+            model = RandomForestRegressor(n_estimators = n_estimators,
+                                          max_features = max_features,
+                                          max_depth = max_depth,
+                                          min_samples_leaf = min_samples_leaf,
+                                          n_jobs = self.n_threads,
+                                          random_state = random_state)
+            if binner is not None:
+                model = Binned_Regressor(estimator=model, binner=binner)
+            model.fit(
+                dataset.drop(columns=[target]),
+                dataset[target],
+            )
+            return model, model_name
+        except Exception as error:
+            logger.error(f"Error found in training process: {error}")
+            raise error
+
+    def can_update(self, model: RegressorMixin) -> bool:
+        forest = model.estimator if isinstance(model, Binned_Regressor) else model
+        return isinstance(forest, RandomForestRegressor)
+
+    def ml_model_update(self,
+                        model: RegressorMixin,
+                        dataset: pd.DataFrame,
+                        target: str = "fare_amount",
+                        n_estimators = 20,
+                        max_estimators = 200) -> RegressorMixin:
+        """
+        This process adds n_estimators trees fitted on the new rows to a fitted forest (warm_start).
+        The oldest trees are dropped beyond max_estimators, so the forest follows a sliding window.
+        A forest trained on binned features keeps the bin edges of its first fit.
+
+        Args:
+            model: The fitted model (not modified).
+            dataset: The new rows.
+            target: Name of target columns in dataset.
+            n_estimators: Number of trees added.
+            max_estimators: Maximum number of trees of the forest (None for no limit).
+
+        Returns:
+            The updated copy of the model.
+        """
+        try:
+            model = copy.deepcopy(model)
+            forest = model.estimator if isinstance(model, Binned_Regressor) else model
+            if max_estimators is not None:
+                n_kept = max(max_estimators - n_estimators, 0)
+                forest.estimators_ = forest.estimators_[max(len(forest.estimators_) - n_kept, 0):]
+            forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + n_estimators,
+                              n_jobs=self.n_threads)
+            model.fit(
+                dataset.drop(columns=[target]),
+                dataset[target],
+            )
+            forest.set_params(warm_start=False)
+            return model
+        except Exception as error:
+            logger.error(f"Error found in updating the model: {error}")
+            raise error
+
+class Scaled_SGD_Regressor(RegressorMixin, BaseEstimator):
+    """
+    Class for a linear model trained by stochastic gradient descent on standardized features.
+    The scaler statistics and the coefficients are both updated by partial_fit, so the model
+    is trained one batch of rows at a time. Missing values are replaced by the running mean.
+    """
+
+    def __init__(self, estimator: SGDRegressor = None):
+        self.estimator = estimator
+
+    def partial_fit(self, X, y) -> "Scaled_SGD_Regressor":
+        if isinstance(X, pd.DataFrame) and not hasattr(self, "feature_names_in_"):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        if self.estimator is None:
+            self.estimator = SGDRegressor()
+        if not hasattr(self, "scaler_"):
+            self.scaler_ = StandardScaler()
+
+        X = np.asarray(X, dtype=np.float64)
+        self.scaler_.partial_fit(X)
+        self.estimator.partial_fit(self._scale(X), np.asarray(y, dtype=np.float64))
+
+        return self
+
+    def _scale(self, X: np.ndarray) -> np.ndarray:
+        scaled = self.scaler_.transform(X)
+        # NaN after scaling is a missing value, set to the mean
+        scaled[np.isnan(scaled)] = 0
+        return scaled
+
+    def predict(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame) and hasattr(self, "feature_names_in_"):
+            X = X[self.feature_names_in_]
+        return self.estimator.predict(self._scale(np.asarray(X, dtype=np.float64)))
+
+class SGD_Regressor_Model(ML_Model_Template):
+    """
+    Class that defines the training process of a linear model trained by stochastic gradient descent.
+    Rows are fed in batches of batch_size, so memory is bounded by a batch and an update on new
+    rows costs the same per row as the full training.
+    """
+
+    def __init__(self, n_threads: int = None):
+        """
+        Args:
+            n_threads: Kept for the common interface of ml_models; SGD trains on one core, other values
+                than 1 are ignored with a warning.
+        """
+        if n_threads not in (None, 1):
+            logger.warning(f"SGDRegressor trains on one core, n_threads={n_threads} is ignored")
+        self.n_threads = 1
+
+    @staticmethod
+    def _fit_epochs(model: Scaled_SGD_Regressor, dataset: pd.DataFrame, target: str,
+                    n_epochs: int, batch_size: int, random_state: int) -> None:
+        rng = np.random.default_rng(random_state)
+        features = dataset.drop(columns=[target])
+        for _ in range(n_epochs):
+            order = rng.permutation(len(dataset))
+            for start in range(0, len(order), batch_size):
+                rows = np.sort(order[start:start + batch_size])
+                model.partial_fit(features.iloc[rows], dataset[target].iloc[rows])
+
+    def ml_model_train(
+        self,
+        dataset: pd.DataFrame,
+        target: str = "fare_amount",
+        model_name: str = "sgd_reg",
+        alpha = 1e-4,
+        n_epochs = 5,
+        batch_size = 10000,
+        random_state = 12,
+    ) -> Annotated[
+        RegressorMixin, ArtifactConfig(name="model", is_model_artifact=True)
+    ]:
+        """
+        This process trains data and return the ML model
+
+        Args:
+            dataset_train: The train dataset.
+            target: Name of target columns in dataset.
+            name: The name of the model.
+            n_epochs: Number of passes over the dataset.
+            batch_size: Number of rows per partial_fit call.
+
+        Returns:
+            The trained model artifact.
+        """
+
+        try:
+            model = Scaled_SGD_Regressor(SGDRegressor(alpha = alpha, random_state = random_state))
+            self._fit_epochs(model, dataset, target, n_epochs, batch_size, random_state)
+            return model, model_name
+        except Exception as error:
+            logger.error(f"Error found in training process: {error}")
+            raise error
+
+    def can_update(self, model: RegressorMixin) -> bool:
+        return isinstance(model, Scaled_SGD_Regressor)
+
+    def ml_model_update(self,
+                        model: RegressorMixin,
+                        dataset: pd.DataFrame,
+                        target: str = "fare_amount",
+                        n_epochs = 1,
+                        batch_size = 10000,
+                        random_state = 12) -> RegressorMixin:
+        """
+        This process continues the gradient descent of a fitted model on the new rows (partial_fit).
+
+        Args:
+            model: The fitted model (not modified).
+            dataset: The new rows.
+            target: Name of target columns in dataset.
+            n_epochs: Number of passes over the new rows.
+            batch_size: Number of rows per partial_fit call.
+
+        Returns:
+            The updated copy of the model.
+        """
+        try:
+            model = copy.deepcopy(model)
+            self._fit_epochs(model, dataset, target, n_epochs, batch_size, random_state)
+            return model
+        except Exception as error:
+            logger.error(f"Error found in updating the model: {error}")
+            raise error
+
+# Models selectable by ML_Model_Name_Config.ml_model
+ml_models = {
+    "DecisionTreeRegressor": DecisionTree_Regressor_Model,
+    "HistGradientBoostingRegressor": HistGradientBoosting_Regressor_Model,
+    "RandomForestRegressor": RandomForest_Regressor_Model,
+    "SGDRegressor": SGD_Regressor_Model,
+}
+
+def get_ml_model(name: str, n_threads: int = None) -> ML_Model_Template:
+    """
+    This function returns the model template registered under name.
+    Args:
+        name: Key of ml_models.
+        n_threads: Threads/cores used by training, for the models that train in parallel.
+    """
+    if name not in ml_models:
+        raise ValueError(f"Unknown ML model: {name}. Available models: {list(ml_models)}")
+
+    if n_threads is None:
+        return ml_models[name]()
+    return ml_models[name](n_threads=n_threads)
+
+class Incremental_Trainer:
+    """
+    Class that trains a model from a previous model and new rows.
+
+    When the model template can continue training the previous model (ml_model_update), only the
+    new rows are used, so the cost scales with the new data instead of the full history. The model
+    is retrained from scratch on the given rows instead when there is no previous model, when the
+    previous model has other features (the encoder vocabularies changed), or when drift is detected:
+    the r2 score of the previous model on the new rows is more than max_r2_drop below its recorded
+    score (or below min_r2 when no score was recorded).
+    """
+
+    def __init__(self, ml_model: ML_Model_Template, max_r2_drop: float = 0.05, min_r2: float = 0.5):
+        """
+        Args:
+            ml_model: The model template (from get_ml_model).
+            max_r2_drop: Drop of the r2 score on the new rows above which the model is retrained.
+            min_r2: r2 score on the new rows below which the model is retrained, when the previous score is unknown.
+        """
+        self.ml_model = ml_model
+        self.max_r2_drop = max_r2_drop
+        self.min_r2 = min_r2
+
+    def retrain_reason(self, previous_model: Optional[RegressorMixin], dataset: pd.DataFrame,
+                       target: str = "fare_amount", previous_r2: Optional[float] = None) -> Optional[str]:
+        """
+        This function returns why the previous model cannot be updated with the new rows, None when it can.
+        """
+        if previous_model is None:
+            return "no previous model"
+        if not self.ml_model.can_update(previous_model):
+            return f"{type(self.ml_model).__name__} cannot update a {type(previous_model).__name__}"
+
+        features = [col for col in dataset.columns if col != target]
+        if sorted(features) != sorted(previous_model.feature_names_in_):
+            return "the features differ from the previous model"
+
+        r2 = r2_score(dataset[target], previous_model.predict(dataset[features]))
+        threshold = previous_r2 - self.max_r2_drop if previous_r2 is not None else self.min_r2
+        logger.info(f"r2 score of the previous model on the new rows: {r2:.4f} (threshold {threshold:.4f})")
+        if r2 < threshold:
+            return f"drift detected (r2 score {r2:.4f} below {threshold:.4f})"
+
+        return None
+
+    def train(self, dataset: pd.DataFrame, previous_model: Optional[RegressorMixin] = None,
+              previous_r2: Optional[float] = None, target: str = "fare_amount",
+              train_params: dict = None, update_params: dict = None,
+              history: Optional[Callable[[], pd.DataFrame]] = None) -> Tuple[RegressorMixin, str]:
+        """
+        This function returns (model, training mode), the mode being "update" or "full".
+        Args:
+            dataset: The new rows (preprocessed).
+            previous_model: The model to update, e.g. the production model. None for a full training.
+            previous_r2: The recorded r2 score of the previous model.
+            target: Name of target columns in dataset.
+            train_params: Keyword arguments of ml_model_train.
+            update_params: Keyword arguments of ml_model_update.
+            history: Function returning the earlier rows of the training window (preprocessed like dataset),
+                called only for a full training, which then uses the earlier rows and the new rows.
+        """
+        reason = self.retrain_reason(previous_model, dataset, target=target, previous_r2=previous_r2)
+
+        if reason is None:
+            logger.info(f"Updating the previous model with {len(dataset)} new rows")
+            # Same column order as the previous model
+            dataset = dataset[list(previous_model.feature_names_in_) + [target]]
+            return self.ml_model.ml_model_update(previous_model, dataset, target=target, **(update_params or {})), "update"
+
+        if history is not None:
+            earlier = history()
+            if len(earlier):
+                logger.info(f"Loaded {len(earlier)} earlier rows for the full training")
+                # Same columns as the new rows, the earlier rows being encoded with the same encoder
+                dataset = pd.concat([earlier[list(dataset.columns)], dataset], ignore_index=True)
+
+        logger.info(f"Full training on {len(dataset)} rows: {reason}")
+        model, _ = self.ml_model.ml_model_train(dataset, target=target, **(train_params or {}))
+        return model, "full"
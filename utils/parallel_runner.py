@@ -0,0 +1,283 @@
+import importlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from zenml.logger import get_logger
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+
+class Task(NamedTuple):
+    """
+    A step of a parallel run.
+
+    target is "module:attribute" (a ZenML step runs its entrypoint), so that workers import it
+    instead of receiving a pickled function. inputs maps the arguments of the target to outputs of
+    other tasks ("task.output"); params are passed as they are. threads is the number of cores the
+    step may use (BLAS/OpenMP pools are limited to it, and the scheduler never runs more threads
+    than cpu_budget at once), memory_mb caps the data segment of its worker while it runs.
+    """
+    name: str
+    target: str
+    inputs: Dict[str, str] = {}
+    params: dict = {}
+    outputs: Tuple[str, ...] = ("output",)
+    threads: int = 1
+    memory_mb: Optional[int] = None
+
+
+def _resolve(target: str):
+    module_name, _, attribute = target.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in attribute.split("."):
+        obj = getattr(obj, name)
+    # ZenML steps are called through their entrypoint, outside a pipeline run
+    return getattr(obj, "entrypoint", obj)
+
+
+def write_handoff(value, path_stem: str) -> Tuple[str, int]:
+    """
+    This function writes an output for the next tasks and returns (path, bytes): DataFrames as Arrow IPC and
+    arrays as .npy (both read back memory-mapped), other values with joblib.
+    """
+    if isinstance(value, pd.DataFrame):
+        from utils.arrow_io import write_dataframe_ipc
+
+        path = f"{path_stem}.arrow"
+        return path, write_dataframe_ipc(value, path)
+    if isinstance(value, np.ndarray) and value.dtype.kind != "O":
+        path = f"{path_stem}.npy"
+        np.save(path, value)
+        return path, os.path.getsize(path)
+
+    import joblib
+
+    path = f"{path_stem}.joblib"
+    joblib.dump(value, path)
+    return path, os.path.getsize(path)
+
+
+def read_handoff(path: str):
+    """
+    This function reads an output written by write_handoff.
+    """
+    if path.endswith(".arrow"):
+        from utils.arrow_io import read_dataframe_ipc
+
+        return read_dataframe_ipc(path)
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+
+    import joblib
+
+    return joblib.load(path)
+
+
+def _preload(modules: Tuple[str, ...]) -> None:
+    # Imported once per worker when the pool starts, instead of by the first task of each worker
+    for module_name in modules:
+        importlib.import_module(module_name)
+
+
+def _run_task(task: Task, input_paths: Dict[str, str], run_dir: str) -> dict:
+    """
+    This function runs a task in a worker process: reads its inputs, calls its target within its resource
+    budget and writes its outputs. It returns the output paths with the timings of the trace.
+    """
+    started = time.time()
+    kwargs = {argument: read_handoff(path) for argument, path in input_paths.items()}
+    read_seconds = time.time() - started
+
+    previous_limit = None
+    if task.memory_mb is not None and resource is not None:
+        previous_limit = resource.getrlimit(resource.RLIMIT_DATA)
+        resource.setrlimit(resource.RLIMIT_DATA, (task.memory_mb * 1024 * 1024, previous_limit[1]))
+
+    from threadpoolctl import threadpool_limits
+
+    run_started = time.time()
+    try:
+        with threadpool_limits(limits=task.threads):
+            result = _resolve(task.target)(**kwargs, **task.params)
+    finally:
+        if previous_limit is not None:
+            resource.setrlimit(resource.RLIMIT_DATA, previous_limit)
+    run_seconds = time.time() - run_started
+
+    results = result if len(task.outputs) > 1 else (result,)
+    if len(results) != len(task.outputs):
+        raise ValueError(f"Task {task.name} returned {len(results)} values for the outputs {task.outputs}")
+
+    write_started = time.time()
+    task_dir = Path(run_dir) / task.name
+    task_dir.mkdir(parents=True, exist_ok=True)
+    outputs, output_bytes = {}, 0
+    for output, value in zip(task.outputs, results):
+        path, size = write_handoff(value, str(task_dir / output))
+        outputs[f"{task.name}.{output}"] = path
+        output_bytes += size
+
+    return {"outputs": outputs, "pid": os.getpid(), "started": started, "read_seconds": read_seconds,
+            "run_seconds": run_seconds, "write_seconds": time.time() - write_started,
+            "ended": time.time(), "output_bytes": output_bytes}
+
+
+class Parallel_Runner:
+    """
+    Class that runs a DAG of tasks on a local process pool.
+
+    A task is submitted as soon as the tasks it reads from are done and its threads fit in the cores
+    left free by the running tasks, so independent branches (e.g. the preprocessing of the training and
+    test datasets) run at the same time and the wall time approaches the critical path of the DAG.
+    Ready tasks are submitted in the order they were declared and their outputs are stored under fixed
+    names (<run_dir>/<task>/<output>), so a run produces the same artifacts whatever the completion order.
+    Outputs are handed between processes as files (Arrow IPC and .npy memory-mapped by the readers).
+    The pool has at most cpu_budget workers (more could not run at the same time), which import the
+    preload modules when they start, so that the first task of each worker does not pay for them.
+    Every run writes a Chrome trace (<run_dir>/trace.json, for chrome://tracing or Perfetto) of the
+    tasks per worker, with their input read, compute and output write times.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, cpu_budget: Optional[int] = None,
+                 run_dir: Optional[str] = None, preload: Tuple[str, ...] = ()):
+        """
+        Args:
+            max_workers: Number of worker processes. The number of cores when None.
+            cpu_budget: Number of threads the running tasks may use together. The number of cores when None.
+            run_dir: Directory of the handed-off outputs and of the trace. .parallel_runs/<timestamp> when None.
+            preload: Modules imported by every worker when it starts (e.g. the model library).
+        """
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        self.max_workers = min(max_workers or os.cpu_count() or 1, self.cpu_budget)
+        self.preload = tuple(preload)
+        self.run_dir = Path(run_dir or os.path.join(".parallel_runs", time.strftime("%Y%m%d-%H%M%S")))
+
+    @staticmethod
+    def _check(tasks: List[Task]) -> None:
+        names = [task.name for task in tasks]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Task names are not unique: {names}")
+
+        declared = set()
+        for task in tasks:
+            for argument, source in task.inputs.items():
+                if source not in declared:
+                    raise ValueError(f"Input {argument}={source} of task {task.name} is not an output of an "
+                                     f"earlier task (tasks are declared in a topological order)")
+            declared.update(f"{task.name}.{output}" for output in task.outputs)
+
+    @staticmethod
+    def critical_path(tasks: List[Task], seconds: Dict[str, float]) -> Tuple[float, List[str]]:
+        """
+        This function returns the length and the tasks of the longest chain of dependent tasks.
+        """
+        finish, previous = {}, {}
+        producers = {f"{task.name}.{output}": task.name for task in tasks for output in task.outputs}
+        for task in tasks:
+            upstream = {producers[source] for source in task.inputs.values()}
+            before = max(upstream, key=lambda name: finish[name], default=None)
+            finish[task.name] = (finish[before] if before else 0.0) + seconds.get(task.name, 0.0)
+            previous[task.name] = before
+
+        last = max(finish, key=finish.get, default=None)
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        return (finish[path[0]] if path else 0.0), path[::-1]
+
+    def _write_trace(self, records: Dict[str, dict], origin: float) -> Path:
+        """
+        This function writes the Chrome trace of a run: one row per worker process, one event per task phase.
+        """
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}}
+                  for pid in sorted({record["pid"] for record in records.values()})]
+        for name, record in records.items():
+            phases = (("read", record["started"], record["read_seconds"]),
+                      (name, record["started"] + record["read_seconds"], record["run_seconds"]),
+                      ("write", record["ended"] - record["write_seconds"], record["write_seconds"]))
+            for phase, start, seconds in phases:
+                events.append({"name": phase, "cat": name, "ph": "X", "pid": record["pid"], "tid": 0,
+                               "ts": (start - origin) * 1e6, "dur": seconds * 1e6,
+                               "args": {"task": name, "output_bytes": record["output_bytes"],
+                                        "queued_seconds": record["queued_seconds"]}})
+
+        trace_path = self.run_dir / "trace.json"
+        with open(trace_path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        return trace_path
+
+    def run(self, tasks: List[Task]) -> Dict[str, str]:
+        """
+        This function runs the tasks and returns {"task.output": path} of all outputs, in task order
+        (read them with read_handoff). The run stops at the first failing task.
+        """
+        self._check(tasks)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Running {len(tasks)} tasks on {self.max_workers} workers ({self.cpu_budget} cores) in {self.run_dir}")
+
+        outputs, records = {}, {}
+        waiting = list(tasks)
+        running = {}
+        origin = time.time()
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_preload,
+                                 initargs=(self.preload,)) as executor:
+            while waiting or running:
+                free_cpus = self.cpu_budget - sum(task.threads for task, _ in running.values())
+                for task in list(waiting):
+                    if len(running) >= self.max_workers:
+                        break
+                    if not all(source in outputs for source in task.inputs.values()):
+                        continue
+                    # A task wider than the budget still runs, alone
+                    if task.threads > free_cpus and running:
+                        continue
+                    input_paths = {argument: outputs[source] for argument, source in task.inputs.items()}
+                    future = executor.submit(_run_task, task, input_paths, str(self.run_dir))
+                    running[future] = (task, time.time())
+                    free_cpus -= task.threads
+                    waiting.remove(task)
+
+                if not running:
+                    raise RuntimeError(f"Tasks {[task.name for task in waiting]} can never run")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                # Handled in declaration order, so that the log does not depend on the completion order
+                for future in sorted(done, key=lambda future: tasks.index(running[future][0])):
+                    task, submitted = running.pop(future)
+                    try:
+                        record = future.result()
+                    except Exception as error:
+                        logger.error(f"Task {task.name} failed: {error}")
+                        for other in running:
+                            other.cancel()
+                        raise error
+                    record["queued_seconds"] = record["started"] - submitted
+                    records[task.name] = record
+                    outputs.update(record["outputs"])
+                    logger.info(f"Task {task.name} done in {record['run_seconds']:.2f}s "
+                                f"(read {record['read_seconds']:.2f}s, write {record['write_seconds']:.2f}s)")
+
+        wall_seconds = time.time() - origin
+        task_seconds = {name: record["ended"] - record["started"] for name, record in records.items()}
+        path_seconds, path = self.critical_path(tasks, task_seconds)
+        trace_path = self._write_trace(records, origin)
+        logger.info(f"Run done in {wall_seconds:.2f}s: sum of the tasks {sum(task_seconds.values()):.2f}s, "
+                    f"critical path {path_seconds:.2f}s ({' -> '.join(path)}), trace: {trace_path}")
+
+        self.summary = {"wall_seconds": wall_seconds, "task_seconds": task_seconds,
+                        "critical_path_seconds": path_seconds, "critical_path": path, "trace": str(trace_path)}
+
+        return {f"{task.name}.{output}": outputs[f"{task.name}.{output}"] for task in tasks for output in task.outputs}
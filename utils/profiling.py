@@ -0,0 +1,301 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from zenml.logger import get_logger
+from utils.file_lock import file_lock, write_json_atomic
+
+try:
+    import resource
+except ImportError:  # resource is not available on Windows
+    resource = None
+
+logger = get_logger(__name__)
+
+# Opt-in switches of profile_step
+PROFILING_ENV = "STEP_PROFILING"
+CPROFILE_ENV = "STEP_PROFILING_CPROFILE"
+PROFILE_DIR_ENV = "STEP_PROFILE_DIR"
+
+
+def peak_rss_mb() -> float:
+    """
+    This function returns the peak resident set size (RSS) of the current process in MB.
+    """
+    if resource is None:
+        return float("nan")
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb() -> float:
+    """
+    This function returns the current resident set size (RSS) of the current process in MB.
+    """
+    try:
+        # Linux: resident pages are the second field of statm
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return float("nan")
+
+
+class Peak_RSS_Sampler:
+    """
+    Context manager sampling the RSS of the process every interval seconds in a background thread,
+    so that the peak of a step is measured within the step. The peak of the process (ru_maxrss)
+    cannot be used for that: it only grows, so every step after the largest one reports no increase.
+    Allocations shorter than the interval may be missed.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = float("nan")
+        self.peak_mb = float("nan")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self) -> "Peak_RSS_Sampler":
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, name="peak-rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    @property
+    def increase_mb(self) -> float:
+        return self.peak_mb - self.start_mb
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+def _rows(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_rows(item) for item in value)
+    return 0
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+def _step_context():
+    """
+    This function returns (pipeline run name, step run name) when called inside a ZenML step, else (None, None).
+    """
+    try:
+        from zenml import get_step_context
+
+        context = get_step_context()
+        return context.pipeline_run.name, context.step_run.name
+    except Exception:
+        return None, None
+
+
+def _profile_path(run_name: str) -> Path:
+    return Path(os.getenv(PROFILE_DIR_ENV, ".profiles")) / f"{run_name}.json"
+
+
+def _publish(step_name: str, run_name: str, record: dict) -> None:
+    """
+    This function publishes a step record as ZenML step metadata, MLflow metrics and in the JSON profile of the run.
+    """
+    try:
+        from zenml import log_step_metadata
+
+        log_step_metadata(metadata={"profile": {k: v for k, v in record.items() if k != "cprofile"}})
+    except Exception as error:
+        logger.debug(f"Step profile not logged as ZenML metadata: {error}")
+
+    try:
+        import mlflow
+
+        if mlflow.active_run() is not None:
+            mlflow.log_metrics({f"{step_name} {name}": value for name, value in record.items()
+                                if isinstance(value, (int, float))})
+    except Exception as error:
+        logger.debug(f"Step profile not logged to MLflow: {error}")
+
+    profile_path = _profile_path(run_name)
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Steps of a parallel run (utils.parallel_runner) add their records at the same time: the file is
+    # changed under a lock and replaced atomically, so that no record is lost and no reader sees half a file
+    with file_lock(profile_path):
+        profile = {"run": run_name, "steps": {}}
+        if profile_path.exists():
+            with open(profile_path) as profile_file:
+                profile = json.load(profile_file)
+        profile["steps"][step_name] = record
+        write_json_atomic(profile_path, profile, indent=2)
+
+
+def record_written_bytes(nbytes: int) -> None:
+    """
+    This function adds the bytes written by a materializer to the record of the running step in the JSON profile
+    of the run (output_bytes_written). Materializers save the outputs after the step function returns, so
+    profile_step cannot measure them; nothing is recorded for a step that profile_step did not record.
+    Args:
+        nbytes: Size of the files written for one output.
+    """
+    run_name, step_name = _step_context()
+    if step_name is None:
+        return
+
+    profile_path = _profile_path(run_name)
+    if not profile_path.exists():
+        return
+
+    try:
+        with file_lock(profile_path):
+            with open(profile_path) as profile_file:
+                profile = json.load(profile_file)
+            record = profile["steps"].get(step_name)
+            if record is None:
+                return
+            record["output_bytes_written"] = record.get("output_bytes_written", 0) + int(nbytes)
+            write_json_atomic(profile_path, profile, indent=2)
+    except Exception as error:
+        # The artifact is stored either way
+        logger.debug(f"Written bytes of the step not recorded: {error}")
+
+
+def profile_step(func=None, *, enabled: bool = None, with_cprofile: bool = None):
+    """
+    Decorator recording the wall time, CPU time, peak RSS during the step (sampled, see Peak_RSS_Sampler), rows in/out,
+    in-memory size of the outputs and optionally the cProfile hot spots of a step function. Place it between @step
+    and the function. The bytes of the stored outputs are added by the materializers of this repository
+    (record_written_bytes), after the step function returns.
+
+    Profiling is off unless enabled=True or the STEP_PROFILING environment variable is set;
+    cProfile stats are added with with_cprofile=True or STEP_PROFILING_CPROFILE.
+    Records go to the ZenML step metadata, to MLflow when a run is active, and to
+    <STEP_PROFILE_DIR or .profiles>/<pipeline run>.json, which compare_profiles reads.
+    """
+    def decorator(step_func):
+        @functools.wraps(step_func)
+        def wrapper(*args, **kwargs):
+            if not (enabled if enabled is not None else _env_flag(PROFILING_ENV)):
+                return step_func(*args, **kwargs)
+
+            use_cprofile = with_cprofile if with_cprofile is not None else _env_flag(CPROFILE_ENV)
+            profiler = cProfile.Profile() if use_cprofile else None
+
+            wall_started = time.perf_counter()
+            cpu_started = time.process_time()
+
+            with Peak_RSS_Sampler() as rss:
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    result = step_func(*args, **kwargs)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+
+            record = {
+                "wall_seconds": time.perf_counter() - wall_started,
+                "cpu_seconds": time.process_time() - cpu_started,
+                "peak_rss_mb": rss.peak_mb,
+                "peak_rss_increase_mb": rss.increase_mb,
+                "rows_in": _rows(list(args) + list(kwargs.values())),
+                "rows_out": _rows(result),
+                # Size of the returned objects; output_bytes_written is added when the materializers store them
+                "output_nbytes_in_memory": _nbytes(result),
+                "output_bytes_written": 0,
+            }
+
+            if profiler is not None:
+                stats_text = io.StringIO()
+                pstats.Stats(profiler, stream=stats_text).sort_stats("cumulative").print_stats(25)
+                record["cprofile"] = stats_text.getvalue()
+
+            run_name, step_name = _step_context()
+            _publish(step_name or step_func.__name__, run_name or "local", record)
+
+            return result
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def compare_profiles(baseline_path: str, candidate_path: str, threshold: float = 0.2,
+                     metrics: tuple = ("wall_seconds", "cpu_seconds", "peak_rss_increase_mb")) -> list:
+    """
+    This function returns the step metrics of a candidate run that regressed by more than threshold
+    (relative) against a baseline run.
+    Args:
+        baseline_path: JSON profile of the baseline run.
+        candidate_path: JSON profile of the candidate run.
+        threshold: Relative increase reported as a regression.
+        metrics: Metrics compared.
+    Returns:
+        List of (step, metric, baseline value, candidate value).
+    """
+    with open(baseline_path) as baseline_file, open(candidate_path) as candidate_file:
+        baseline = json.load(baseline_file)["steps"]
+        candidate = json.load(candidate_file)["steps"]
+
+    regressions = []
+    for step_name, record in candidate.items():
+        if step_name not in baseline:
+            continue
+        for metric in metrics:
+            before, after = baseline[step_name].get(metric), record.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > 1e-3:
+                regressions.append((step_name, metric, before, after))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    # python -m utils.profiling <baseline.json> <candidate.json> [threshold]
+    found = compare_profiles(sys.argv[1], sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 0.2)
+    for step_name, metric, before, after in found:
+        print(f"{step_name}: {metric} {before:.3f} -> {after:.3f}")
+    sys.exit(1 if found else 0)
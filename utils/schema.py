@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Columns returned by load_dataset_sql, grouped by how they are stored in memory
+CATEGORICAL_COLS = ["rate_code_des", "pmt_type_des", "travel_day"]
+INTEGER_COLS = ["passenger_count", "pu_hour", "do_hour"]
+FLOAT_COLS = ["trip_distance", "fare_amount"]
+# Target of the models, kept in float64: the trees compute their split criteria and leaf values on the
+# target as given, and a float32 target changes the tied splits and the fitted model
+TARGET_COL = "fare_amount"
+# Optional column, selected only for the time-ordered split and dropped before training
+DROPOFF_COL = "lpep_dropoff_datetime"
+
+# In-memory type contract from load to evaluation. Integer columns holding nulls are
+# stored as float32 instead, and the one-hot indicator columns are DUMMY_DTYPE. The float
+# features are float32, the dtype sklearn's trees convert their features to anyway.
+COLUMN_DTYPES = {
+    **{col: "category" for col in CATEGORICAL_COLS},
+    **{col: "int8" for col in INTEGER_COLS},
+    **{col: "float32" for col in FLOAT_COLS},
+    TARGET_COL: "float64",
+}
+DUMMY_DTYPE = np.uint8
+
+
+def _compact_integer(column: pd.Series) -> pd.Series:
+    # NaN has no integer representation; float32 keeps the nulls that sklearn expects as NaN
+    if column.isna().any():
+        return column.astype(np.float32)
+    # Smallest integer type holding the values (int8 for hours and passenger counts)
+    return pd.to_numeric(column, downcast="integer")
+
+
+def compact_frame(dataset: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function casts the columns of load_dataset_sql to the compact dtypes of COLUMN_DTYPES.
+    The pass is idempotent, so frames that are already compact are returned unchanged.
+    Args:
+        dataset: A chunk or a full dataset loaded from database.
+    Returns:
+        The same dataset with compact dtypes.
+    """
+    for col in INTEGER_COLS:
+        if col in dataset.columns and dataset[col].dtype.itemsize > 1:
+            dataset[col] = _compact_integer(dataset[col])
+
+    for col in FLOAT_COLS:
+        if col in dataset.columns and dataset[col].dtype != COLUMN_DTYPES[col]:
+            dataset[col] = dataset[col].astype(COLUMN_DTYPES[col])
+
+    for col in CATEGORICAL_COLS:
+        if col in dataset.columns and not isinstance(dataset[col].dtype, pd.CategoricalDtype):
+            dataset[col] = dataset[col].astype("category")
+
+    # Parsers without type inference (pd.read_csv) return the timestamps as text
+    if DROPOFF_COL in dataset.columns and not pd.api.types.is_datetime64_any_dtype(dataset[DROPOFF_COL]):
+        dataset[DROPOFF_COL] = pd.to_datetime(dataset[DROPOFF_COL])
+
+    return dataset
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    """
+    This function concatenates compacted chunks into one frame.
+    Categorical columns are merged with union_categoricals so that they stay categorical
+    even when the chunks have seen different categories. Chunks whose integer columns were
+    compacted differently (nulls in one chunk only) are brought back to COLUMN_DTYPES.
+    Args:
+        frames: List of compacted chunks with the same columns.
+    Returns:
+        One dataset with a fresh RangeIndex.
+    """
+    if len(frames) == 1:
+        return compact_frame(frames[0].reset_index(drop=True))
+
+    columns = {}
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            columns[col] = union_categoricals([frame[col] for frame in frames], ignore_order=True)
+        else:
+            columns[col] = np.concatenate([frame[col].to_numpy() for frame in frames])
+
+    return compact_frame(pd.DataFrame(columns))
@@ -1,5 +1,11 @@
+import re
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from utils.schema import DROPOFF_COL
+
 # LOAD DATASET FROM DATABASE
-load_dataset_sql = ("""
+load_dataset_template = ("""
                     SELECT passenger_count,
                             trip_distance,
                             rate_code_des,
@@ -7,7 +13,227 @@ load_dataset_sql = ("""
                             pu_hour,
                             do_hour,
                             travel_day,
-                            fare_amount
+                            fare_amount{extra_columns}
                     FROM greentaxi
-                    WHERE total_amount > 0 And trip_distance > 0 And lpep_dropoff_datetime between '2023-01-01' And '2023-01-31'
-                    """)
\ No newline at end of file
+                    WHERE total_amount > 0 And trip_distance > 0 And lpep_dropoff_datetime >= '{start_date}' And lpep_dropoff_datetime {end_operator} '{end_date}'
+                    """)
+
+# ROW COUNT, HIGH-WATERMARK AND CHECKSUM PER DROPOFF DAY (used to validate cached partitions). The checksum
+# adds up a hash of every whole row, so a row corrected in place changes it even when the count and the
+# watermark stay the same; the sum is order-independent and computed in the same scan.
+partition_stats_template = ("""
+                    SELECT date(lpep_dropoff_datetime) AS partition_date,
+                            count(*) AS row_count,
+                            max(lpep_dropoff_datetime) AS max_dropoff,
+                            sum(hashtext(greentaxi::text)::bigint) AS checksum
+                    FROM greentaxi
+                    WHERE total_amount > 0 And trip_distance > 0 And lpep_dropoff_datetime >= '{start_date}' And lpep_dropoff_datetime {end_operator} '{end_date}'
+                    GROUP BY 1
+                    """)
+
+# PREDICTIONS WRITTEN BACK BY THE INFERENCE PIPELINE (the dataset query has no trip id,
+# so trips are identified by their dropoff time and distance)
+predictions_table_template = ("""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                            lpep_dropoff_datetime timestamp NOT NULL,
+                            trip_distance real NOT NULL,
+                            predicted_fare_amount real NOT NULL,
+                            model_version text NOT NULL,
+                            scored_at timestamptz NOT NULL DEFAULT now()
+                    )
+                    """)
+
+prediction_columns = ["lpep_dropoff_datetime", "trip_distance", "predicted_fare_amount", "model_version"]
+
+# COLUMNS OF THE DATASET QUERY, IN ORDER, WITH HOW THEY ARE RETURNED IN PUSHDOWN MODE
+feature_spec = [
+    ("passenger_count", "numeric"),
+    ("trip_distance", "numeric"),
+    ("rate_code_des", "categorical"),
+    ("pmt_type_des", "categorical"),
+    ("pu_hour", "numeric"),
+    ("do_hour", "numeric"),
+    ("travel_day", "categorical"),
+    ("fare_amount", "numeric"),
+]
+
+pushdown_template = ("""
+                    SELECT {select_list}
+                    FROM greentaxi
+                    WHERE total_amount > 0 And trip_distance > 0 And lpep_dropoff_datetime >= '{start_date}' And lpep_dropoff_datetime {end_operator} '{end_date}'
+                    """)
+
+# DISTINCT VALUES OF EVERY CATEGORICAL COLUMN IN ONE SCAN
+dictionary_template = ("""
+                    SELECT {categorical_list}
+                    FROM greentaxi
+                    WHERE total_amount > 0 And trip_distance > 0 And lpep_dropoff_datetime >= '{start_date}' And lpep_dropoff_datetime {end_operator} '{end_date}'
+                    GROUP BY GROUPING SETS ({grouping_sets})
+                    """)
+
+
+def _window_params(start_date, end_date, end_inclusive: bool) -> dict:
+    """
+    This function validates a dropoff date window and returns the values formatted into the query templates.
+    """
+    # Parsing the dates also guarantees that only ISO dates are formatted into the query
+    start_date = date.fromisoformat(str(start_date))
+    end_date = date.fromisoformat(str(end_date))
+
+    if end_date < start_date:
+        raise ValueError(f"end_date {end_date} is before start_date {start_date}")
+
+    return dict(start_date=start_date.isoformat(),
+                end_date=end_date.isoformat(),
+                end_operator="<=" if end_inclusive else "<")
+
+
+def _extra_columns(with_dropoff: bool) -> list:
+    return [DROPOFF_COL] if with_dropoff else []
+
+
+def build_load_dataset_template(with_dropoff: bool = False) -> str:
+    """
+    This function returns the dataset query with its column list filled in and the date window left as placeholders.
+    Args:
+        with_dropoff: Also select the dropoff timestamp (needed by the time-ordered split).
+    Returns:
+        The query template.
+    """
+    extra_columns = "".join(f",\n                            {col}" for col in _extra_columns(with_dropoff))
+    return load_dataset_template.replace("{extra_columns}", extra_columns)
+
+
+def build_load_dataset_sql(start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                           end_inclusive: bool = True, with_dropoff: bool = False) -> str:
+    """
+    This function returns the query loading the dataset for a dropoff date window.
+    Args:
+        start_date: First day of the window (ISO format), inclusive.
+        end_date: Last day of the window (ISO format).
+        end_inclusive: Whether rows dropped off exactly at end_date are included (same as BETWEEN).
+        with_dropoff: Also select the dropoff timestamp (needed by the time-ordered split).
+    Returns:
+        The SQL query.
+    """
+    return build_load_dataset_template(with_dropoff).format(**_window_params(start_date, end_date, end_inclusive))
+
+
+def build_partition_stats_sql(start_date: str, end_date: str, end_inclusive: bool = True) -> str:
+    """
+    This function returns the query counting rows, finding the latest dropoff and summing the row hashes per dropoff day.
+    Args:
+        start_date: First day of the window (ISO format), inclusive.
+        end_date: Last day of the window (ISO format).
+        end_inclusive: Whether rows dropped off exactly at end_date are included.
+    Returns:
+        The SQL query.
+    """
+    return partition_stats_template.format(**_window_params(start_date, end_date, end_inclusive))
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def build_dictionary_sql(start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                         end_inclusive: bool = True) -> str:
+    """
+    This function returns the query listing the distinct values of the categorical columns of feature_spec.
+    Every row has one non-null column: the value of one grouping set.
+    Args:
+        start_date: First day of the window (ISO format), inclusive.
+        end_date: Last day of the window (ISO format).
+        end_inclusive: Whether rows dropped off exactly at end_date are included.
+    Returns:
+        The SQL query.
+    """
+    categorical = [col for col, kind in feature_spec if kind == "categorical"]
+
+    return dictionary_template.format(categorical_list=", ".join(categorical),
+                                      grouping_sets=", ".join(f"({col})" for col in categorical),
+                                      **_window_params(start_date, end_date, end_inclusive))
+
+
+def build_pushdown_sql(vocabularies: dict, start_date: str = "2023-01-01", end_date: str = "2023-01-31",
+                       end_inclusive: bool = True, with_dropoff: bool = False) -> str:
+    """
+    This function returns the dataset query with the categorical columns returned as smallint codes,
+    i.e. the position of the value in its vocabulary (NULL when the value is not in the vocabulary).
+    Args:
+        vocabularies: Categories per categorical column of feature_spec.
+        start_date: First day of the window (ISO format), inclusive.
+        end_date: Last day of the window (ISO format).
+        end_inclusive: Whether rows dropped off exactly at end_date are included.
+        with_dropoff: Also select the dropoff timestamp (needed by the time-ordered split).
+    Returns:
+        The SQL query.
+    """
+    select_list = []
+    for col, kind in feature_spec:
+        if kind == "categorical":
+            values = ", ".join(_sql_literal(value) for value in vocabularies[col])
+            select_list.append(f"(array_position(ARRAY[{values}]::text[], {col}::text) - 1)::smallint AS {col}")
+        else:
+            select_list.append(col)
+    select_list.extend(_extra_columns(with_dropoff))
+
+    return pushdown_template.format(select_list=",\n                            ".join(select_list),
+                                    **_window_params(start_date, end_date, end_inclusive))
+
+
+def _table_name(table: str) -> str:
+    # Table names cannot be query parameters, so only plain (optionally schema-qualified) identifiers are accepted
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?", table):
+        raise ValueError(f"Invalid table name: {table}")
+    return table
+
+
+def build_predictions_table_sql(table: str = "greentaxi_predictions") -> str:
+    """
+    This function returns the statement creating the predictions table when it does not exist.
+    """
+    return predictions_table_template.format(table=_table_name(table))
+
+
+def build_copy_predictions_sql(table: str = "greentaxi_predictions") -> str:
+    """
+    This function returns the COPY ... FROM STDIN statement loading predictions in CSV format (without header).
+    """
+    return f"COPY {_table_name(table)} ({', '.join(prediction_columns)}) FROM STDIN WITH (FORMAT csv)"
+
+
+def partition_date_range(start_date: str, end_date: str, freq: str = "day") -> List[Tuple[date, date, bool]]:
+    """
+    This function splits a dropoff date window into consecutive partitions.
+    Every partition is half-open except the last one, which keeps the inclusive end of the window,
+    so the partitions together return the same rows as build_load_dataset_sql(start_date, end_date).
+    Args:
+        start_date: First day of the window (ISO format).
+        end_date: Last day of the window (ISO format).
+        freq: Partition length, either "day" or "week".
+    Returns:
+        List of (partition start, partition end, end inclusive) in date order.
+    """
+    steps = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+    if freq not in steps:
+        raise ValueError(f"Unknown partition frequency: {freq}")
+
+    start_date = date.fromisoformat(str(start_date))
+    end_date = date.fromisoformat(str(end_date))
+
+    if end_date < start_date:
+        raise ValueError(f"end_date {end_date} is before start_date {start_date}")
+
+    partitions = []
+    partition_start = start_date
+    while partition_start + steps[freq] < end_date:
+        partition_end = partition_start + steps[freq]
+        partitions.append((partition_start, partition_end, False))
+        partition_start = partition_end
+    partitions.append((partition_start, end_date, True))
+
+    return partitions
+
+
+load_dataset_sql = build_load_dataset_sql()
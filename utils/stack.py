@@ -0,0 +1,32 @@
+from functools import lru_cache
+
+from zenml.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_experiment_tracker_name() -> str:
+    """
+    This function returns the name of the MLflow experiment tracker of the active stack.
+
+    The stack is resolved on the first call (when a pipeline is composed), not when the step
+    modules are imported, and the name is kept for the rest of the process, so the ZenML
+    server is asked once per process.
+
+    Returns:
+        Name of the experiment tracker, to be set on the steps with with_options(experiment_tracker=...).
+    """
+    from zenml.client import Client
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+
+    # Compared by flavor, so that the MLflow integration (and mlflow) is not imported to check the type
+    if not experiment_tracker or experiment_tracker.flavor != "mlflow":
+        raise RuntimeError(
+            "The active stack requires a MLFlow experiment tracker for this ML run to work."
+        )
+
+    logger.info(f"Experiment tracker of the active stack: {experiment_tracker.name}")
+
+    return experiment_tracker.name